@@ -0,0 +1,639 @@
+#!/usr/bin/env python3
+#
+# benchmark.py
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+
+'''
+Standalone benchmark for the websocket ingest path.
+
+Drives synthetic "device:sync" frames of realistic size (48 port switches with a full port_table,
+AP's with radio_table/vap_table) through UnifiClient.update_unifi_data() and UnifiClient.devices(),
+and through UnifiApp.update_list(), reporting frames/sec,
+p50/p99 latency to the consumer and peak RSS for each device count.
+
+Each device count is run in it's own process, so that peak RSS is per run.
+
+With -j, times decoding of device payloads with each available json backend (see unifi_json.py)
+instead. Payloads are recorded device data (eg raw_data.json written by unifi_client.py in debug mode,
+or data.json written by unifi.py) if given with -r, otherwise synthetic frames.
+
+With -R, replays device updates (synthetic, or recorded with -r) through UnifiApp using the headless render
+backend (see headless.py), reporting draw calls, blits and milliseconds per update, no display needed.
+
+With -P, times updating the ports of a 48 port POE switch from it's port_table (NetworkDevice.update_from_data()
+and apply_port_table()), using the headless render backend, and counts the ports updated and skipped (unchanged) per update.
+
+With -t, compares the CPU cost per update of passing device updates from the worker process to the
+display through a multiprocessing.Queue (pickled) and through the shared memory store (see shared_state.py),
+and the display side cost of reading the same updates from each.
+
+With -F, stores device updates (uptime, load and counters changing every update, port speeds changing with
+a range of probabilities) in devices that count instead of drawing, using NetworkDevice.store_data() from unifi.py,
+and counts the updates reprocessed, only the statistics text updated, and skipped, against a fingerprint of the
+whole device data.
+
+eg:
+./benchmark.py                      #10/100/1000 devices
+./benchmark.py -d 10 50 -f 5000     #10 and 50 devices, 5000 frames each
+./benchmark.py -j -r raw_data.json  #json decoding of recorded payload
+./benchmark.py -t -d 20             #worker to display transport, 20 devices
+./benchmark.py -F -d 20             #device updates reprocessed/skipped, 20 devices
+./benchmark.py -R -r data.json      #display updates of recorded devices, headless
+./benchmark.py -P -f 1000           #48 port switch port updates
+'''
+
+from __future__ import print_function
+
+import copy
+import json
+import os
+import random
+import resource
+import sys
+import time
+from multiprocessing import Process, Queue
+
+import logging
+
+import unifi_json
+from unifi_client import UnifiClient
+
+__VERSION__ = '1.1.2'
+
+log = logging.getLogger('Main')
+
+class BenchmarkClient(UnifiClient):
+    '''
+    UnifiClient that does not connect to a controller, frames are fed in directly
+    '''
+    def __init__(self, **kwargs):
+        super(BenchmarkClient, self).__init__('benchmark', 'benchmark', unifi_os=False, **kwargs)
+
+    def connect_websocket(self):
+        pass
+
+def make_port(port_idx, uplink=False):
+    return {"port_idx": port_idx,
+            "media": "GE",
+            "port_poe": True,
+            "poe_caps": 7,
+            "speed_caps": 1048623,
+            "op_mode": "switch",
+            "portconf_id": "5a1c3a9bcd10ff055a0f5f3c",
+            "poe_mode": "auto",
+            "autoneg": True,
+            "enable": True,
+            "flowctrl_rx": False,
+            "flowctrl_tx": False,
+            "full_duplex": True,
+            "is_uplink": uplink,
+            "jumbo": False,
+            "rx_broadcast": random.randint(0, 10**6),
+            "rx_bytes": random.randint(0, 10**12),
+            "rx_dropped": random.randint(0, 10**3),
+            "rx_errors": 0,
+            "rx_multicast": random.randint(0, 10**6),
+            "rx_packets": random.randint(0, 10**9),
+            "satisfaction": 100,
+            "speed": random.choice([0, 10, 100, 1000, 1000]),
+            "stp_pathcost": 20000,
+            "stp_state": "forwarding",
+            "tx_broadcast": random.randint(0, 10**6),
+            "tx_bytes": random.randint(0, 10**12),
+            "tx_dropped": 0,
+            "tx_errors": 0,
+            "tx_multicast": random.randint(0, 10**6),
+            "tx_packets": random.randint(0, 10**9),
+            "up": True,
+            "tx_bytes-r": random.randint(0, 10**6),
+            "rx_bytes-r": random.randint(0, 10**6),
+            "bytes-r": random.randint(0, 10**6),
+            "name": "Port %d" % port_idx,
+            "poe_class": "Class 4",
+            "poe_current": "%.2f" % random.uniform(0, 200),
+            "poe_enable": True,
+            "poe_good": True,
+            "poe_power": "%.2f" % random.uniform(0, 10),
+            "poe_voltage": "53.48",
+            "mac_table": [{"age": 12, "mac": "00:11:22:33:44:%02x" % port_idx, "static": False, "uptime": 1000, "vlan": 1}],
+            "masked": False,
+            "aggregated_by": False,
+           }
+
+def make_device(num, type='usw'):
+    '''
+    returns a synthetic device dict, approximately the size of a real controller device:sync
+    '''
+    device_id = '%024x' % (0x5a21c063cd10ff055a0f0000 + num)
+    device = {"_id": device_id,
+              "device_id": device_id,
+              "type": type,
+              "name": "Benchmark %s %d" % (type.upper(), num),
+              "mac": "f0:9f:c2:00:%02x:%02x" % (num//256 % 256, num % 256),
+              "ip": "192.168.%d.%d" % (num//250 % 250, num % 250 + 2),
+              "version": "4.3.13.11253",
+              "upgradable": False,
+              "adopted": True,
+              "state": 1,
+              "uptime": random.randint(0, 10**7),
+              "general_temperature": 52,
+              "fan_level": 20,
+              "total_max_power": 750,
+              "overheating": False,
+              "sys_stats": {"loadavg_1": "0.31", "loadavg_15": "0.40", "loadavg_5": "0.39", "mem_buffer": 0, "mem_total": 262397952, "mem_used": 131198976},
+              "system-stats": {"cpu": "21.4", "mem": "52.3", "uptime": str(random.randint(0, 10**7))},
+              "uplink": {"full_duplex": True, "ip": "0.0.0.0", "mac": "f0:9f:c2:00:00:01", "name": "eth0", "netmask": "0.0.0.0",
+                         "num_port": 26, "rx_bytes": 10**10, "rx_dropped": 0, "rx_errors": 0, "rx_multicast": 0, "rx_packets": 10**8,
+                         "speed": 1000, "tx_bytes": 10**10, "tx_dropped": 0, "tx_errors": 0, "tx_packets": 10**8, "type": "wire",
+                         "up": True, "port_idx": 1, "uplink_mac": "f0:9f:c2:00:00:00", "uplink_remote_port": 8},
+              "stat": {"sw": dict(("port_%d-%s" % (p, k), random.randint(0, 10**9)) for p in range(1, 53) for k in ("rx_bytes", "tx_bytes", "rx_packets", "tx_packets"))},
+             }
+    if type == 'usw':
+        device.update({"model": "US48P750",
+                       "ethernet_table": [{"mac": device["mac"], "name": "eth0", "num_port": 52}],
+                       "port_table": [make_port(p, uplink=(p == 1)) for p in range(1, 53)],
+                       "downlink_table": [{"port_idx": p, "mac": "f0:9f:c2:01:00:%02x" % p, "speed": 1000, "full_duplex": True} for p in range(2, 6)],
+                     })
+    elif type == 'uap':
+        device.update({"model": "U7PG2",
+                       "ethernet_table": [{"mac": device["mac"], "name": "eth0", "num_port": 2}],
+                       "port_table": [make_port(p, uplink=(p == 1)) for p in range(1, 3)],
+                       "radio_table": [{"name": "wifi0", "radio": "ng", "channel": 6, "ht": "20", "tx_power_mode": "auto", "tx_power": 20,
+                                        "min_rssi_enabled": False, "min_rssi": -94, "max_txpower": 22, "min_txpower": 6, "nss": 3},
+                                       {"name": "wifi1", "radio": "na", "channel": 44, "ht": "80", "tx_power_mode": "medium", "tx_power": 25,
+                                        "min_rssi_enabled": False, "min_rssi": -94, "max_txpower": 22, "min_txpower": 6, "nss": 3}],
+                       "radio_table_stats": [{"name": "wifi%d" % r, "channel": 6, "cu_total": 20, "num_sta": 10, "satisfaction": 98,
+                                              "tx_packets": 10**7, "tx_retries": 10**5, "state": "RUN"} for r in range(2)],
+                       "vap_table": [{"essid": "ssid%d" % v, "radio": "ng" if v % 2 else "na", "num_sta": 5, "rx_bytes": 10**9, "tx_bytes": 10**9,
+                                      "satisfaction": 97, "channel": 6 if v % 2 else 44, "bssid": "f2:9f:c2:00:00:%02x" % v,
+                                      "usage": "user", "up": True} for v in range(8)],
+                     })
+    return device
+
+def make_devices(count):
+    '''
+    returns count synthetic devices, 1 in 4 are AP's
+    '''
+    return [make_device(num, 'uap' if num % 4 == 3 else 'usw') for num in range(count)]
+
+def make_frames(devices, num_frames, change=0.05):
+    '''
+    returns a list of device:sync frames cycling through devices, with uptime, load and counters changing (as they do
+    in every real update), and the speed of each port changing with probability change
+    '''
+    frames = []
+    for frame in range(num_frames):
+        device = copy.deepcopy(devices[frame % len(devices)])
+        device["uptime"] += frame
+        device["system-stats"]["uptime"] = str(int(device["system-stats"]["uptime"]) + frame)
+        device["sys_stats"]["loadavg_1"] = "%.2f" % random.uniform(0, 1)
+        device["sys_stats"]["mem_used"] += random.randint(0, 10**6)
+        device["uplink"]["rx_bytes"] += random.randint(0, 10**6)
+        device["uplink"]["tx_bytes"] += random.randint(0, 10**6)
+        for port in device.get("port_table", []):
+            port["rx_bytes"] = port.get("rx_bytes", 0) + random.randint(0, 10**6)
+            port["tx_bytes"] = port.get("tx_bytes", 0) + random.randint(0, 10**6)
+            if random.random() < change:
+                port["speed"] = random.choice([0, 10, 100, 1000])
+        frames.append({"meta": {"rc": "ok", "message": "device:sync"}, "data": [device]})
+    return frames
+
+def percentile(values, percent):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values)-1, int(len(values)*percent/100))]
+
+def peak_rss():
+    '''
+    peak RSS of this process in MB (ru_maxrss is in KB on Linux)
+    '''
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss/1024.0
+
+def bench_client(frames, initial):
+    '''
+    feed frames through update_unifi_data and consume them with devices(), timing each frame
+    '''
+    client = BenchmarkClient()
+    client.update_unifi_data({"meta": {"rc": "ok"}, "data": initial})   #initial device load, as the websocket client does
+    client.devices()
+    latency = []
+    start = time.perf_counter()
+    for frame in frames:
+        t = time.perf_counter()
+        client.update_unifi_data(frame)
+        client.devices(blocking=False)
+        latency.append(time.perf_counter() - t)
+    return time.perf_counter() - start, latency
+
+def bench_app(frames, initial):
+    '''
+    feed frames through UnifiApp.update_list() (the display side merge of device updates)
+    '''
+    try:
+        from unifi import UnifiApp
+    except ImportError as e:
+        log.warning('unifi.py app path not benchmarked: %s' % e)
+        return None, []
+
+    class AppLists(object):
+        deduplicate_list = UnifiApp.deduplicate_list
+        update_list = UnifiApp.update_list
+
+    app = AppLists()
+    devices = app.update_list([], initial)
+    latency = []
+    start = time.perf_counter()
+    for frame in frames:
+        t = time.perf_counter()
+        devices = app.update_list(devices, frame["data"])
+        latency.append(time.perf_counter() - t)
+    return time.perf_counter() - start, latency
+
+def run(num_devices, num_frames, q):
+    random.seed(num_devices)
+    devices = make_devices(num_devices)
+    frames = make_frames(devices, num_frames)
+    frame_size = sum(len(json.dumps(f)) for f in frames)//len(frames)
+    results = {'devices': num_devices, 'frames': num_frames, 'frame_size': frame_size}
+    for name, bench in [('client', bench_client), ('app', bench_app)]:
+        total, latency = bench(frames, copy.deepcopy(devices))
+        if total is None:
+            continue
+        results[name] = {'fps': num_frames/max(total, 1e-9),
+                         'p50': percentile(latency, 50)*1000,
+                         'p99': percentile(latency, 99)*1000}
+    results['rss'] = peak_rss()
+    q.put(results)
+
+def load_devices(file=None, num_devices=10):
+    '''
+    returns list of recorded devices from file, or num_devices synthetic devices if file is None
+    '''
+    if file is None:
+        return make_devices(num_devices)
+    with open(file, 'r') as f:
+        devices = json.load(f)
+    if isinstance(devices, dict):   #raw_data.json is a dict of id:device
+        devices = list(devices.values())
+    return devices
+
+def load_payloads(file=None, num_devices=10):
+    '''
+    returns list of encoded device payloads (bytes), one per device, as received from the websocket
+    '''
+    devices = load_devices(file, num_devices)
+    return [json.dumps({"meta": {"rc": "ok", "message": "device:sync"}, "data": [device]}).encode('utf-8') for device in devices]
+
+def bench_json(payloads, repeat):
+    print('%-8s %12s %12s %10s' % ('backend', 'payloads/s', 'MB/s', 'us/payload'))
+    size = sum(len(p) for p in payloads)
+    for name in unifi_json.BACKENDS:
+        try:
+            unifi_json.use_backend(name)
+        except ImportError:
+            print('%-8s %12s' % (name, 'not installed'))
+            continue
+        start = time.perf_counter()
+        for r in range(repeat):
+            for payload in payloads:
+                unifi_json.loads(payload)
+        total = time.perf_counter() - start
+        count = repeat*len(payloads)
+        print('%-8s %12.1f %12.1f %10.1f' % (name, count/total, size*repeat/total/2**20, total/count*10**6))
+    unifi_json.use_backend()
+
+def transport_writer(kind, channel, frames, interval, notify_w, result_q):
+    start = time.process_time()
+    for frame in frames:
+        if kind == 'queue':
+            channel.put(frame["data"])
+        else:
+            channel.write(frame["data"])
+        os.write(notify_w, b'u')
+        time.sleep(interval)    #device updates arrive spread out in time
+    result_q.put(time.process_time() - start)
+
+def bench_transport(num_devices, num_frames, interval):
+    '''
+    CPU time per update of sending updates from a worker process to the display, and receiving them
+    '''
+    devices = make_devices(num_devices)
+    frames = make_frames(devices, num_frames)
+    try:
+        from shared_state import SharedDeviceStore
+        kinds = ['queue', 'shared']
+    except ImportError as e:
+        log.warning('shared memory transport not benchmarked: %s' % e)
+        kinds = ['queue']
+    for kind in kinds:
+        channel = Queue() if kind == 'queue' else SharedDeviceStore(slots=max(64, num_devices), slot_size=256*1024, compact_ports=False)
+        notify_r, notify_w = os.pipe()
+        result_q = Queue()
+        writer = Process(target=transport_writer, args=(kind, channel, frames, interval, notify_w, result_q))
+        writer.start()
+        received = decoded = 0
+        start = time.process_time()
+        while received < num_frames:
+            updates = len(os.read(notify_r, 4096))
+            received += updates
+            if kind == 'queue':
+                for update in range(updates):
+                    decoded += len(channel.get())
+            else:
+                decoded += len(channel.read())
+        reader_cpu = time.process_time() - start
+        writer_cpu = result_q.get()
+        writer.join()
+        if kind != 'queue':
+            channel.close(unlink=True)
+        os.close(notify_r)
+        os.close(notify_w)
+        print('%-9s %8d %8d %16.1f %16.1f %10d' % (kind, num_devices, num_frames, writer_cpu/num_frames*10**6, reader_cpu/num_frames*10**6, decoded))
+
+def bench_render(devices, num_frames, size, q):
+    '''
+    replay device updates through UnifiApp (as the display does) using the headless backend,
+    reports draw calls, blits and milliseconds per update
+    '''
+    os.environ['UNIFI_HEADLESS'] = '1'  #must be set before unifi.py is imported
+    import headless
+    import unifi
+    headless.set_size(*size)
+    #updates as the worker process sends them
+    client = BenchmarkClient(fields=unifi.DISPLAY_FIELDS, compact_ports=True)
+    client.update_unifi_data({"meta": {"rc": "ok"}, "data": copy.deepcopy(devices)})
+    updates = [client.devices()]
+    for frame in make_frames(devices, num_frames):
+        client.update_unifi_data(frame)
+        updates.append(client.devices(blocking=False))
+
+    app = unifi.UnifiApp(unifi.get_parser().parse_args(['127.0.0.1', 'benchmark', 'benchmark']))
+    app.setup()
+    latency = []
+    draw_calls = []
+    blits = []
+    for update in updates:
+        headless.reset()
+        t = time.perf_counter()
+        app.q.put(update)
+        app.pending += 1
+        app.draw_all_devices()
+        app.render_frame()
+        latency.append(time.perf_counter() - t)
+        calls = headless.reset()
+        blits.append(calls.pop('bit_blt', 0))
+        draw_calls.append(sum(calls.values()))
+    drawn = sum(len(d) for d in app.all_devices)
+    q.put((len(devices), drawn, latency[0]*1000, draw_calls[0], percentile(latency[1:], 50)*1000, percentile(latency[1:], 99)*1000,
+           sum(draw_calls[1:])/max(1, num_frames), sum(blits[1:])/max(1, num_frames)))
+
+def bench_reader(num_devices, num_frames, q):
+    '''
+    display side cost per update of each transport, for the same device updates (as the worker sends them, DISPLAY_FIELDS
+    and compact port records), without the process, pipe and sleep overhead of bench_transport():
+    unpickling what Queue.get() receives, and SharedDeviceStore.read() (json decode and PortRecords)
+    '''
+    os.environ['UNIFI_HEADLESS'] = '1'  #must be set before unifi.py is imported
+    import pickle
+    import unifi
+    from unifi_client import to_json
+    from shared_state import SharedDeviceStore
+    devices = make_devices(num_devices)
+    client = BenchmarkClient(fields=unifi.DISPLAY_FIELDS, compact_ports=True)
+    client.update_unifi_data({"meta": {"rc": "ok"}, "data": copy.deepcopy(devices)})
+    initial = client.devices()
+    updates = []
+    for frame in make_frames(devices, num_frames):
+        client.update_unifi_data(frame)
+        updates.append(client.devices(blocking=False))
+
+    results = []
+    pickled = [pickle.dumps(update) for update in updates]  #as multiprocessing.Queue.put() does
+    elapsed = []
+    for data in pickled:
+        t = time.perf_counter()
+        pickle.loads(data)
+        elapsed.append(time.perf_counter() - t)
+    results.append(('queue', sum(len(data) for data in pickled)/len(updates), percentile(elapsed, 50)*1e6, sum(elapsed)/len(updates)*1e6))
+
+    store = SharedDeviceStore(slots=max(64, num_devices), slot_size=256*1024, compact_ports=True)
+    store.write(initial)
+    store.read()
+    elapsed = []
+    size = 0
+    for update in updates:
+        store.write(update)
+        size += sum(len(unifi_json.dumps(device, default=to_json)) for device in update)
+        t = time.perf_counter()
+        store.read()
+        elapsed.append(time.perf_counter() - t)
+    store.close(unlink=True)
+    results.append(('shared', size/len(updates), percentile(elapsed, 50)*1e6, sum(elapsed)/len(updates)*1e6))
+    q.put(results)
+
+def bench_fingerprint(devices, num_frames, change, q):
+    '''
+    store updates of devices (as the worker sends them) with NetworkDevice.store_data(), in devices that count
+    instead of drawing, counts the updates reprocessed, where only the statistics text was updated, and skipped,
+    and how many would have been skipped with a fingerprint of the whole device data
+    '''
+    os.environ['UNIFI_HEADLESS'] = '1'  #must be set before unifi.py is imported
+    import unifi
+    from unifi_client import to_json
+
+    class CountingDevice(object):
+        store_data = unifi.NetworkDevice.store_data
+        get_stats = unifi.NetworkDevice.get_stats
+
+        def __init__(self):
+            self.fingerprint = None
+            self.stats = None
+            self.data = None
+            self.zoomed = False
+
+        def update_from_data(self):
+            self.stats = self.get_stats()
+
+        def update_data(self, **kwargs):
+            pass
+
+        def commit_changes(self):
+            pass
+
+    client = BenchmarkClient(fields=unifi.DISPLAY_FIELDS, compact_ports=True)
+    client.update_unifi_data({"meta": {"rc": "ok"}, "data": copy.deepcopy(devices)})
+    initial = client.devices()
+    updates = []
+    for frame in make_frames(devices, num_frames, change):
+        client.update_unifi_data(frame)
+        updates.extend(client.devices(blocking=False))
+
+    drawn = {}
+    for data in initial:
+        drawn[data["device_id"]] = CountingDevice()
+        drawn[data["device_id"]].store_data(data)
+    whole = dict((data["device_id"], hash(unifi_json.dumps(data, default=to_json))) for data in initial)
+    results = {unifi.REPROCESSED: 0, unifi.STATS_UPDATED: 0, unifi.SKIPPED: 0}
+    whole_skipped = 0
+    elapsed = []
+    for data in updates:
+        device = drawn[data["device_id"]]
+        t = time.perf_counter()
+        result = device.store_data(data)
+        elapsed.append(time.perf_counter() - t)
+        results[result] += 1
+        fingerprint = hash(unifi_json.dumps(data, default=to_json))
+        if fingerprint == whole[data["device_id"]]:
+            whole_skipped += 1
+        whole[data["device_id"]] = fingerprint
+    q.put((change, len(updates), results[unifi.REPROCESSED], results[unifi.STATS_UPDATED], results[unifi.SKIPPED], whole_skipped, percentile(elapsed, 50)*1e6, percentile(elapsed, 99)*1e6))
+
+def bench_ports(num_frames, q):
+    '''
+    time NetworkDevice.update_from_data() and apply_port_table() for a 48 port POE switch (US48P750) payload,
+    using the headless render backend
+    '''
+    os.environ['UNIFI_HEADLESS'] = '1'  #must be set before unifi.py is imported
+    import unifi
+    device = make_device(0, 'usw')
+    client = BenchmarkClient(fields=unifi.DISPLAY_FIELDS, compact_ports=True)
+    client.update_unifi_data({"meta": {"rc": "ok"}, "data": [copy.deepcopy(device)]})
+    payloads = [client.devices()[0]]
+    for frame in make_frames([device], num_frames):
+        client.update_unifi_data(frame)
+        payloads.append(client.devices(blocking=False)[0])
+
+    app = unifi.UnifiApp(unifi.get_parser().parse_args(['127.0.0.1', 'benchmark', 'benchmark']))
+    app.setup()
+    app.create_devices(-10, 10, app.network_switches, payloads[:1])
+    switch = app.network_switches[payloads[0]["device_id"]]
+    update = []
+    apply = []
+    processed = skipped = 0
+    for data in payloads[1:]:
+        t = time.perf_counter()
+        switch.data = data
+        switch.update_from_data()
+        app.render_frame()
+        update.append(time.perf_counter() - t)
+        processed += switch.ports_processed
+        skipped += switch.ports_skipped
+        downlinks = [downlink["port_idx"] for downlink in data.get("downlink_table", [])]
+        t = time.perf_counter()
+        switch.apply_port_table(data["port_table"], downlinks)
+        apply.append(time.perf_counter() - t)
+    q.put((len(switch.ports), len(payloads[0]["port_table"]), percentile(update, 50)*1e6, percentile(update, 99)*1e6,
+           percentile(apply, 50)*1e6, percentile(apply, 50)*1e6/max(1, len(payloads[0]["port_table"])),
+           processed/max(1, num_frames), skipped/max(1, num_frames)))
+
+def report(results):
+    print('%8s %8s %10s  %-6s %12s %10s %10s %10s' % ('devices', 'frames', 'frame_size', 'path', 'frames/sec', 'p50(ms)', 'p99(ms)', 'RSS(MB)'))
+    for result in results:
+        for name in ['client', 'app']:
+            if name not in result:
+                continue
+            r = result[name]
+            print('%8d %8d %10d  %-6s %12.1f %10.3f %10.3f %10.1f' % (result['devices'], result['frames'], result['frame_size'],
+                                                                     name, r['fps'], r['p50'], r['p99'], result['rss']))
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description='Unifi websocket ingest benchmark')
+    parser.add_argument('-d','--devices', action="store", type=int, nargs='+', default=[10, 100, 1000], help='number of devices to simulate (default: 10 100 1000)')
+    parser.add_argument('-f','--frames', action="store", type=int, default=2000, help='number of device:sync frames per run (default: 2000)')
+    parser.add_argument('-j','--json', action='store_true', help='benchmark json decoding backends (default: False)', default = False)
+    parser.add_argument('-r','--replay', action="store", default=None, help='recorded device data file for json or render benchmark eg raw_data.json (default: synthetic)')
+    parser.add_argument('-t','--transport', action='store_true', help='benchmark worker to display transport (default: False)', default = False)
+    parser.add_argument('-R','--render', action='store_true', help='benchmark display updates with the headless render backend (default: False)', default = False)
+    parser.add_argument('-P','--ports', action='store_true', help='benchmark port updates of a 48 port POE switch (default: False)', default = False)
+    parser.add_argument('-s','--size', action="store", default='800x480', help='screen size for render benchmark (default: 800x480)')
+    parser.add_argument('-F','--fingerprint', action='store_true', help='benchmark device updates reprocessed/skipped (default: False)', default = False)
+    parser.add_argument('-i','--interval', action="store", type=float, default=0.002, help='interval between updates for transport benchmark in seconds (default: 0.002)')
+    parser.add_argument('-D','--debug', action='store_true', help='debug mode', default = False)
+    parser.add_argument('-V','--version', action='version',version='%(prog)s {version}'.format(version=__VERSION__))
+
+    arg = parser.parse_args()
+
+    #UnifiClient writes raw_data.json on every update in debug mode, so only log warnings unless asked
+    logging.basicConfig(level=logging.DEBUG if arg.debug else logging.WARNING)
+
+    if arg.json:
+        bench_json(load_payloads(arg.replay, arg.devices[0]), max(1, arg.frames//10))
+        return
+
+    if arg.fingerprint:
+        print('%12s %8s %12s %11s %8s %14s %12s %12s' % ('port change', 'updates', 'reprocessed', 'stats only', 'skipped', 'whole skipped',
+                                                          'p50(us)', 'p99(us)'))
+        for change in (0.0, 0.001, 0.01, 0.05):
+            q = Queue()
+            p = Process(target=bench_fingerprint, args=(make_devices(arg.devices[0]), arg.frames, change, q))
+            p.start()
+            print('%12.3f %8d %12d %11d %8d %14d %12.1f %12.1f' % q.get())
+            p.join()
+        return
+
+    if arg.transport:
+        print('%-8s %8s %8s %16s %16s %10s' % ('transport', 'devices', 'updates', 'writer us/update', 'reader us/update', 'decoded'))
+        for num_devices in arg.devices:
+            bench_transport(num_devices, min(arg.frames, 500), arg.interval)
+        try:
+            import shared_state
+        except ImportError:
+            return
+        print()
+        print('%-9s %8s %8s %14s %14s %14s' % ('reader', 'devices', 'updates', 'bytes/update', 'p50 us/update', 'mean us/update'))
+        for num_devices in arg.devices:
+            q = Queue()
+            p = Process(target=bench_reader, args=(num_devices, arg.frames, q))
+            p.start()
+            for kind, size, p50, mean in q.get():
+                print('%-9s %8d %8d %14.0f %14.1f %14.1f' % (kind, num_devices, arg.frames, size, p50, mean))
+            p.join()
+        return
+
+    if arg.render:
+        size = [int(x) for x in arg.size.lower().split('x')]
+        print('%8s %6s %8s %12s %12s %12s %12s %14s %12s' % ('devices', 'drawn', 'updates', 'initial(ms)', 'initial draws', 'p50(ms)', 'p99(ms)', 'draws/update', 'blits/update'))
+        for num_devices in arg.devices:
+            q = Queue()
+            p = Process(target=bench_render, args=(load_devices(arg.replay, num_devices), arg.frames, size, q))
+            p.start()
+            devices, drawn, initial, initial_draws, p50, p99, draws, blits = q.get()
+            print('%8d %6d %8d %12.1f %12d %12.3f %12.3f %14.1f %12.1f' % (devices, drawn, arg.frames, initial, initial_draws, p50, p99, draws, blits))
+            p.join()
+        return
+
+    if arg.ports:
+        print('%6s %10s %18s %18s %20s %12s %16s %14s' % ('ports', 'port_table', 'update p50(us)', 'update p99(us)', 'apply_port_table(us)', 'us/port',
+                                                           'updated/update', 'skipped/update'))
+        q = Queue()
+        p = Process(target=bench_ports, args=(arg.frames, q))
+        p.start()
+        print('%6d %10d %18.1f %18.1f %20.1f %12.2f %16.1f %14.1f' % q.get())
+        p.join()
+        return
+
+    results = []
+    for num_devices in arg.devices:
+        q = Queue()
+        p = Process(target=run, args=(num_devices, arg.frames, q))  #separate process, so peak RSS is for this run only
+        p.start()
+        results.append(q.get())
+        p.join()
+    report(results)
+
+if __name__ == '__main__':
+    main()
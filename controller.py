@@ -5,6 +5,8 @@ import shutil
 import time
 import warnings
 
+import unifi_json
+
 '''
 see https://ubntwiki.com/products/software/unifi-controller/api for api details
 '''
@@ -188,7 +190,7 @@ class Controller(object):
 
     @staticmethod
     def _jsondec(data):
-        obj = json.loads(data)
+        obj = unifi_json.loads(data)
         if 'meta' in obj:
             if obj['meta']['rc'] != 'ok':
                 raise APIError(obj['meta']['msg'])
@@ -207,7 +209,7 @@ class Controller(object):
     def _read(self, url, params=None):
         # Try block to handle the unifi server being offline.
         r = self.session.get(url, params=params)
-        return self._jsondec(r.text)
+        return self._jsondec(r.content)
 
     def _api_read(self, url, params=None):
         return self._read(self._api_url() + url, params)
@@ -215,7 +217,7 @@ class Controller(object):
     @retry_login
     def _write(self, url, params=None):
         r = self.session.post(url, json=params)
-        return self._jsondec(r.text)
+        return self._jsondec(r.content)
 
     def _api_write(self, url, params=None):
         return self._write(self._api_url() + url, params)
@@ -223,7 +225,7 @@ class Controller(object):
     @retry_login
     def _update(self, url, params=None):
         r = self.session.put(url, json=params)
-        return self._jsondec(r.text)
+        return self._jsondec(r.content)
 
     def _api_update(self, url, params=None):
         return self._update(self._api_url() + url, params)
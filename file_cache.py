@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+#
+# file_cache.py
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+
+'''
+JSON cache of data built from a file
+
+load(path, build) returns build(path), and saves the result next to the file (path + '.cache').
+The cache is JSON (not pickle, so a changed cache file can't run code), build(path) must return
+data that JSON can hold, decode(data) can convert it back (eg lists to tuples) when it is read from the cache.
+The cached copy is used until the file is modified (mtime or size changes) or version changes,
+so parsing config files etc. is only done once, not every time the program starts.
+If the cache can't be written (eg read only file system) build(path) is used every time.
+'''
+
+from __future__ import print_function
+
+import os
+
+import unifi_json
+
+import logging
+
+log = logging.getLogger('Main')
+
+def cache_key(path, version):
+    st = os.stat(path)
+    return (version, st.st_mtime_ns, st.st_size)
+
+def load(path, build, version=1, cache_path=None, decode=None):
+    '''
+    build(path), cached in cache_path (default path + '.cache') until path is modified
+    decode(data) is applied to data read from the cache
+    '''
+    if cache_path is None:
+        cache_path = path + '.cache'
+    try:
+        key = list(cache_key(path, version))
+    except OSError:
+        return build(path)  #let build report the missing file
+    try:
+        with open(cache_path, 'rb') as f:
+            cached = unifi_json.loads(f.read())
+        if cached['key'] == key:
+            log.debug('loaded %s from cache %s' % (path, cache_path))
+            data = cached['data']
+            return decode(data) if decode is not None else data
+    except (OSError, ValueError, TypeError, KeyError):
+        pass
+    data = build(path)
+    try:
+        tmp = '%s.%d.tmp' % (cache_path, os.getpid())
+        with open(tmp, 'w') as f:
+            f.write(unifi_json.dumps({'key': key, 'data': data}))
+        os.replace(tmp, cache_path)
+        log.debug('saved %s to cache %s' % (path, cache_path))
+    except (OSError, ValueError, TypeError) as e:
+        log.debug('unable to save cache %s: %s' % (cache_path, e))
+    return data
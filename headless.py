@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+#
+# headless.py
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+
+'''
+Headless render backend for unifi.py
+
+Implements the parts of the Grx (and GLib) API that unifi.py uses, without a display.
+Draw calls are counted (calls) and optionally recorded (record=True), so rendering cost and
+layout can be measured without a framebuffer, eg in benchmark.py.
+
+Used by render.py when the environment variable UNIFI_HEADLESS is set, or Grx can't be imported.
+Fonts are fixed width, text is font size*0.6 wide and font size*1.2 high.
+'''
+
+from __future__ import print_function
+
+from collections import Counter
+from enum import IntEnum
+
+width = 800     #screen size
+height = 480
+calls = Counter()   #draw call name: count
+record = False      #if True, draw calls are appended to recorded as (name, args)
+recorded = []
+
+def set_size(w, h):
+    global width, height
+    width = w
+    height = h
+
+def reset():
+    '''
+    clear call counts and recorded calls, returns the old counts
+    '''
+    global calls, recorded
+    old = calls
+    calls = Counter()
+    recorded = []
+    return old
+
+def _call(name, *args):
+    calls[name] += 1
+    if record:
+        recorded.append((name, args))
+
+class TextHAlign(IntEnum):
+    LEFT = 0
+    CENTER = 1
+    RIGHT = 2
+
+class TextVAlign(IntEnum):
+    TOP = 0
+    MIDDLE = 1
+    BOTTOM = 2
+    BASELINE = 3
+
+class FontWeight(IntEnum):
+    REGULAR = 400
+    BOLD = 700
+
+class FontSlant(IntEnum):
+    REGULAR = 0
+    ITALIC = 1
+
+class FontWidth(IntEnum):
+    REGULAR = 5
+
+class ColorMode(IntEnum):
+    WRITE = 0
+
+class EgaColorIndex(IntEnum):
+    BLACK = 0
+    BLUE = 1
+    GREEN = 2
+    CYAN = 3
+    RED = 4
+    MAGENTA = 5
+    BROWN = 6
+    LIGHT_GRAY = 7
+    DARK_GRAY = 8
+    LIGHT_BLUE = 9
+    LIGHT_GREEN = 10
+    LIGHT_CYAN = 11
+    LIGHT_RED = 12
+    LIGHT_MAGENTA = 13
+    YELLOW = 14
+    WHITE = 15
+
+class EventType(IntEnum):
+    NONE = 0
+    KEY_DOWN = 1
+    KEY_UP = 2
+    BUTTON_PRESS = 3
+    BUTTON_RELEASE = 4
+    TOUCH_DOWN = 5
+    TOUCH_UP = 6
+
+EGA_COLORS = [(0,0,0), (0,0,170), (0,170,0), (0,170,170), (170,0,0), (170,0,170), (170,85,0), (170,170,170),
+              (85,85,85), (85,85,255), (85,255,85), (85,255,255), (255,85,85), (255,85,255), (255,255,85), (255,255,255)]
+
+def color_get(r, g, b):
+    return (r << 16) | (g << 8) | b
+
+def color_get_ega_colors():
+    return [color_get(*rgb) for rgb in EGA_COLORS]
+
+class Font(object):
+
+    def __init__(self, name, size):
+        self.name = name
+        self.size = size
+        self.char_width = max(1, int(size*0.6))
+        self.char_height = max(1, int(size*1.2))
+
+    @classmethod
+    def load_full(cls, name, size, dpi=-1, weight=FontWeight.REGULAR, slant=FontSlant.REGULAR, width=FontWidth.REGULAR, monospace=True, encoding=None):
+        return cls(name, size)
+
+    def get_text_width(self, text):
+        return len(str(text))*self.char_width
+
+    def get_text_height(self, text):
+        return self.char_height
+
+class TextOptions(object):
+
+    def __init__(self, font, fg_color, bg_color, h_align, v_align):
+        self.font = font
+        self.fg_color = fg_color
+        self.bg_color = bg_color
+        self.h_align = h_align
+        self.v_align = v_align
+
+    @classmethod
+    def new_full(cls, font, fg_color, bg_color, h_align, v_align):
+        return cls(font, fg_color, bg_color, h_align, v_align)
+
+    def get_font(self):
+        return self.font
+
+    def get_fg_color(self):
+        return self.fg_color
+
+    def get_bg_color(self):
+        return self.bg_color
+
+    def get_h_align(self):
+        return self.h_align
+
+    def get_v_align(self):
+        return self.v_align
+
+    def set_fg_color(self, color):
+        self.fg_color = color
+
+    def set_bg_color(self, color):
+        self.bg_color = color
+
+    def set_h_align(self, align):
+        self.h_align = align
+
+    def set_v_align(self, align):
+        self.v_align = align
+
+class LineOptions(object):
+
+    def __init__(self):
+        self.color = 0
+        self.width = 1
+        self.n_dash_patterns = 0
+        self.dash_pattern0 = 0
+        self.dash_pattern1 = 0
+
+class Point(object):
+
+    def __init__(self):
+        self.x = 0
+        self.y = 0
+
+class Context(object):
+
+    def __init__(self, w, h):
+        self.width = w
+        self.height = h
+
+    @classmethod
+    def new(cls, w, h, mem=None, where=None):
+        return cls(w, h)
+
+_screen = Context(width, height)
+_current = _screen
+
+def get_screen_context():
+    return _screen
+
+def set_current_context(context):
+    global _current
+    _current = context
+
+def get_current_context():
+    return _current
+
+def get_width():
+    return width
+
+def get_height():
+    return height
+
+def mouse_set_cursor(cursor):
+    pass
+
+def user_set_window(x1, y1, x2, y2):
+    pass
+
+def clear_context(color):
+    _call('clear_context', color)
+
+def bit_blt(x, y, src, x1, y1, x2, y2, op):
+    _call('bit_blt', x, y, x1, y1, x2, y2)
+
+def draw_text(text, x, y, options):
+    _call('draw_text', text, x, y)
+
+def draw_box(x1, y1, x2, y2, color):
+    _call('draw_box', x1, y1, x2, y2, color)
+
+def draw_filled_box(x1, y1, x2, y2, color):
+    _call('draw_filled_box', x1, y1, x2, y2, color)
+
+def draw_rounded_box(x1, y1, x2, y2, r, color):
+    _call('draw_rounded_box', x1, y1, x2, y2, color)
+
+def draw_filled_rounded_box(x1, y1, x2, y2, r, color):
+    _call('draw_filled_rounded_box', x1, y1, x2, y2, color)
+
+def draw_filled_circle(x, y, r, color):
+    _call('draw_filled_circle', x, y, r, color)
+
+def draw_filled_polygon(points, color):
+    _call('draw_filled_polygon', tuple((p.x, p.y) for p in points), color)
+
+def draw_line_with_options(x1, y1, x2, y2, options):
+    _call('draw_line_with_options', x1, y1, x2, y2, options.color)
+
+class Application(object):
+    '''
+    stands in for Grx.Application, there is no main loop, so run() returns immediately
+    '''
+
+    def init(self, cancellable=None):
+        return True
+
+    def hold(self):
+        pass
+
+    def release(self):
+        pass
+
+    def run(self, argv=None):
+        return 0
+
+class GLib(object):
+    '''
+    stands in for the parts of GLib used by unifi.py, nothing is scheduled
+    '''
+    SOURCE_CONTINUE = True
+    SOURCE_REMOVE = False
+    PRIORITY_DEFAULT = 0
+
+    class IOCondition(IntEnum):
+        IN = 1
+
+    class IOChannel(object):
+        @staticmethod
+        def unix_new(fd):
+            return fd
+
+    @staticmethod
+    def timeout_add_seconds(interval, function, *args):
+        return 0
+
+    @staticmethod
+    def timeout_add(interval, function, *args):
+        return 0
+
+    @staticmethod
+    def io_add_watch(channel, priority, condition, function, *args):
+        return 0
+
+    @staticmethod
+    def set_prgname(name):
+        pass
+
+    @staticmethod
+    def set_application_name(name):
+        pass
@@ -0,0 +1,365 @@
+#!/usr/bin/env python3
+#
+# layout.py
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+
+'''
+Layout (geometry) engine for unifi.py
+
+Works out port counts, rows and device sizes from the models database, and the size, spacing and
+number of extra text lines of auto laid out AP's. Pure functions, no drawing (does not need Grx),
+so AP's can be laid out without creating them first.
+
+GridIndex finds the devices (or ports) at a point on the screen (touch) without checking them all.
+'''
+
+from __future__ import print_function
+
+from collections import OrderedDict
+
+import logging
+
+log = logging.getLogger('Main')
+
+def ports_list_decode(ports):
+    '''
+    returns list of port numbers from int (number of ports), list or string range eg '1-8'
+    '''
+    ports_list = []
+    if isinstance(ports, int):
+        ports_list = [x for x in range(1,ports+1,1)]
+    if isinstance(ports, list):
+        ports_list = ports
+    if isinstance(ports, str):
+        ports_string_list = ports.split('-')
+        ports_list = [x for x in range(int(ports_string_list[0]),int(ports_string_list[-1])+1,1)]
+
+    return ports_list
+
+def extract_ports_list(ports):    #get_models.py has updated version
+    '''
+    returns ports list from unifi data as tuple of lists of port number ints
+    eg ([0,1,2,3], [4,5],[])
+    (standard []. sfp[], sfp_plus[])
+    NOTE, USG's start at port 0, but switches start at port 1.
+    '''
+    standard = []
+    sfp = []
+    sfp_plus = []
+    if isinstance(ports, (list, dict)):
+        standard = [x for x in range(len(ports))]
+    if ports.get('standard'):
+        standard = ports_list_decode(ports['standard'])
+    if ports.get('sfp'):
+        sfp = ports_list_decode(ports['sfp'])
+    if ports.get('plus'):
+        sfp_plus = ports_list_decode(ports['plus'])
+
+    return standard, sfp, sfp_plus
+
+def decode_layout(layout):
+    '''
+    returns unifi diagram as {row: [port numbers]}, -1 is a separator, -2 an empty port space
+    '''
+    diagram = OrderedDict()
+    for row, port in enumerate(layout):
+        ports = port.split(' ')
+        diagram[row] = []
+        for index, p in enumerate(ports):
+            if row > 0:
+                if diagram[row-1][index] == -1 and p.isdigit():
+                    diagram[row-1][index] = -2  #set port as empty port space, not separator
+            diagram[row].append(int(p) if p.isdigit() else -1)
+
+    return diagram
+
+def diagram_port_map(unifi_data):
+    '''
+    returns (min_port, {port number: (row, column, port_type, sfp_offset_enable)}) from unifi diagram, in drawing order
+    min_port is the lowest port number in the diagram (UGW's start at 0), port numbers in the map always start at 1
+    returns (None, None) if there are no port lists to match the diagram to
+    '''
+    standard, sfp, sfp_plus = (frozenset(ports) for ports in extract_ports_list(unifi_data.get('ports') or {}))
+    if not (standard or sfp or sfp_plus):
+        return None, None
+    diagram = decode_layout(unifi_data['diagram'])
+    #figure out min port number, because they don't match up in the Unifi scheme
+    min_port = min([min(filter(lambda a: a >= 0, x)) for x in diagram.values()])
+    min_in_ports = min(standard|sfp|sfp_plus) # UGW start at port 0, Switches etc start at 1, AP's don't have port lists..
+    port_offset =  min_port - min_in_ports #always start ports at 1 (avoid 0/1 confusion)
+    port_map = OrderedDict()
+    for row, ports in diagram.items():
+        column = 0
+        sfp_offset_enable = False
+        prev_port_type = None
+        for port in ports:
+            if port == -2:  #spacer port, add column, but don't draw port
+                column+=1
+                continue
+            elif port-port_offset in standard:
+                port_type = 0
+            elif port-port_offset in sfp:
+                port_type = 1
+            elif port-port_offset in sfp_plus:
+                port_type = 2
+            else:
+                port_type = -1  #probably -1, ie delimiter between different port types, so don't increment column if port type changes (port types less than 0 are not drawn)
+            if prev_port_type is not None and prev_port_type != port_type:
+                sfp_offset_enable = True
+                if prev_port_type == -1:
+                    column -=1
+            prev_port_type = port_type
+            if port_type >= 0:
+                port_map[port+1 if min_port == 0 else port] = (row, column, port_type, sfp_offset_enable)
+            column+=1
+    return min_port, port_map
+
+def model_metrics(models, model, ports, sfp=0, sfp_plus=0, poe=False, type='usw'):
+    '''
+    returns dict of port counts, rows and width (in ports) of model, from models database
+    'description' is None if the model is not in the database (parameters are guessed from the number of ports)
+    '''
+    metrics = {'description': None, 'unifi_data': None, 'max_power': 0, 'num_ports': ports, 'sfp_offset': 0}
+    entry = models.get(model)
+    if entry is not None:
+        metrics['description'] = entry['name']
+        metrics['unifi_data'] = entry.get('unifi', None)  #get unifi data (extracted from controller) if it exists in database
+        if isinstance(entry.get('ports'), dict):
+            metrics['num_ports'] = entry['ports'].get('number',0)
+            metrics['rows'] = entry['ports'].get('rows',1)
+        else:
+            metrics['rows'] = 1
+        metrics['poe'] = entry.get('poe', False)
+        if isinstance(entry.get('sfp'), dict):
+            metrics['sfp'] = entry['sfp'].get('number', 0)
+            metrics['sfp_rows'] = entry['sfp'].get('rows', 0)
+        else:
+            metrics['sfp'] = metrics['sfp_rows'] = 0
+        if isinstance(entry.get('sfp+'), dict):
+            metrics['sfp_plus'] = entry['sfp+'].get('number', 0)
+            metrics['sfp_plus_rows'] = entry['sfp+'].get('rows', 0)
+        else:
+            metrics['sfp_plus'] = metrics['sfp_plus_rows'] = 0
+        metrics['order'] = entry.get('order', [0,2,1])    #order is 0=standard, 2=sfp+, 1=sfp
+        metrics['max_rows'] = max(metrics['rows'], metrics['sfp_rows'], metrics['sfp_plus_rows'])
+    else:
+        rows = 2 if ports > 12 else 1
+        metrics.update({'sfp': sfp, 'sfp_plus': sfp_plus, 'poe': poe, 'rows': rows, 'sfp_rows': rows,
+                        'sfp_plus_rows': rows, 'max_rows': rows, 'order': [0,2,1]})
+
+    metrics['org_num_ports'] = metrics['num_ports']
+    metrics['total_ports'] = ports    #reported total number of ports including sfp ports
+    unifi_data = metrics['unifi_data']
+
+    if unifi_data and unifi_data.get('ports') and model != 'UGWXG':    #special handling for UGWXG because it's weird
+        #use unifi port data to draw device if available
+        standard, sfp_ports, sfp_plus_ports = extract_ports_list(unifi_data['ports'])
+        metrics['org_num_ports'] = metrics['num_ports'] = len(standard)
+        if type == 'uap':
+            #UAP's don't normally have ports data in the database, except In-Wall devices, which miss out the uplink port (so add it back in)
+            metrics['num_ports'] += 1
+        metrics['sfp'] = len(sfp_ports)
+        metrics['sfp_plus'] = len(sfp_plus_ports)
+        metrics['total_ports'] = metrics['num_ports'] + metrics['sfp'] + metrics['sfp_plus']
+
+    if unifi_data and unifi_data.get("power"):
+        metrics['max_power'] = unifi_data["power"].get("capacity",0)
+
+    if unifi_data and unifi_data.get('diagram') and model != 'UGWXG':    #special handling for UGWXG because it's weird
+        #use the diagram is there is one to figure out overall size
+        diagram = unifi_data["diagram"]
+        metrics['max_rows'] = metrics['rows'] = metrics['sfp_rows'] = metrics['sfp_plus_rows'] = len(diagram)
+        max_ports_in_row = 0
+        for row, row_ports in decode_layout(diagram).items():
+            real_ports = [x for x in row_ports if x != -1]
+            max_ports_in_row = max(max_ports_in_row, len(real_ports))
+        metrics['device_ports_width'] = max_ports_in_row
+        metrics['sfp_offset'] = 10
+    else:
+        #default symmetrical device
+        device_ports_width = 0
+        if metrics['num_ports'] > 0:
+            device_ports_width += metrics['num_ports']//metrics['rows']
+        if metrics['sfp'] > 0:
+            device_ports_width += metrics['sfp']//metrics['sfp_rows']
+            metrics['sfp_offset'] = 10
+        if metrics['sfp_plus'] > 0:
+            device_ports_width += metrics['sfp_plus']//metrics['sfp_plus_rows']
+            metrics['sfp_offset'] = 10
+        metrics['device_ports_width'] = device_ports_width
+
+    return metrics
+
+def port_offsets(port_size, num_ports, text_width, text_height, x_offset=8, y_offset=14, y_lines_text=1):
+    '''
+    returns (port_size, x_offset, y_offset) - port size and distance from outline to ports
+    '''
+    if not port_size:
+        port_size = text_width*5   #5 characters wide default for ports (will be overridden by auto scaling later, but this is the stating point)
+    y_offset += (y_lines_text+1)*text_height
+    if port_size > 100 and num_ports == 1:
+        #if we only have 1 large port increase overall width
+        x_offset += port_size//2
+    return port_size, x_offset, y_offset
+
+def fit_port_size(port_size, space, count, spacing):
+    '''
+    largest port size (not more than port_size) where count ports, spacing apart, are less than space
+    ie (port_size+spacing)*count < space
+    if count is 0, the ports don't take any space, so port_size is returned
+    '''
+    if count <= 0:
+        return port_size
+    return min(port_size, (space-1)//count - spacing)
+
+def device_geometry(x, y, ports_width, max_rows, sfp_offset, port_size, x_offset, y_offset, h_spacing, v_spacing, text_height, screen_width, screen_height):
+    '''
+    returns dict of device position and size (x, port_size, device_right, device_bottom), with ports shrunk to fit the device on the screen
+    x of None centres the device, negative x is the margin from the right edge of the screen
+    '''
+    geometry = {}
+    width = sfp_offset + 2*x_offset
+    if x is None:
+        x = max(0, screen_width//2 - (ports_width * (port_size+h_spacing) + width)//2)
+    if x < 0:  #auto position x from right edge
+        geometry['x_right_margin'] = -x
+        x = max(0, screen_width - (ports_width * (port_size+h_spacing) + width - x))
+
+    top = y+y_offset-text_height//2
+    port_size = fit_port_size(port_size, screen_width-(x+width), ports_width, h_spacing)
+    port_size = fit_port_size(port_size, screen_height-top, max_rows, v_spacing)
+    device_bottom = top+(port_size+v_spacing)*max_rows
+    device_right = x+width+(port_size+h_spacing)*ports_width
+
+    geometry.update({'x': x, 'port_size': port_size, 'device_right': device_right, 'device_bottom': device_bottom})
+    return geometry
+
+def ap_geometry(models, model, ports, x, y, port_size, text_lines, text_width, text_height, screen_width, screen_height):
+    '''
+    returns (metrics, geometry) of a UAP as it would be created at x, y
+    '''
+    metrics = model_metrics(models, model, ports, type='uap')
+    x_offset = 16 if ports == 1 else 8  #make single port AP's a bit wider (so we can fit more text in)
+    port_size, x_offset, y_offset = port_offsets(port_size, metrics['num_ports'], text_width, text_height, x_offset, 14, text_lines)
+    geometry = device_geometry(x, y, metrics['device_ports_width'], metrics['max_rows'], metrics['sfp_offset'], port_size, x_offset, y_offset,
+                               3, text_height+2, text_height, screen_width, screen_height)
+    return metrics, geometry
+
+def _ap_row(models, aps, x, y, port_size, spacing, text_lines, text_width, text_height, screen_width, screen_height):
+    '''
+    lays out a row of AP's from x, spacing apart
+    returns (port size, number of ports, number of single port AP's, margin, bottom, right)
+    '''
+    new_port_size = ap_ports = ap_single_ports = ap_margin = device_bottom = 0
+    last_ap_x_pos = None
+    for model, ports in aps:
+        metrics, geometry = ap_geometry(models, model, ports, x, y, port_size, text_lines, text_width, text_height, screen_width, screen_height)
+        new_port_size = geometry['port_size']
+        ap_ports += metrics['num_ports']
+        if metrics['num_ports'] == 1:
+            ap_single_ports += 1
+        device_bottom = geometry['device_bottom']
+        if x is not None:
+            ap_margin += (geometry['device_right']-x)-(metrics['num_ports']*new_port_size)+spacing
+        last_ap_x_pos = geometry['device_right']
+        x = last_ap_x_pos + spacing
+    return new_port_size, ap_ports, ap_single_ports, ap_margin, device_bottom, last_ap_x_pos
+
+def ap_layout(models, aps, x, y, port_size, min_port_size, text_lines, extra_text, text_width, text_height, screen_width, screen_height, fill_text=False):
+    '''
+    auto layout of a row of AP's across the screen
+    aps is list of (model, number of ports) in the order they are drawn, x, y is the position of the first AP
+    min_port_size of 0 means find the port size that fills the screen (else port_size/min_port_size is used)
+    fill_text adds extra text lines to AP's if there is space below them
+    returns dict of x (of first AP), spacing, min_port_size, text_lines and extra_text (extra text lines)
+    if there are no AP's, nothing is laid out, spacing is None and the rest are returned unchanged
+    '''
+    if len(aps) == 0:
+        return {'x': x, 'spacing': None, 'min_port_size': min_port_size, 'text_lines': text_lines, 'extra_text': extra_text}
+    spacing = text_width//2
+    port_size = max(port_size, min_port_size)
+    new_port_size, ap_ports, ap_single_ports, ap_margin, device_bottom, last_ap_x_pos = _ap_row(models, aps, x, y, port_size, spacing, text_lines+extra_text,
+                                                                                                text_width, text_height, screen_width, screen_height)
+
+    if min_port_size == 0:
+        #find new port size that fits available space
+        ap_margin-=spacing
+        right_target = new_port_size+(screen_width-last_ap_x_pos)//max(1, ap_ports)
+        if right_target > 100 and ap_single_ports > 0:
+            #if we only have 1 large port overall width is increased by port_width//2 (on either side)
+            right = x + ap_margin + ((right_target)*ap_single_ports + right_target*ap_ports)
+            while right > screen_width:
+                right_target-=1
+                right = x + ap_margin + (right_target*ap_ports)
+                if right_target > 100:
+                    right += right_target*ap_single_ports
+
+        bottom_target = new_port_size+(screen_height-device_bottom)-text_height//2
+        min_port_size = min(bottom_target,right_target)
+
+        #if we have room for extra text
+        if bottom_target > right_target and fill_text:
+            extra_text = (bottom_target - right_target)//text_height
+
+        #minimum port size 4 chars!
+        if min_port_size < text_width*4:
+            text_lines = 1
+            min_port_size = text_width*4
+
+        log.info('Recalculated Port Size: total number of ports: %s, ap_margin: %s, b_target: %s, r_target: %s, new port size: %s' % (ap_ports,ap_margin,bottom_target, right_target,min_port_size))
+        #lay out the resized AP's to find the spacing
+        port_size = max(port_size, min_port_size)
+        last_ap_x_pos = _ap_row(models, aps, x, y, port_size, spacing, text_lines+extra_text, text_width, text_height, screen_width, screen_height)[-1]
+
+    #calculate spacing of ap's evenly across display
+    num_aps = len(aps)
+    min_spacing = max(0,(last_ap_x_pos - x)//(num_aps+1))
+    new_x = screen_width//2 - ((last_ap_x_pos - x)//2)
+
+    if num_aps < 2:
+        spacing = min_spacing
+        x = new_x
+    else:
+        spacing = min(min_spacing,((screen_width - x - last_ap_x_pos)//(num_aps-1)) + text_width//2)
+        x = new_x - ((spacing-text_width//2)*(num_aps-1)//2)
+    log.info('AP layout - last x pos: %s, x: %s, spacing: %s, port size: %s, extra text: %s' % (last_ap_x_pos, x, spacing, min_port_size, extra_text))
+
+    return {'x': x, 'spacing': spacing, 'min_port_size': min_port_size, 'text_lines': text_lines, 'extra_text': extra_text}
+
+class GridIndex(object):
+    '''
+    rectangles bucketed in a grid of cell x cell squares, find(x, y) only checks the rectangles in the square x, y is in
+    '''
+
+    def __init__(self, cell=64):
+        self.cell = max(1, cell)
+        self.cells = {}     #(column, row): [(x1, y1, x2, y2, item)]
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def insert(self, x1, y1, x2, y2, item):
+        entry = (x1, y1, x2, y2, item)
+        for column in range(int(x1)//self.cell, int(x2)//self.cell+1):
+            for row in range(int(y1)//self.cell, int(y2)//self.cell+1):
+                self.cells.setdefault((column, row), []).append(entry)
+        self.count += 1
+
+    def find(self, x, y):
+        '''
+        items whose rectangle contains x, y (edges included), in the order they were inserted
+        '''
+        return [item for x1, y1, x2, y2, item in self.cells.get((int(x)//self.cell, int(y)//self.cell), ()) if x1 <= x <= x2 and y1 <= y <= y2]
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+#
+# layout_config.py
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+
+'''
+Parser for the custom layout file used by unifi.py (see custom.ini)
+
+Device entries are (x, y, port_size, text_lines), these are parsed and checked against SCHEMA
+(no eval), anything else is reported and ignored. Plain numbers in a device section
+(eg switch_port_size = 40) are variables for ${...} interpolation, not devices.
+
+The parsed layout is cached (file_cache.py) until the file is modified.
+'''
+
+from __future__ import print_function
+
+import re
+from collections import OrderedDict
+try:
+    import configparser
+except ImportError:
+    import ConfigParser as configparser
+
+import file_cache
+
+import logging
+
+log = logging.getLogger('Main')
+
+VERSION = 1     #change if the parsed format changes, to invalidate cached layouts
+
+SECTIONS = ('ugw', 'udm', 'usw', 'uap')
+DEFAULTS = ('font_size', 'x_update_pos', 'y_update_pos', 'update_font_size')
+
+#field name, minimum value (None = any, negative x is an indent from the right)
+SCHEMA = (  ('x', None),
+            ('y', 0),
+            ('port_size', 0),
+            ('text_lines', 0),
+         )
+
+INTEGER = re.compile(r'^\s*-?\d+\s*$')
+TUPLE = re.compile(r'^\s*\((.*)\)\s*$')
+
+class LayoutConfigError(ValueError):
+    pass
+
+def parse_int(value, name='value'):
+    if not INTEGER.match(value):
+        raise LayoutConfigError('%s must be a whole number, got: %s' % (name, value))
+    return int(value)
+
+def parse_layout(value):
+    '''
+    parse device entry value "(x, y, port_size, text_lines)", returns tuple of int's
+    returns an int if value is a single number (a variable)
+    '''
+    if '=' in value:    #'(' is a delimiter, so "id (description) = (x,y,port_size,text_lines)" gives "description) = (x,y..."
+        value = value.split('=')[1].strip()
+    if INTEGER.match(value):
+        return int(value)
+    match = TUPLE.match(value)
+    if match is None:
+        raise LayoutConfigError('expected (%s), got: %s' % (', '.join(name for name, minimum in SCHEMA), value))
+    fields = match.group(1).split(',')
+    if len(fields) != len(SCHEMA):
+        raise LayoutConfigError('expected %d values (%s), got: %s' % (len(SCHEMA), ', '.join(name for name, minimum in SCHEMA), value))
+    layout = []
+    for (name, minimum), field in zip(SCHEMA, fields):
+        number = parse_int(field, name)
+        if minimum is not None and number < minimum:
+            raise LayoutConfigError('%s must be %d or more, got: %s' % (name, minimum, number))
+        layout.append(number)
+    return tuple(layout)
+
+def parse(file):
+    '''
+    parse custom layout file, returns {'default':{name: int}, 'ugw':{key: (x, y, port_size, text_lines)}, 'udm':...}
+    sections not in the file are not included, invalid entries are logged and left out
+    '''
+    config = configparser.ConfigParser(delimiters=('=', '('), interpolation=configparser.ExtendedInterpolation())
+    if not config.read(file):
+        raise LayoutConfigError('unable to read %s' % file)
+    layout = {}
+    if 'default' in config:
+        layout['default'] = {}
+        for name, value in config['default'].items():
+            if name not in DEFAULTS:
+                log.warning('%s: [default] unknown setting %s ignored' % (file, name))
+                continue
+            try:
+                layout['default'][name] = parse_int(value, name)
+            except LayoutConfigError as e:
+                log.error('%s: [default] %s' % (file, e))
+    for section in SECTIONS:
+        if section not in config:
+            continue
+        layout[section] = OrderedDict()
+        for key in config[section]:
+            try:
+                device = parse_layout(config[section][key])
+            except (LayoutConfigError, configparser.InterpolationError) as e:
+                log.error('%s: [%s] %s ignored: %s' % (file, section, key, e))
+                continue
+            if isinstance(device, tuple):
+                layout[section][key] = device
+            else:
+                log.debug('%s: [%s] variable %s = %s' % (file, section, key, device))
+    return layout
+
+def from_cache(layout):
+    '''
+    layout read from the (JSON) cache, device entries back to tuples in file order
+    '''
+    for section in SECTIONS:
+        if section in layout:
+            layout[section] = OrderedDict((key, tuple(device)) for key, device in layout[section].items())
+    return layout
+
+def load(file):
+    '''
+    parsed custom layout file, from the cache if the file has not changed
+    '''
+    return file_cache.load(file, parse, VERSION, decode=from_cache)
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+#
+# model_registry.py
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+
+'''
+Device models database shared by all device classes in unifi.py
+
+models.json is read once per process (and cached in models.json.cache by file_cache.py until
+it is modified). Each model used is resolved once into a ModelDescriptor (port counts, rows, order,
+decoded diagram and port map, PoE capacity), the same descriptor is shared by every device of that model.
+Descriptors are read only.
+'''
+
+from __future__ import print_function
+
+import os
+from collections import namedtuple
+
+import unifi_json
+import file_cache
+import layout
+
+import logging
+
+log = logging.getLogger('Main')
+
+VERSION = 1     #change if the cached format changes
+
+#fields are the same as layout.model_metrics(), plus
+#diagram: unifi diagram as tuple of rows of port numbers (see layout.decode_layout())
+#port_map: {port number: (row, column, port_type, sfp_offset_enable)} to draw ports from the diagram, min_port: lowest port number in the diagram
+#these are None if the model doesn't have a diagram
+ModelDescriptor = namedtuple('ModelDescriptor', [ 'description', 'unifi_data', 'max_power', 'num_ports', 'org_num_ports', 'total_ports',
+                                                  'rows', 'sfp', 'sfp_rows', 'sfp_plus', 'sfp_plus_rows', 'max_rows', 'order', 'poe',
+                                                  'device_ports_width', 'sfp_offset', 'diagram', 'port_map', 'min_port'])
+
+def read_json(file):
+    with open(file, 'rb') as f:
+        return unifi_json.loads(f.read())
+
+class ModelRegistry(object):
+    '''
+    models.json, loaded the first time it's used, and descriptors of the models used
+    '''
+
+    def __init__(self, file='models.json'):
+        self.file = file
+        self.data = None        #{'USW': {model: entry}, 'UGW':...} from file
+        self.descriptors = {}   #(type, model, ports, sfp, sfp_plus, poe): ModelDescriptor
+
+    def load(self):
+        if self.data is None:
+            self.data = {}
+            if os.path.isfile(self.file):
+                try:
+                    self.data = file_cache.load(self.file, read_json, VERSION)
+                except Exception as e:
+                    log.exception('Error loading models file: %s' % e)
+        return self.data
+
+    def models(self, type):
+        '''
+        models of type ('usw', 'ugw', 'udm' or 'uap') from file
+        '''
+        return self.load().get(type.upper(), None) or {}
+
+    def descriptor(self, models, model, ports=0, sfp=0, sfp_plus=0, poe=False, type='usw'):
+        '''
+        ModelDescriptor of model (from models, which is the device class models) for a device reporting ports, sfp etc.
+        description is None if the model is not in models
+        '''
+        key = (type, model, ports, sfp, sfp_plus, poe)
+        descriptor = self.descriptors.get(key)
+        if descriptor is None:
+            metrics = layout.model_metrics(models, model, ports, sfp, sfp_plus, poe, type)
+            metrics['order'] = tuple(metrics['order'])
+            unifi_data = metrics['unifi_data']
+            diagram = port_map = min_port = None
+            if unifi_data and unifi_data.get('diagram'):
+                diagram = tuple(tuple(row) for row in layout.decode_layout(unifi_data['diagram']).values())
+                if model != 'UGWXG':    #special handling for UGWXG because it's weird
+                    min_port, port_map = layout.diagram_port_map(unifi_data)
+            descriptor = self.descriptors[key] = ModelDescriptor(diagram=diagram, port_map=port_map, min_port=min_port, **metrics)
+        return descriptor
+
+registry = ModelRegistry()
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+#
+# port_stats.py
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+
+#need to install numpy (pip install numpy)
+
+'''
+Columnar store of per port counters, used by UnifiClient to calculate per port rates.
+
+Keeps the last 'samples' values of each counter in FIELDS for every (device, port) in a NumPy ring buffer,
+and on every device update recalculates (vectorized) the current rate (change since the previous sample)
+and the moving average rate (change over all samples kept), in units per second.
+
+Ports are identified by 'port_idx' (switches, AP's) or 'ifname' (USG/UDM).
+'''
+
+from __future__ import print_function
+
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+import logging
+
+log = logging.getLogger('Main')
+
+class PortStats(object):
+
+    FIELDS = ('rx_bytes', 'tx_bytes', 'rx_errors', 'tx_errors', 'rx_dropped', 'tx_dropped')
+
+    def __init__(self, samples=10, ports=64, devices=16):
+        self.samples = max(2, samples)
+        self.lock = threading.Lock()
+        self.devices = OrderedDict()    #device_id: row
+        self.names = []                 #row: device name
+        self.columns = []               #row: {port: column}
+        self.ports = []                 #row: [port for each column]
+        #ring buffer of counters, (device, port, sample, field)
+        self.counters = np.zeros((devices, ports, self.samples, len(self.FIELDS)))
+        self.times = np.zeros((devices, self.samples))
+        self.head = np.zeros(devices, dtype=int)    #next sample to write
+        self.count = np.zeros(devices, dtype=int)   #number of samples stored
+        #results, (device, port, field)
+        self.rates = np.zeros((devices, ports, len(self.FIELDS)))
+        self.averages = np.zeros((devices, ports, len(self.FIELDS)))
+
+    def _grow(self, devices, ports):
+        '''
+        resize arrays to hold at least devices x ports (doubling)
+        '''
+        old_devices, old_ports = self.counters.shape[:2]
+        new_devices = old_devices
+        new_ports = old_ports
+        while new_devices < devices:
+            new_devices *= 2
+        while new_ports < ports:
+            new_ports *= 2
+        if (new_devices, new_ports) == (old_devices, old_ports):
+            return
+        log.debug('PortStats: resizing to %d devices, %d ports' % (new_devices, new_ports))
+        counters = np.zeros((new_devices, new_ports, self.samples, len(self.FIELDS)))
+        counters[:old_devices, :old_ports] = self.counters
+        self.counters = counters
+        for name in ['rates', 'averages']:
+            array = np.zeros((new_devices, new_ports, len(self.FIELDS)))
+            array[:old_devices, :old_ports] = getattr(self, name)
+            setattr(self, name, array)
+        self.times = np.concatenate([self.times, np.zeros((new_devices-old_devices, self.samples))])
+        self.head = np.concatenate([self.head, np.zeros(new_devices-old_devices, dtype=int)])
+        self.count = np.concatenate([self.count, np.zeros(new_devices-old_devices, dtype=int)])
+
+    def _row(self, device_id, name):
+        row = self.devices.get(device_id)
+        if row is None:
+            row = self.devices[device_id] = len(self.names)
+            self.names.append(name)
+            self.columns.append({})
+            self.ports.append([])
+            self._grow(row+1, 0)
+        return row
+
+    def update(self, device, timestamp=None):
+        '''
+        add a sample of the port counters in device["port_table"], and recalculate rates for the device
+        '''
+        port_table = device.get("port_table")
+        if not port_table:
+            return
+        if timestamp is None:
+            timestamp = time.time()
+        with self.lock:
+            row = self._row(device["_id"], device.get("name", device["_id"]))
+            columns = self.columns[row]
+            index = []
+            for port in port_table:
+                key = port.get("port_idx", port.get("ifname"))
+                column = columns.get(key)
+                if column is None:
+                    column = columns[key] = len(columns)
+                    self.ports[row].append(key)
+                index.append(column)
+            self._grow(0, len(columns))
+            values = np.array([[port.get(field, 0) or 0 for field in self.FIELDS] for port in port_table], dtype=float)
+
+            head = self.head[row]
+            self.counters[row, :, head] = 0
+            self.counters[row, index, head] = values
+            self.times[row, head] = timestamp
+            self.head[row] = (head + 1) % self.samples
+            self.count[row] = min(self.count[row] + 1, self.samples)
+            self._calculate(row)
+
+    def _calculate(self, row):
+        count = self.count[row]
+        if count < 2:
+            return
+        last = (self.head[row] - 1) % self.samples
+        previous = (last - 1) % self.samples
+        oldest = (last - count + 1) % self.samples
+        counters = self.counters[row]
+        times = self.times[row]
+        #counters going backwards (device rebooted/counters reset) gives a rate of 0
+        self.rates[row] = np.clip(counters[:, last] - counters[:, previous], 0, None) / max(times[last] - times[previous], 1e-3)
+        self.averages[row] = np.clip(counters[:, last] - counters[:, oldest], 0, None) / max(times[last] - times[oldest], 1e-3)
+
+    def _port_dict(self, array, device_id):
+        row = self.devices.get(device_id)
+        if row is None:
+            return {}
+        return OrderedDict((port, dict(zip(self.FIELDS, array[row, column].tolist()))) for port, column in self.columns[row].items())
+
+    def port_rates(self, device_id):
+        '''
+        returns {port: {field: rate/s}} of the last sample for device_id
+        '''
+        with self.lock:
+            return self._port_dict(self.rates, device_id)
+
+    def port_averages(self, device_id):
+        '''
+        returns {port: {field: rate/s}} averaged over all samples kept for device_id
+        '''
+        with self.lock:
+            return self._port_dict(self.averages, device_id)
+
+    def busiest(self, n=10, fields=('rx_bytes', 'tx_bytes'), average=False):
+        '''
+        returns list of the n busiest ports across all devices (sum of fields rate/s) as
+        [(device_id, device name, port, rate)] highest rate first
+        '''
+        with self.lock:
+            rows = len(self.names)
+            if rows == 0:
+                return []
+            array = self.averages if average else self.rates
+            total = array[:rows, :, [self.FIELDS.index(field) for field in fields]].sum(axis=2)
+            #columns beyond each device's ports are unused, never pick them
+            used = np.arange(array.shape[1]) < np.array([len(ports) for ports in self.ports])[:, None]
+            total[~used] = -np.inf
+            total = total.ravel()
+            n = min(n, int(used.sum()))
+            if n == 0:
+                return []
+            top = np.argpartition(-total, n-1)[:n]
+            top = top[np.argsort(-total[top])]
+            device_ids = list(self.devices.keys())
+            result = []
+            for index in top:
+                row, column = divmod(int(index), array.shape[1])
+                result.append((device_ids[row], self.names[row], self.ports[row][column], float(total[index])))
+            return result
@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+#
+# render.py
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+
+'''
+Offscreen rendering for unifi.py
+
+Everything is drawn into a screen sized memory context (back buffer) instead of the screen.
+Each device (and the update/key display) is a layer, drawing marks the area drawn as damaged in
+the layer, and flush() copies one rectangle (the union of the damaged areas) per damaged layer
+to the screen. A full redraw of a device is a single blit. The back buffer can be saved and restored (the normal
+display is saved while a device is zoomed in).
+
+Text and line options are cached (options), so they are not allocated on every draw.
+
+Device outlines, text and ports that change are not drawn straight away, they are scheduled on a
+FrameScheduler, and drawn once per frame (outlines, then text, then ports) however many times they
+changed in between, optionally limited to max_fps frames per second.
+
+Set the environment variable UNIFI_HEADLESS to draw with the headless backend (headless.py) instead
+of Grx, this is also used if Grx is not installed.
+'''
+
+from __future__ import print_function
+
+import os
+import time
+from collections import OrderedDict
+
+import logging
+
+log = logging.getLogger('Main')
+
+#Grx and GLib are imported from here by unifi.py, so the headless backend can be swapped in
+HEADLESS = bool(os.environ.get('UNIFI_HEADLESS'))
+if not HEADLESS:
+    try:
+        import gi
+        gi.require_version('GLib', '2.0')
+        from gi.repository import GLib
+        gi.require_version('Grx', '3.0')
+        from gi.repository import Grx
+    except (ImportError, ValueError) as e:
+        log.warning('Grx not available (%s), using headless backend' % e)
+        HEADLESS = True
+if HEADLESS:
+    import headless as Grx
+    from headless import GLib
+
+class OptionsCache(object):
+    '''
+    prebuilt Grx.TextOptions and Grx.LineOptions, shared by everything drawn
+    options returned are shared, so must not be modified
+    '''
+
+    def __init__(self):
+        self.text_options = {}
+        self.line_options = {}
+        self.hits = 0
+        self.misses = 0
+
+    def text(self, font, fg_color, bg_color, h_align=Grx.TextHAlign.LEFT, v_align=Grx.TextVAlign.TOP):
+        key = (font, fg_color, bg_color, int(h_align), int(v_align))
+        options = self.text_options.get(key)
+        if options is None:
+            self.misses += 1
+            options = self.text_options[key] = Grx.TextOptions.new_full(font, fg_color, bg_color, h_align, v_align)
+        else:
+            self.hits += 1
+        return options
+
+    def line(self, color, width=1):
+        key = (color, width)
+        options = self.line_options.get(key)
+        if options is None:
+            self.misses += 1
+            options = self.line_options[key] = Grx.LineOptions()
+            options.color = color
+            options.width = width
+        else:
+            self.hits += 1
+        return options
+
+options = OptionsCache()
+
+class Layer(object):
+    '''
+    damaged area of one device (or other item on the display)
+    '''
+
+    def __init__(self, name):
+        self.name = name
+        self.dirty = None   #(x1, y1, x2, y2) or None if nothing to copy
+
+    def damage(self, x1, y1, x2, y2):
+        if self.dirty is None:
+            self.dirty = (x1, y1, x2, y2)
+        else:
+            self.dirty = (min(self.dirty[0], x1), min(self.dirty[1], y1), max(self.dirty[2], x2), max(self.dirty[3], y2))
+
+class GrxCanvas(object):
+    '''
+    back buffer, made the current context so all Grx drawing goes to it
+    '''
+
+    def __init__(self, bg_color):
+        self.width = Grx.get_width()
+        self.height = Grx.get_height()
+        self.screen = Grx.get_screen_context()
+        self.back = Grx.Context.new(self.width, self.height, None, None)
+        if self.back is None:
+            raise MemoryError('Unable to create %dx%d back buffer' % (self.width, self.height))
+        self.layers = OrderedDict()
+        Grx.set_current_context(self.back)
+        Grx.clear_context(bg_color)
+        self.full = True    #copy the whole back buffer on the next flush
+        self.blits = 0      #total number of blits
+        self.saved = None   #copy of the back buffer made by save()
+        self.saved_valid = False
+        self.scratch = None #off screen buffer used by draw_offscreen()
+        log.info('Created %dx%d back buffer' % (self.width, self.height))
+
+    def layer(self, name):
+        layer = self.layers.get(name)
+        if layer is None:
+            layer = self.layers[name] = Layer(name)
+        return layer
+
+    def damage(self, name, x1, y1, x2, y2):
+        '''
+        mark area x1, y1, x2, y2 of layer name as changed
+        '''
+        self.layer(name).damage(x1, y1, x2, y2)
+
+    def invalidate(self):
+        '''
+        the whole back buffer has changed (eg cleared)
+        '''
+        self.full = True
+
+    def save(self):
+        '''
+        copy the back buffer, so it can be put back with restore() (eg the normal display while zoomed in)
+        returns False if there isn't enough memory for the copy
+        '''
+        if self.saved is None:
+            self.saved = Grx.Context.new(self.width, self.height, None, None)
+            if self.saved is None:
+                log.warning('Unable to create %dx%d buffer to save the display' % (self.width, self.height))
+                return False
+        Grx.set_current_context(self.saved)
+        try:
+            Grx.bit_blt(0, 0, self.back, 0, 0, self.width-1, self.height-1, Grx.ColorMode.WRITE)
+        finally:
+            Grx.set_current_context(self.back)
+        self.saved_valid = True
+        return True
+
+    def restore(self):
+        '''
+        copy the back buffer saved by save() back (once), returns False if nothing was saved
+        '''
+        if not self.saved_valid:
+            return False
+        Grx.bit_blt(0, 0, self.saved, 0, 0, self.width-1, self.height-1, Grx.ColorMode.WRITE)
+        self.saved_valid = False
+        self.full = True
+        return True
+
+    def draw_offscreen(self, draw):
+        '''
+        call draw() with an off screen buffer as the current context, so nothing it draws reaches the back buffer
+        or the screen (eg to time drawing), areas it damages are not copied on the next flush
+        returns False if there isn't enough memory for the buffer
+        '''
+        if self.scratch is None:
+            self.scratch = Grx.Context.new(self.width, self.height, None, None)
+            if self.scratch is None:
+                log.warning('Unable to create %dx%d off screen buffer' % (self.width, self.height))
+                return False
+        dirty = {name: layer.dirty for name, layer in self.layers.items()}
+        Grx.set_current_context(self.scratch)
+        try:
+            draw()
+        finally:
+            Grx.set_current_context(self.back)
+            for name, layer in self.layers.items():
+                layer.dirty = dirty.get(name)
+        return True
+
+    def flush(self):
+        '''
+        copy damaged areas to the screen, returns number of blits
+        '''
+        blits = 0
+        Grx.set_current_context(self.screen)
+        try:
+            if self.full:
+                Grx.bit_blt(0, 0, self.back, 0, 0, self.width-1, self.height-1, Grx.ColorMode.WRITE)
+                blits += 1
+            else:
+                for layer in self.layers.values():
+                    if layer.dirty is None:
+                        continue
+                    x1, y1, x2, y2 = layer.dirty
+                    x1 = max(0, x1)
+                    y1 = max(0, y1)
+                    x2 = min(self.width-1, x2)
+                    y2 = min(self.height-1, y2)
+                    if x2 >= x1 and y2 >= y1:
+                        Grx.bit_blt(x1, y1, self.back, x1, y1, x2, y2, Grx.ColorMode.WRITE)
+                        blits += 1
+        finally:
+            Grx.set_current_context(self.back)
+        for layer in self.layers.values():
+            layer.dirty = None
+        self.full = False
+        self.blits += blits
+        if blits:
+            log.debug('flushed %d areas to screen' % blits)
+        return blits
+
+#z order of scheduled draws, lower is drawn first (underneath)
+Z_OUTLINE = 0
+Z_TEXT = 1
+Z_PORT = 2
+
+class FrameScheduler(object):
+    '''
+    draws scheduled since the last frame, each draw (a bound method, eg port.draw_port) is only done once per frame
+    '''
+
+    def __init__(self, max_fps=0):
+        self.max_fps = max_fps  #0 = no limit
+        self.pending = {}       #draw: (z, sequence)
+        self.sequence = 0
+        self.last_frame = None  #time.monotonic() of the last frame drawn
+        self.frames = 0         #total number of frames drawn
+        self.draws = 0          #total number of draws
+        self.coalesced = 0      #total number of draws scheduled again before they were drawn
+
+    def schedule(self, z, draw):
+        if draw in self.pending:
+            self.coalesced += 1
+            return
+        self.sequence += 1
+        self.pending[draw] = (z, self.sequence)
+
+    def clear(self):
+        '''
+        discard scheduled draws (eg the devices have been removed)
+        '''
+        self.pending.clear()
+
+    def wait(self):
+        '''
+        seconds until the next frame can be drawn (0 if it can be drawn now)
+        '''
+        if not self.max_fps or self.last_frame is None:
+            return 0
+        return max(0, self.last_frame + 1.0/self.max_fps - time.monotonic())
+
+    def run(self):
+        '''
+        draw everything scheduled in z order (in the order scheduled within the same z), returns number of draws
+        draws scheduled while drawing (eg ports of a redrawn outline) are drawn in the same frame
+        '''
+        draws = 0
+        while self.pending:
+            pending = sorted(self.pending.items(), key=lambda item: item[1])
+            self.pending = {}
+            for draw, order in pending:
+                draw()
+            draws += len(pending)
+        self.last_frame = time.monotonic()
+        self.frames += 1
+        self.draws += draws
+        if draws:
+            log.debug('frame %d: %d draws' % (self.frames, draws))
+        return draws
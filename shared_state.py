@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+#
+# shared_state.py
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+
+#needs python 3.8 or later (multiprocessing.shared_memory)
+
+'''
+Shared memory device store, used to pass device updates from the UnifiClient worker process to the
+display, without pickling whole device lists through a multiprocessing.Queue (benchmark.py -t compares
+the writer and reader cost of both).
+
+Layout of the shared memory block:
+    header: generation (uint64), number of slots in use (uint32), slot size (uint32)
+    change log: slot numbers (uint32) of the last CHANGE_LOG devices written
+    slots:  generation (uint64), device _id (32 bytes), data length (uint32), padding, data (json)
+
+Each device has it's own slot. Writing a device bumps the slot generation and the store generation (one per
+device written), and records the slot in the change log at generation % CHANGE_LOG. The reader only looks at
+the slots in the change log since the generation it last read (all slots if more than CHANGE_LOG devices have
+been written since), and only decodes slots whose generation has changed since it last read them.
+The store must be created before the worker process is started (so the lock is shared).
+'''
+
+import struct
+from multiprocessing import Lock
+from multiprocessing.shared_memory import SharedMemory
+
+import unifi_json
+from unifi_client import PortRecord, to_json
+
+import logging
+
+log = logging.getLogger('Main')
+
+class SharedDeviceStore(object):
+
+    HEADER = struct.Struct('<QII')
+    SLOT_HEADER = struct.Struct('<Q32sI4x')
+    CHANGE_LOG = 1024
+    LOG_ENTRY = struct.Struct('<I')
+    SLOTS_START = HEADER.size + CHANGE_LOG*LOG_ENTRY.size
+
+    def __init__(self, slots=64, slot_size=128*1024, compact_ports=True):
+        self.slots = slots
+        self.slot_size = slot_size
+        self.compact_ports = compact_ports   #convert port_table entries back to PortRecords when reading
+        self.lock = Lock()
+        self.shm = SharedMemory(create=True, size=self.SLOTS_START + slots*(self.SLOT_HEADER.size + slot_size))
+        self.HEADER.pack_into(self.shm.buf, 0, 0, 0, slot_size)
+        log.info('Created shared device store: %s, %d slots of %d bytes' % (self.shm.name, slots, slot_size))
+        #writer side
+        self.slot_index = {}    #device _id: slot
+        #reader side
+        self.generation = 0     #store generation last read
+        self.slot_generations = [0]*slots
+
+    def _offset(self, slot):
+        return self.SLOTS_START + slot*(self.SLOT_HEADER.size + self.slot_size)
+
+    def write(self, devices):
+        '''
+        writes list of device dicts to the store (worker side)
+        returns list of devices that could not be stored (too big, or store full), send these another way
+        '''
+        not_stored = []
+        with self.lock:
+            generation, used, slot_size = self.HEADER.unpack_from(self.shm.buf, 0)
+            for device in devices:
+                data = unifi_json.dumps(device, default=to_json).encode('utf-8')
+                device_id = device["_id"]
+                slot = self.slot_index.get(device_id)
+                if slot is None:
+                    if used >= self.slots:
+                        log.warning('shared device store full, %s not stored' % device_id)
+                        not_stored.append(device)
+                        continue
+                    slot = self.slot_index[device_id] = used
+                    used += 1
+                if len(data) > self.slot_size:
+                    log.warning('device %s (%d bytes) too big for shared device store slot' % (device_id, len(data)))
+                    not_stored.append(device)
+                    continue
+                offset = self._offset(slot)
+                slot_generation = self.SLOT_HEADER.unpack_from(self.shm.buf, offset)[0]
+                self.SLOT_HEADER.pack_into(self.shm.buf, offset, slot_generation+1, device_id.encode('utf-8'), len(data))
+                start = offset + self.SLOT_HEADER.size
+                self.shm.buf[start:start+len(data)] = data
+                generation += 1
+                self.LOG_ENTRY.pack_into(self.shm.buf, self.HEADER.size + (generation % self.CHANGE_LOG)*self.LOG_ENTRY.size, slot)
+            self.HEADER.pack_into(self.shm.buf, 0, generation, used, slot_size)
+        return not_stored
+
+    def read(self):
+        '''
+        returns list of devices that have changed since the last read (display side)
+        '''
+        changed = []
+        with self.lock:
+            generation, used, slot_size = self.HEADER.unpack_from(self.shm.buf, 0)
+            if generation == self.generation:
+                return changed
+            if generation - self.generation <= self.CHANGE_LOG:
+                slots = sorted(set(self.LOG_ENTRY.unpack_from(self.shm.buf, self.HEADER.size + (entry % self.CHANGE_LOG)*self.LOG_ENTRY.size)[0]
+                                   for entry in range(self.generation+1, generation+1)))
+            else:
+                slots = range(used)
+            self.generation = generation
+            for slot in slots:
+                offset = self._offset(slot)
+                slot_generation, device_id, length = self.SLOT_HEADER.unpack_from(self.shm.buf, offset)
+                if slot_generation == self.slot_generations[slot]:
+                    continue
+                self.slot_generations[slot] = slot_generation
+                start = offset + self.SLOT_HEADER.size
+                changed.append(bytes(self.shm.buf[start:start+length]))
+        devices = [unifi_json.loads(data) for data in changed]  #decode outside the lock
+        if self.compact_ports:
+            for device in devices:
+                if "port_table" in device:
+                    device["port_table"] = [PortRecord(port) for port in device["port_table"]]
+        return devices
+
+    def close(self, unlink=False):
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+#
+# simulation.py
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+
+'''
+Simulation (load generator) support for unifi.py
+
+Simulated devices are given as MODEL or MODEL:COUNT (eg -S US48P750:20 -S U7PG2:10), recorded device
+data (data.json written by unifi.py in debug mode, or raw_data.json written by unifi_client.py) can be
+replayed instead of, or as well as, simulated devices.
+
+RenderStats measures how long each update takes to draw, and the frames per second drawn, the summary
+is shown on the display and can be written to a csv file, to find out what hardware a large site needs.
+'''
+
+from __future__ import print_function
+
+import csv
+import json
+import time
+
+import logging
+
+log = logging.getLogger('Main')
+
+#columns of the csv file written by RenderStats
+CSV_FIELDS = ('time', 'devices', 'ports', 'updates', 'frames', 'fps', 'updates_per_sec', 'p50_ms', 'p99_ms', 'max_ms')
+
+def parse_spec(spec, default_count=1):
+    '''
+    "MODEL" or "MODEL:COUNT", returns (model, count)
+    '''
+    model, sep, count = spec.partition(':')
+    if not sep:
+        return model, default_count
+    try:
+        count = int(count)
+    except ValueError:
+        raise ValueError('device count must be a whole number, got: %s' % spec)
+    if count < 1:
+        raise ValueError('device count must be 1 or more, got: %s' % spec)
+    return model, count
+
+def load_capture(file):
+    '''
+    recorded devices from file, returns a list of updates (each a list of devices)
+    a file can be a list of devices (data.json), a dict of id: device (raw_data.json), or a list of updates
+    devices are marked as replayed_device, so they are reprocessed every time they are sent (like simulated
+    devices), even if they haven't changed (eg a file of a single update, which is sent over and over), only
+    changes are drawn though
+    '''
+    with open(file, 'r') as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        data = list(data.values())
+    if not (data and all(isinstance(update, list) for update in data)):
+        data = [data]
+    for update in data:
+        for device in update:
+            device['replayed_device'] = True
+    return data
+
+def percentile(values, percent):
+    if not values:
+        return 0
+    values = sorted(values)
+    return values[min(len(values)-1, int(len(values)*percent/100))]
+
+class RenderStats(object):
+    '''
+    render latency (seconds per update) and frames per second, summarised each time summarise() is called
+    (every second by unifi.py, from the timer that draws the update time)
+    '''
+
+    def __init__(self, csv_file=None):
+        self.start = time.monotonic()
+        self.latency = []       #of updates since the last summary
+        self.frames = 0         #frames drawn at the last summary
+        self.text = 'waiting for updates'   #last summary
+        self.writer = None
+        self.csv_file = None
+        if csv_file:
+            self.csv_file = open(csv_file, 'w', newline='')
+            self.writer = csv.writer(self.csv_file)
+            self.writer.writerow(CSV_FIELDS)
+
+    def record(self, latency):
+        '''
+        add an update that took latency seconds to draw
+        '''
+        self.latency.append(latency)
+
+    def summarise(self, frames, devices, ports):
+        '''
+        summarise the updates recorded since the last summary, frames is the total number of frames drawn so far
+        returns the summary (dict)
+        '''
+        now = time.monotonic()
+        elapsed = max(now - self.start, 0.001)
+        summary = { 'time'           : round(time.time(), 3),
+                    'devices'        : devices,
+                    'ports'          : ports,
+                    'updates'        : len(self.latency),
+                    'frames'         : frames - self.frames,
+                    'fps'            : round((frames - self.frames)/elapsed, 1),
+                    'updates_per_sec': round(len(self.latency)/elapsed, 1),
+                    'p50_ms'         : round(percentile(self.latency, 50)*1000, 2),
+                    'p99_ms'         : round(percentile(self.latency, 99)*1000, 2),
+                    'max_ms'         : round(max(self.latency or [0])*1000, 2),
+                  }
+        self.text = '%(devices)d devices %(ports)d ports %(fps).1f fps render p50 %(p50_ms).1fms p99 %(p99_ms).1fms' % summary
+        log.info('simulation: %s' % self.text)
+        if self.writer is not None:
+            self.writer.writerow([summary[field] for field in CSV_FIELDS])
+            self.csv_file.flush()
+        self.start = now
+        self.latency = []
+        self.frames = frames
+        return summary
+
+    def close(self):
+        if self.csv_file is not None:
+            self.csv_file.close()
+            self.csv_file = self.writer = None
@@ -0,0 +1,324 @@
+'''
+layout.py geometry checked against the code it replaced
+'''
+
+import json
+import os
+
+import pytest
+
+import layout
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+with open(os.path.join(ROOT, 'models.json'), 'r') as f:
+    MODELS = json.load(f)
+
+RESOLUTIONS = [(320, 240), (480, 320), (800, 480), (1920, 1080)]
+FONTS = [(8, 14), (10, 20)]     #(text_width, text_height)
+
+def old_device_geometry(x, y, ports_width, max_rows, sfp_offset, port_size, x_offset, y_offset, h_spacing, v_spacing, text_height, screen_width, screen_height):
+    '''
+    device_geometry before 1.3.15, shrinks the ports one pixel at a time until the device fits on the screen
+    returns None if it would never fit (the loop didn't end)
+    '''
+    geometry = {}
+    width = sfp_offset + 2*x_offset
+    if x is None:
+        x = max(0, screen_width//2 - (ports_width * (port_size+h_spacing) + width)//2)
+    if x < 0:
+        geometry['x_right_margin'] = -x
+        x = max(0, screen_width - (ports_width * (port_size+h_spacing) + width - x))
+
+    device_bottom = y+y_offset-text_height//2+(port_size+v_spacing)*max_rows
+    device_right = x+width+(port_size+h_spacing)*ports_width
+    while device_right >= screen_width or device_bottom >= screen_height:
+        port_size-=1
+        if port_size < -(screen_width+screen_height):
+            return None
+        device_bottom = y+y_offset-text_height//2+(port_size+v_spacing)*max_rows
+        device_right = x+width+(port_size+h_spacing)*ports_width
+
+    geometry.update({'x': x, 'port_size': port_size, 'device_right': device_right, 'device_bottom': device_bottom})
+    return geometry
+
+def device_cases():
+    '''
+    (type, model, reported ports) of every model in models.json, plus models that are not in it
+    '''
+    for section, models in MODELS.items():
+        type = section.lower()
+        for model, entry in models.items():
+            if type == 'uap':
+                for ports in (1, 2):
+                    yield type, model, ports
+            else:
+                ports = entry['ports'].get('number', 0) if isinstance(entry.get('ports'), dict) else 0
+                yield type, model, ports
+    for ports in (5, 8, 24, 48):
+        yield 'usw', 'UNKNOWN', ports
+
+@pytest.mark.parametrize('screen_width, screen_height', RESOLUTIONS)
+def test_device_geometry_matches_shrink_loop(screen_width, screen_height):
+    checked = 0
+    for type, model, ports in device_cases():
+        metrics = layout.model_metrics(MODELS.get(type.upper(), {}), model, ports, type=type)
+        for text_width, text_height in FONTS:
+            for start_port_size in (0, 20, 150):
+                for text_lines in (1, 3):
+                    x_offset = 16 if type == 'uap' and ports == 1 else 8
+                    port_size, x_offset, y_offset = layout.port_offsets(start_port_size, metrics['num_ports'], text_width, text_height,
+                                                                        x_offset, 14, text_lines)
+                    for x in (None, -10, 6, screen_width//3):
+                        for y in (10, screen_height//3):
+                            args = (x, y, metrics['device_ports_width'], metrics['max_rows'], metrics['sfp_offset'], port_size, x_offset, y_offset,
+                                    3, text_height+2, text_height, screen_width, screen_height)
+                            expected = old_device_geometry(*args)
+                            if expected is None:
+                                continue
+                            assert layout.device_geometry(*args) == expected, (type, model, ports, args)
+                            checked += 1
+    assert checked > 0
+
+def test_fit_port_size():
+    #(port_size+spacing)*count < space
+    assert layout.fit_port_size(50, 100, 3, 3) == 30
+    assert layout.fit_port_size(50, 99, 3, 3) == 29
+    assert layout.fit_port_size(20, 100, 3, 3) == 20
+    #no ports, nothing to shrink
+    assert layout.fit_port_size(50, -10, 0, 3) == 50
+
+def test_device_geometry_without_ports_off_screen():
+    #the shrink loop never ended if the device had no ports and didn't fit
+    geometry = layout.device_geometry(300, 10, 0, 0, 0, 40, 16, 50, 3, 16, 14, 320, 240)
+    assert geometry['port_size'] == 40
+    assert old_device_geometry(300, 10, 0, 0, 0, 40, 16, 50, 3, 16, 14, 320, 240) is None
+
+def old_uap(models, x, y, ports, model, port_size, text_lines, text_width, text_height, screen_width, screen_height):
+    '''
+    size of a UAP as created (dry run) before 1.3.7, by NetworkDevice.init, check_model and init_rows
+    '''
+    x_offset = 16 if ports == 1 else 8
+    y_offset = 14 + (text_lines+1)*text_height
+    sfp_offset = 0
+    if not port_size:
+        port_size = text_width*5
+    num_ports = ports
+    unifi_data = None
+    entry = models.get(model)
+    if entry is not None:
+        unifi_data = entry.get('unifi', None)
+        if isinstance(entry.get('ports'), dict):
+            num_ports = entry['ports'].get('number',0)
+            rows = entry['ports'].get('rows',1)
+        else:
+            rows = 1
+        if isinstance(entry.get('sfp'), dict):
+            sfp, sfp_rows = entry['sfp'].get('number', 0), entry['sfp'].get('rows', 0)
+        else:
+            sfp = sfp_rows = 0
+        if isinstance(entry.get('sfp+'), dict):
+            sfp_plus, sfp_plus_rows = entry['sfp+'].get('number', 0), entry['sfp+'].get('rows', 0)
+        else:
+            sfp_plus = sfp_plus_rows = 0
+        max_rows = max(rows, sfp_rows, sfp_plus_rows)
+    else:
+        sfp = sfp_plus = 0
+        rows = 2 if num_ports > 12 else 1
+        sfp_rows = sfp_plus_rows = max_rows = rows
+
+    if unifi_data and unifi_data.get('ports'):
+        standard, sfp_ports, sfp_plus_ports = layout.extract_ports_list(unifi_data['ports'])
+        num_ports = len(standard) + 1
+        sfp = len(sfp_ports)
+        sfp_plus = len(sfp_plus_ports)
+
+    if unifi_data and unifi_data.get('diagram'):
+        diagram = unifi_data['diagram']
+        max_rows = len(diagram)
+        device_ports_width = max(len([p for p in row_ports if p != -1]) for row_ports in layout.decode_layout(diagram).values())
+        sfp_offset = 10
+    else:
+        device_ports_width = 0
+        if num_ports > 0:
+            device_ports_width += num_ports//rows
+        if sfp > 0:
+            device_ports_width += sfp//sfp_rows
+            sfp_offset = 10
+        if sfp_plus > 0:
+            device_ports_width += sfp_plus//sfp_plus_rows
+            sfp_offset = 10
+
+    if port_size > 100 and num_ports == 1:
+        x_offset += port_size//2
+
+    device_bottom = y+y_offset-text_height//2+(port_size+text_height+2)*max_rows
+    device_right = x+sfp_offset+x_offset*2+(port_size+3)*device_ports_width
+    while device_right >= screen_width or device_bottom >= screen_height:
+        port_size-=1
+        device_bottom = y+y_offset-text_height//2+(port_size+text_height+2)*max_rows
+        device_right = x+sfp_offset+x_offset*2+(port_size+3)*device_ports_width
+    return {'num_ports': num_ports, 'port_size': port_size, 'device_right': device_right, 'device_bottom': device_bottom}
+
+class OldAPLayout(object):
+    '''
+    UnifiApp.create_devices before 1.3.7, for AP's only
+    AP's are created in a dry run, resized (a second dry run), then created for real
+    created is the (x, port size, right, text lines) of the AP's created for real, spacing the spacing they were created with
+    '''
+
+    def __init__(self, models, min_port_size, text_lines, fill_text, text_width, text_height, screen_width, screen_height):
+        self.models = models
+        self.ap_spacing = None
+        self.min_port_size = min_port_size
+        self.ap_extra_text = 0
+        self.text_lines = text_lines
+        self.fill_text = fill_text
+        self.text_width = text_width
+        self.text_height = text_height
+        self.screen_width = screen_width
+        self.screen_height = screen_height
+        self.created = []
+        self.spacing = None
+
+    def create_devices(self, x, y, aps, port_size):
+        last_ap_x_pos = None
+        org_x = x
+        org_y = y
+        ap_ports = ap_single_ports = ap_margin = 0
+        max_right = self.screen_width
+        spacing = self.ap_spacing
+        if spacing is None:
+            spacing = self.text_width//2
+        for index, (model, ports) in enumerate(aps):
+            if index < len(self.created):   #already created
+                continue
+            extra_text = self.ap_extra_text
+            port_size = max(port_size, self.min_port_size)
+            text_lines = self.text_lines+extra_text
+            ap = old_uap(self.models, x, y, ports, model, port_size, text_lines, self.text_width, self.text_height, self.screen_width, self.screen_height)
+            new_port_size = ap['port_size']
+            ap_ports += ap['num_ports']
+            if ap['num_ports'] == 1:
+                ap_single_ports += 1
+            device_bottom = ap['device_bottom']
+            ap_margin += (ap['device_right']-x)-(ap['num_ports']*new_port_size)+spacing
+            last_ap_x_pos = ap['device_right']
+            if self.ap_spacing is not None:
+                self.created.append((x, new_port_size, ap['device_right'], text_lines))
+                self.spacing = spacing
+            x = ap['device_right'] + spacing
+
+        if self.ap_spacing is None and last_ap_x_pos is not None:
+            if self.min_port_size == 0:
+                ap_margin-=spacing
+                right_target = new_port_size+(max_right-last_ap_x_pos)//ap_ports
+                if right_target > 100 and ap_single_ports > 0:
+                    last_ap_x_pos = org_x+ ap_margin + ((right_target)*ap_single_ports + right_target*ap_ports)
+                    while last_ap_x_pos > max_right:
+                        right_target-=1
+                        last_ap_x_pos = org_x+ ap_margin + (right_target*ap_ports)
+                        if right_target > 100:
+                            last_ap_x_pos += right_target*ap_single_ports
+
+                bottom_target = new_port_size+(self.screen_height-device_bottom)-self.text_height//2
+                self.min_port_size = min(bottom_target,right_target)
+
+                self.ap_extra_text = extra_text
+                if bottom_target > right_target and self.fill_text:
+                    self.ap_extra_text = (bottom_target - right_target)//self.text_height
+
+                if self.min_port_size < self.text_width*4:
+                    self.text_lines = 1
+                    self.min_port_size = self.text_width*4
+
+                #second dry run
+                self.create_devices(org_x, org_y, aps, port_size)
+
+            num_aps = len(aps)
+            min_spacing = max(0,(last_ap_x_pos - org_x)//(num_aps+1))
+            new_x = max_right//2 - ((last_ap_x_pos - org_x)//2)
+
+            if num_aps < 2:
+                self.ap_spacing = min_spacing
+                org_x=new_x
+            else:
+                self.ap_spacing = min(min_spacing,((max_right - org_x - last_ap_x_pos)//(num_aps-1)) + self.text_width//2)
+                org_x=new_x - ((self.ap_spacing-self.text_width//2)*(num_aps-1)//2)
+
+            self.create_devices(org_x, org_y, aps, port_size)
+
+def new_ap_layout(models, aps, x, y, port_size, min_port_size, text_lines, fill_text, text_width, text_height, screen_width, screen_height):
+    '''
+    layout.ap_layout, then the AP's created the way UnifiApp.create_devices does
+    returns (layout, created) created as OldAPLayout.created
+    '''
+    result = layout.ap_layout(models, aps, x, y, port_size, min_port_size, text_lines, 0, text_width, text_height, screen_width, screen_height, fill_text)
+    created = []
+    x = result['x']
+    for model, ports in aps:
+        port_size = max(port_size, result['min_port_size'])
+        lines = result['text_lines']+result['extra_text']
+        metrics, geometry = layout.ap_geometry(models, model, ports, x, y, port_size, lines, text_width, text_height, screen_width, screen_height)
+        created.append((x, geometry['port_size'], geometry['device_right'], lines))
+        x = geometry['device_right'] + result['spacing']
+    return result, created
+
+UAP_MODELS = MODELS['UAP']
+
+def ap_cases():
+    '''
+    lists of (model, ports) of AP's, none, one, a few and more than fit across the screen
+    '''
+    single = [(model, 1) for model, entry in sorted(UAP_MODELS.items()) if not entry.get('unifi', {}).get('ports')]
+    mixed = [(model, 1 if i % 3 else 2) for i, model in enumerate(sorted(UAP_MODELS))]
+    yield []
+    yield [('U7PG2', 2)]
+    yield [('U7LT', 1)]
+    yield [('UNKNOWN', 1)]
+    yield [('U7PG2', 2), ('U7LT', 1), ('U7IW', 3)]
+    yield single[:8]
+    yield mixed
+    yield mixed * 3
+
+@pytest.mark.parametrize('screen_width, screen_height', RESOLUTIONS)
+def test_ap_layout_matches_dry_run(screen_width, screen_height):
+    for aps in ap_cases():
+        for text_width, text_height in FONTS:
+            for min_port_size in (0, 40):
+                for fill_text in (False, True):
+                    for x, y in ((6, 100), (6, screen_height//2), (screen_width//4, 40)):
+                        old = OldAPLayout(UAP_MODELS, min_port_size, 3, fill_text, text_width, text_height, screen_width, screen_height)
+                        old.create_devices(x, y, aps, 0)
+                        result, created = new_ap_layout(UAP_MODELS, aps, x, y, 0, min_port_size, 3, fill_text, text_width, text_height,
+                                                        screen_width, screen_height)
+                        case = (aps, text_width, min_port_size, fill_text, x, y)
+                        assert created == old.created, case
+                        assert result['spacing'] == old.spacing, case
+                        assert result['min_port_size'] == old.min_port_size, case
+                        assert result['text_lines'] == old.text_lines, case
+                        assert result['extra_text'] == old.ap_extra_text, case
+
+def test_ap_layout_no_aps():
+    result = layout.ap_layout(UAP_MODELS, [], 6, 100, 0, 0, 3, 0, 8, 14, 320, 240)
+    assert result == {'x': 6, 'spacing': None, 'min_port_size': 0, 'text_lines': 3, 'extra_text': 0}
+
+@pytest.mark.parametrize('screen_width, screen_height', RESOLUTIONS)
+def test_ap_row_matches_dry_run(screen_width, screen_height):
+    #includes rows of AP's wider than the screen (the AP's past the edge get squashed)
+    for aps in ap_cases():
+        for port_size in (0, 40, 150):
+            x, spacing = 6, 4
+            ap_ports = ap_single_ports = ap_margin = bottom = new_port_size = 0
+            right = None
+            for model, ports in aps:
+                ap = old_uap(UAP_MODELS, x, 100, ports, model, port_size, 3, 8, 14, screen_width, screen_height)
+                new_port_size = ap['port_size']
+                ap_ports += ap['num_ports']
+                ap_single_ports += ap['num_ports'] == 1
+                ap_margin += (ap['device_right']-x)-(ap['num_ports']*new_port_size)+spacing
+                bottom = ap['device_bottom']
+                right = ap['device_right']
+                x = right + spacing
+            row = layout._ap_row(UAP_MODELS, aps, 6, 100, port_size, spacing, 3, 8, 14, screen_width, screen_height)
+            assert row == (new_port_size, ap_ports, ap_single_ports, ap_margin, bottom, right), (aps, port_size)
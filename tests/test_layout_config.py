@@ -0,0 +1,147 @@
+'''
+layout_config.py parser and the cached layout
+'''
+
+import os
+import shutil
+try:
+    import configparser
+except ImportError:
+    import ConfigParser as configparser
+
+import pytest
+
+import file_cache
+import layout_config
+from layout_config import LayoutConfigError, parse_layout
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CUSTOM = os.path.join(ROOT, 'custom.ini')
+
+def old_load_config(file):
+    '''
+    device sections of file as read by unifi.py before 1.3.13 (eval of each value)
+    '''
+    config = configparser.ConfigParser(delimiters=('=', '('), interpolation=configparser.ExtendedInterpolation())
+    config.read(file)
+    custom = {}
+    for section in layout_config.SECTIONS:
+        if section in config:
+            custom[section] = {}
+            for key, value in config[section].items():
+                if '=' in value:
+                    value = value.split('=')[1].strip()
+                custom[section][key] = eval(value)
+    return custom
+
+@pytest.mark.parametrize('value, expected', [
+    ('(10,10,30,6)', (10, 10, 30, 6)),
+    (' ( -10, 215 , 40,2 ) ', (-10, 215, 40, 2)),
+    ('UniFi Dream Machine Pro) = (153,10,32,5)', (153, 10, 32, 5)),
+    ('(0,0,0,0)', (0, 0, 0, 0)),
+])
+def test_parse_layout(value, expected):
+    assert parse_layout(value) == expected
+
+@pytest.mark.parametrize('value, expected', [('40', 40), (' -5 ', -5), ('Switch) = 35', 35)])
+def test_parse_layout_variable(value, expected):
+    #plain numbers are variables (for ${...}), not devices
+    assert parse_layout(value) == expected
+
+@pytest.mark.parametrize('value', [
+    '(10,10,30)',           #3 values
+    '(10,10,30,6,1)',
+    '(10,10,30,)',
+    '10,10,30,6',           #not in brackets
+    '(10,10,30,6',
+    '(10;10;30;6)',
+    '(10,10,3.5,6)',
+    '(10,a,30,6)',
+    '()',
+    '',
+    '(10,-1,30,6)',         #only x can be negative
+    '(10,10,-30,6)',
+    '(10,10,30,-6)',
+])
+def test_parse_layout_malformed(value):
+    with pytest.raises(LayoutConfigError):
+        parse_layout(value)
+
+@pytest.mark.parametrize('value', [
+    '__import__("os").system("echo unsafe")',
+    '(__import__("os").getpid(),10,30,6)',
+    '(10,10,int("30"),6)',
+    '(10,10,30,6)[0]',
+    '(1+1,10,30,6)',
+    'open("custom.ini")',
+    '[10,10,30,6]',
+])
+def test_parse_layout_rejects_expressions(value):
+    with pytest.raises(LayoutConfigError):
+        parse_layout(value)
+
+def test_parse_matches_eval():
+    #the shipped custom.ini, devices are the same as the old eval, variables are left out
+    layout = layout_config.parse(CUSTOM)
+    old = old_load_config(CUSTOM)
+    assert set(layout) - {'default'} == set(old)
+    for section, devices in old.items():
+        assert list(layout[section].items()) == [(key, value) for key, value in devices.items() if isinstance(value, tuple)]
+    assert layout['default'] == {'font_size': 10, 'x_update_pos': 15, 'y_update_pos': 10, 'update_font_size': 8}
+    assert layout['usw']['5a21c063cd10ff055a0f7b3b'] == (-10, 10, 40, 2)
+
+def test_parse_skips_invalid_entries(tmp_path):
+    file = tmp_path / 'custom.ini'
+    file.write_text('[default]\n'
+                    'font_size = 12\n'
+                    'x_update_pos = left\n'
+                    'colour = 3\n'
+                    '[usw]\n'
+                    'size = 40\n'
+                    'usw1 = (10,10,${size},1)\n'
+                    'usw2 = (10,10,30)\n'
+                    'usw3 = (__import__("os").getpid(),10,30,1)\n'
+                    'usw4 = (10,10,${missing},1)\n'
+                    'usw5 = (20,200,30,1)\n')
+    layout = layout_config.parse(str(file))
+    assert layout['default'] == {'font_size': 12}
+    assert list(layout['usw'].items()) == [('usw1', (10, 10, 40, 1)), ('usw5', (20, 200, 30, 1))]
+    assert 'uap' not in layout
+
+def test_parse_missing_file(tmp_path):
+    with pytest.raises(LayoutConfigError):
+        layout_config.parse(str(tmp_path / 'missing.ini'))
+
+def test_load_cached(tmp_path):
+    file = str(tmp_path / 'custom.ini')
+    shutil.copy(CUSTOM, file)
+    layout = layout_config.load(file)
+    assert os.path.isfile(file + '.cache')
+    cached = layout_config.load(file)
+    assert cached == layout == layout_config.parse(file)
+    assert list(cached['uap']) == list(layout['uap'])
+    assert all(isinstance(device, tuple) for device in cached['uap'].values())
+
+def test_load_ignores_bad_cache(tmp_path):
+    file = str(tmp_path / 'custom.ini')
+    shutil.copy(CUSTOM, file)
+    for content in (b'\x80\x04K\x01.', b'{"key": [1, 0, 0], "data": {}}', b'not json', b''):
+        with open(file + '.cache', 'wb') as f:
+            f.write(content)
+        assert layout_config.load(file) == layout_config.parse(file)
+
+def test_cache_rebuilt_when_file_changes(tmp_path):
+    file = tmp_path / 'data.txt'
+    file.write_text('one')
+    builds = []
+    def build(path):
+        builds.append(path)
+        with open(path) as f:
+            return {'text': f.read()}
+    assert file_cache.load(str(file), build) == {'text': 'one'}
+    assert file_cache.load(str(file), build) == {'text': 'one'}
+    assert len(builds) == 1
+    file.write_text('three')
+    assert file_cache.load(str(file), build) == {'text': 'three'}
+    assert file_cache.load(str(file), build, version=2) == {'text': 'three'}
+    assert len(builds) == 3
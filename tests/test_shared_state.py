@@ -0,0 +1,51 @@
+'''
+shared_state.py device store (python 3.8+)
+'''
+
+import pytest
+
+shared_state = pytest.importorskip('shared_state')
+
+from unifi_client import PortRecord
+
+def device(num, speed=1000):
+    return {'_id': '%024x' % num, 'name': 'Device %d' % num, 'port_table': [PortRecord({'port_idx': 1, 'speed': speed})]}
+
+@pytest.fixture
+def store():
+    store = shared_state.SharedDeviceStore(slots=8, slot_size=4096)
+    yield store
+    store.close(unlink=True)
+
+def names(devices):
+    return sorted(device['name'] for device in devices)
+
+def test_read_changed_only(store):
+    assert store.read() == []
+    store.write([device(n) for n in range(5)])
+    devices = store.read()
+    assert names(devices) == ['Device %d' % n for n in range(5)]
+    assert isinstance(devices[0]['port_table'][0], PortRecord)
+    assert store.read() == []
+    store.write([device(3, speed=100)])
+    store.write([device(1), device(3, speed=10)])
+    devices = store.read()
+    assert names(devices) == ['Device 1', 'Device 3']
+    assert [d['port_table'][0]['speed'] for d in devices if d['name'] == 'Device 3'] == [10]
+
+def test_read_after_change_log_wraps(store):
+    store.write([device(n) for n in range(3)])
+    store.read()
+    for i in range(store.CHANGE_LOG + 1):
+        store.write([device(i % 2, speed=i)])
+    assert names(store.read()) == ['Device 0', 'Device 1']
+    assert store.read() == []
+
+def test_full_and_too_big(store):
+    assert store.write([device(n) for n in range(8)]) == []
+    extra = device(8)
+    assert store.write([extra]) == [extra]
+    big = device(0)
+    big['name'] = 'x'*5000
+    assert store.write([big]) == [big]
+    assert len(store.read()) == 8
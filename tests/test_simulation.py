@@ -0,0 +1,51 @@
+'''
+simulation.py render statistics
+'''
+
+import csv
+
+import simulation
+
+def test_summary_of_updates_since_last_summary(tmp_path):
+    path = str(tmp_path / 'stats.csv')
+    stats = simulation.RenderStats(path)
+    for latency in (0.001, 0.002, 0.004):
+        stats.record(latency)
+    summary = stats.summarise(3, 2, 10)
+    assert summary['updates'] == 3
+    assert summary['frames'] == 3
+    assert summary['devices'] == 2
+    assert summary['ports'] == 10
+    assert summary['p50_ms'] == 2.0
+    assert summary['max_ms'] == 4.0
+    #nothing drawn since, eg updates slower than one a second
+    summary = stats.summarise(3, 2, 10)
+    assert summary['updates'] == 0
+    assert summary['frames'] == 0
+    assert summary['max_ms'] == 0
+    stats.close()
+    with open(path, newline='') as f:
+        rows = list(csv.reader(f))
+    assert rows[0] == list(simulation.CSV_FIELDS)
+    assert [row[3] for row in rows[1:]] == ['3', '0']
+
+def test_close_without_csv():
+    stats = simulation.RenderStats()
+    stats.record(0.001)
+    assert stats.summarise(1, 1, 1)['updates'] == 1
+    stats.close()
+    stats.close()
+
+def test_load_capture_marks_replayed_devices(tmp_path):
+    single = tmp_path / 'data.json'
+    single.write_text('[{"_id": "1", "name": "Switch"}]')
+    updates = simulation.load_capture(str(single))
+    assert updates == [[{'_id': '1', 'name': 'Switch', 'replayed_device': True}]]
+    raw = tmp_path / 'raw_data.json'
+    raw.write_text('{"1": {"_id": "1"}, "2": {"_id": "2"}}')
+    assert [len(update) for update in simulation.load_capture(str(raw))] == [2]
+    several = tmp_path / 'updates.json'
+    several.write_text('[[{"_id": "1"}], [{"_id": "1"}, {"_id": "2"}]]')
+    updates = simulation.load_capture(str(several))
+    assert [len(update) for update in updates] == [1, 2]
+    assert all(device['replayed_device'] for update in updates for device in update)
@@ -0,0 +1,65 @@
+'''
+unifi_json.py backends
+'''
+
+import json
+import sys
+import types
+
+import pytest
+
+import unifi_json
+from unifi_client import PortRecord, to_json
+
+DATA = {'name': 'Switch', 'port_table': [{'port_idx': 1, 'speed': 1000, 'up': True}], 'uptime': 10, 'text': 'café'}
+RECORDS = {'name': 'Switch', 'port_table': [PortRecord({'port_idx': 1, 'speed': 1000, 'up': True})], 'uptime': 10}
+EXPECTED = {'name': 'Switch', 'port_table': [{'port_idx': 1, 'speed': 1000, 'up': True}], 'uptime': 10}
+
+def fake_ujson(supports_default):
+    '''
+    ujson module stand in, default is only accepted from ujson 5.2
+    '''
+    module = types.ModuleType('ujson')
+    def dumps(obj, **kwargs):
+        if 'default' in kwargs and not supports_default:
+            raise TypeError("'default' is an invalid keyword argument for this function")
+        return json.dumps(obj, separators=(',', ':'), default=kwargs.get('default'))
+    module.dumps = dumps
+    module.loads = json.loads
+    return module
+
+@pytest.fixture
+def restore_backend():
+    yield
+    unifi_json.use_backend()
+
+def available():
+    backends = []
+    for name in unifi_json.BACKENDS:
+        try:
+            unifi_json.use_backend(name)
+            backends.append(name)
+        except ImportError:
+            pass
+    unifi_json.use_backend()
+    return backends
+
+@pytest.mark.parametrize('name', available())
+def test_backend_round_trip(name, restore_backend):
+    assert unifi_json.use_backend(name) == name
+    text = unifi_json.dumps(DATA)
+    assert isinstance(text, str)
+    assert unifi_json.loads(text) == DATA
+    assert unifi_json.loads(text.encode('utf-8')) == DATA
+    assert unifi_json.loads(unifi_json.dumps(RECORDS, default=to_json)) == EXPECTED
+
+@pytest.mark.parametrize('supports_default', [True, False])
+def test_ujson_default(monkeypatch, restore_backend, supports_default):
+    monkeypatch.setitem(sys.modules, 'ujson', fake_ujson(supports_default))
+    assert unifi_json.use_backend('ujson') == 'ujson'
+    assert unifi_json.loads(unifi_json.dumps(RECORDS, default=to_json)) == EXPECTED
+    assert unifi_json.loads(unifi_json.dumps(EXPECTED)) == EXPECTED
+
+def test_unknown_backend(restore_backend):
+    with pytest.raises(ValueError):
+        unifi_json.use_backend('simplejson')
@@ -0,0 +1,57 @@
+'''
+web.py dashboard events (no server is started)
+'''
+
+import json
+
+import pytest
+
+web = pytest.importorskip('web')    #python 3.7+
+
+class Port(object):
+    def __init__(self, speed):
+        self.commit = {}
+        self.speed = speed
+        self.secondary_speed = 0
+        self.power = 0
+        self.name = 'Port'
+        self.org_name = 'Port'
+        self.iface_name = 'eth0'
+        self.is_downlink = False
+        self.enabled = True
+
+class Device(object):
+    def __init__(self, id, speed=1000):
+        self.data = {'_id': id}
+        self.name = 'Switch %s' % id
+        self.description = 'USW'
+        self.model = 'US8'
+        self.type = 'usw'
+        self.enabled = True
+        self.text = []
+        self.ports = {1: Port(speed)}
+
+def events(viewer):
+    result = []
+    while not viewer.q.empty():
+        name, data = viewer.q.get_nowait().decode('utf-8').split('\n')[:2]
+        result.append((name[len('event: '):], json.loads(data[len('data: '):])))
+    return result
+
+def test_updates_and_removals_are_sent_to_viewers():
+    dashboard = web.WebDashboard()
+    switches = [Device('1'), Device('2')]
+    for device in switches:
+        assert dashboard.publish(device)
+    viewer = dashboard.subscribe()
+    assert [name for name, data in events(viewer)] == ['snapshot']
+    switches[0].ports[1].commit['speed'] = 100
+    assert dashboard.publish(switches[0])
+    assert not dashboard.publish(switches[1])
+    assert dashboard.retain(switches) == []
+    assert dashboard.retain(switches[:1]) == ['2']
+    assert events(viewer) == [('update', {'id': '1', 'ports': {'1': dict(web.port_state(switches[0].ports[1]))}}),
+                              ('remove', ['2'])]
+    assert [state['id'] for state in dashboard.snapshot()] == ['1']
+    #a new viewer only gets the devices still displayed
+    assert [[state['id'] for state in data] for name, data in events(dashboard.subscribe())] == [['1']]
@@ -30,14 +30,29 @@
 # N Waterton V 1.3.0 20th February    major re-write for UDM Pro, new category of device "udm"
 # N Waterton V 1.3.1 21st February    added api call feature to get UDMP temperature
 # N Waterton V 1.3.2 4th  June 2020   removed api call for UDMP temperature, and added handling for UDMP temperature in update_from_data()
+#            V 1.3.3                 only keep display fields from UnifiClient, compact port records, NetworkPort uses __slots__
+#            V 1.3.4                 redraw devices when data arrives (notify pipe) instead of polling every second
+#            V 1.3.5                 pass device updates from the worker through shared memory (python 3.8+)
+#            V 1.3.6                 only reprocess devices whose data has changed
+#            V 1.3.7                 AP layout calculated by layout.py instead of dry run creation of AP's
+#            V 1.3.8                 draw to a back buffer, only copy changed areas to the screen (render.py)
+#            V 1.3.9                 cache text/line options, port draw benchmark in simulate mode
+#            V 1.3.10                precalculate port geometry, speed to color lookup table
+#            V 1.3.11                headless render backend (headless.py), Grx/GLib imported from render.py
+#            V 1.3.12                web dashboard (web.py), can run without a display
+#            V 1.3.13                custom layout parsed by layout_config.py (no eval), parsed layout is cached
+#            V 1.3.14                models.json loaded once for all device classes, shared model descriptors (model_registry.py)
+#            V 1.3.15                port size that fits the screen calculated directly, instead of shrinking ports 1 pixel at a time
+#            V 1.3.16                port diagrams decoded once per model, ports drawn from a port map
+#            V 1.3.17                port_table applied to all ports in one pass (apply_port_table), interface names indexed
+#            V 1.3.18                ports whose displayed port_table fields have not changed are skipped
+#            V 1.3.19                changed outlines, text and ports drawn once per frame by a frame scheduler, optional --max_fps
+#            V 1.3.20                zoomed extra text only formatted when it's source data changes, only changed lines redrawn
+#            V 1.3.21                touch hit-testing with a grid index of devices and ports, tap a port of a zoomed device to show it's details
+#            V 1.3.22                normal display and devices kept while zoomed in, zoomed devices kept when zoomed out, so zooming doesn't rebuild the layout
+#            V 1.3.23                simulate mode load generator, multiple devices/models, update rate, port change probability, replay, render latency/fps stats
 
-__VERSION__ = '1.3.2'
-
-import gi
-gi.require_version('GLib', '2.0')
-from gi.repository import GLib
-gi.require_version('Grx', '3.0')
-from gi.repository import Grx
+__VERSION__ = '1.3.23'
 
 import random, time
 import json
@@ -46,16 +61,57 @@ from multiprocessing import Process, Value, Queue
 import queue
 from subprocess import check_output
 from collections import OrderedDict
-try:
-    import configparser
-except ImportError:
-    import ConfigParser as configparser
 
 #from controller import Controller
-from unifi_client import UnifiClient
+from unifi_client import UnifiClient, to_json, compile_fields, project
+import unifi_json
+import layout
+import layout_config
+import simulation
+from model_registry import registry
+from render import Grx, GLib, GrxCanvas, FrameScheduler, Z_OUTLINE, Z_TEXT, Z_PORT, options, HEADLESS
+try:
+    from shared_state import SharedDeviceStore
+except ImportError:     #needs python 3.8 or later, falls back to passing data through a Queue
+    SharedDeviceStore = None
+try:
+    from web import WebDashboard
+except ImportError:     #needs python 3.7 or later
+    WebDashboard = None
 
 import logging
 from logging.handlers import RotatingFileHandler     
+
+log = logging.getLogger('Main')
+log_nr = logging.getLogger('Main_No_Return')
+
+#device fields used for the display, everything else received from the controller is discarded by UnifiClient
+DISPLAY_FIELDS = [  '_id', 'device_id', 'name', 'model', 'type', 'state', 'ip', 'mac', 'version', 'upgrade_to_firmware',
+                    'uptime', 'sys_stats', 'system-stats', 'total_max_power', 'power_source_voltage', 'fan_level',
+                    'general_temperature', 'temperatures', 'overheating', 'uplink', 'ethernet_table.num_port',
+                    'downlink_table.port_idx', 'network_table.name', 'network_table.ip_subnet',
+                    'port_table.port_idx', 'port_table.ifname', 'port_table.name', 'port_table.ip', 'port_table.network_name',
+                    'port_table.speed', 'port_table.up', 'port_table.enable', 'port_table.poe_power', 'port_table.is_uplink',
+                    'port_table.lag_member', 'port_table.aggregated_by', 'port_table.lacp_state',
+                    'radio_table.name', 'radio_table.radio', 'radio_table.channel', 'radio_table.ht', 'radio_table.tx_power',
+                    'radio_table.tx_power_mode', 'radio_table.min_rssi', 'radio_table.min_rssi_enabled',
+                 ]
+
+#device statistics that change on every update, they are only shown as text, so if nothing else has changed just the text is updated
+STATS_FIELDS = ('uptime', 'sys_stats', 'system-stats')
+#uplink fields used to draw the uplink port (the rest, eg byte counters, are only shown when zoomed)
+UPLINK_PORT_FIELDS = ('port_idx', 'ifname', 'name', 'speed', 'up', 'enable', 'lag_member', 'lacp_state', 'uplink_remote_port')
+#fields compared to find out if a device has to be reprocessed (see NetworkDevice.store_data())
+FINGERPRINT_FIELDS = compile_fields([field for field in DISPLAY_FIELDS if field not in STATS_FIELDS and field != 'uplink'] +
+                                    ['uplink.%s' % field for field in UPLINK_PORT_FIELDS])
+#NetworkDevice.store_data() results, nothing changed, only the statistics changed, or the device was reprocessed
+SKIPPED, STATS_UPDATED, REPROCESSED = 0, 1, 2
+
+#uplink (WAN) fields shown in the zoomed USG/UDM extra text, UPLINK_BYTES are shown as human sizes
+UPLINK_FIELDS = ('full_duplex', 'gateways', 'latency', 'nameservers', 'netmask')
+UPLINK_BYTES = ('rx_bytes', 'rx_dropped', 'rx_errors', 'rx_multicast', 'tx_bytes', 'tx_dropped', 'tx_errors')
+#radio fields shown in the zoomed UAP extra text
+RADIO_FIELDS = ('channel', 'radio', 'tx_power', 'min_rssi', 'tx_power_mode', 'ht', 'min_rssi_enabled')
         
 class UnifiApp(Grx.Application):
     """Base class for simple UniFi display"""
@@ -144,57 +200,80 @@ class UnifiApp(Grx.Application):
         draw_devices = False
         
         if self.zoomed:
-            #reset from zoomed
+            #tap a port of the zoomed device to show the port details (tap it again to go back), anywhere else resets from zoomed
+            for devices, id, device in self.devices_at(x, y):
+                if id in self.draw_devices and device.select_port_at(x, y):
+                    self.render_frame(True)
+                    return True
+                    
+            #reset from zoomed, the zoomed devices are kept to be reused the next time they are zoomed
             self.zoomed = False
             for devices in self.all_devices:
-                for id in devices.copy().keys():
-                    for current_id in self.draw_devices:
-                        if id == current_id:
-                            devices.pop(id) #force recreation of device with new size parameters
-                            
+                for id in self.draw_devices:
+                    if id in devices:
+                        self.zoomed_devices[id] = devices.pop(id)
+            #put the normal devices back
+            for id, (devices, device) in self.normal_devices.items():
+                devices[id] = device
+            self.normal_devices = {}
+            
             self.set_default_positions()
             draw_devices = True
         
         if not draw_devices:
-            for devices in self.all_devices:
-                for id, device in devices.items():
-                    log.debug('checking device: %s, device_x: %s, right: %s, y:%s, bottom;%s' % (device.name, device.x,device.device_right,device.y,device.device_bottom)) 
-                    if x >= device.x and x <= device.device_right and y >= device.y and y <= device.device_bottom:
-                        log.info('touched device: %s' % device.name)
-                        self.draw_devices =[id]
-                        devices.pop(id) #force recreation of device with new size parameters
-                        if device.type == 'usw':
-                            self.port_size=Grx.get_height()//2#22
-                            self.text_lines['usw'] = 2
-                        elif device.type == 'ugw':
-                            self.port_size=Grx.get_height()//4#140
-                            self.text_lines['ugw'] = 8
-                            self.x_pos = None
-                        elif device.type == 'udm':
-                            self.port_size=Grx.get_height()//6
-                            self.text_lines['udm'] = 7
-                            self.x_pos = None
-                        else:   #uap
-                            self.port_size=Grx.get_height()//4#140
-                            self.text_lines['uap'] = 7
-                            self.x_pos = None
-                        if self.update_height:
-                            self.y_update_pos = Grx.get_height()-self.update_height - 10 #(10 margin)
-                        else:
-                            self.y_update_pos = 460 #where the key etc is displayed (y pos)
-                        log.info('Update Position set to: %s, update_height: %s' % (self.y_update_pos,self.update_height))
-                        self.zoomed = True
-                        draw_devices = True
-                        break
+            for devices, id, device in self.devices_at(x, y)[:1]:
+                log.info('touched device: %s' % device.name)
+                self.draw_devices =[id]
+                #keep the normal display and device to put back when zoomed out, use the zoomed device from last time if there is one
+                self.scheduler.run()
+                if self.canvas is not None:
+                    self.canvas.save()
+                self.normal_devices = {id: (devices, devices.pop(id))}
+                if id in self.zoomed_devices:
+                    devices[id] = self.zoomed_devices.pop(id)
+                if device.type == 'usw':
+                    self.port_size=Grx.get_height()//2#22
+                    self.text_lines['usw'] = 2
+                elif device.type == 'ugw':
+                    self.port_size=Grx.get_height()//4#140
+                    self.text_lines['ugw'] = 8
+                    self.x_pos = None
+                elif device.type == 'udm':
+                    self.port_size=Grx.get_height()//6
+                    self.text_lines['udm'] = 7
+                    self.x_pos = None
+                else:   #uap
+                    self.port_size=Grx.get_height()//4#140
+                    self.text_lines['uap'] = 7
+                    self.x_pos = None
+                if self.update_height:
+                    self.y_update_pos = Grx.get_height()-self.update_height - 10 #(10 margin)
+                else:
+                    self.y_update_pos = 460 #where the key etc is displayed (y pos)
+                log.info('Update Position set to: %s, update_height: %s' % (self.y_update_pos,self.update_height))
+                self.zoomed = True
+                draw_devices = True
    
         if draw_devices:
             Grx.clear_context(self.black)
+            if self.canvas is not None:
+                if not self.zoomed and self.canvas.restore():
+                    self.redraw_all = False #display is as it was before zooming in, only changes since then need to be drawn
+                self.canvas.invalidate()
+            self.scheduler.clear()  #devices have been removed
+            self.touch_index = None
+            if self.zoomed:
+                for devices in self.all_devices:
+                    for id in self.draw_devices:
+                        if id in devices:
+                            devices[id].redraw()    #zoomed before
             #self.network_switches = {}
             #self.usg = {}
             #self.udm = {}
             #self.uap = {}
             self.redraw_key = True
             self.draw_all_devices(True)
+            self.render_frame(True)
             return True
             
         self.exit.value = True
@@ -206,12 +285,23 @@ class UnifiApp(Grx.Application):
         log.info('Program Exit')
         kill_text = '/usr/bin/sudo kill -9 %s' % self.worker.pid
         check_output(kill_text.split())
+        if self.store is not None:
+            self.store.close(unlink=True)
+        if self.render_stats is not None:
+            self.render_stats.close()
         sys.exit(0)
         return False
 
     # GLib.Application requires that we implement (override) the activate
     # method.
     def do_activate(self):
+        self.setup()
+        self.start()
+        
+    def setup(self):
+        '''
+        initial display state (also used without the worker process, eg by benchmark.py)
+        '''
         Grx.user_set_window(0,0,799,479)    #set for 800X480 screen size (but does not seem to do anything).
 
         self.white = white
@@ -230,6 +320,22 @@ class UnifiApp(Grx.Application):
         self.text_height = text_height
         self.text_width = text_width
         
+        #draw to a back buffer, and copy only the areas that have changed to the screen
+        self.canvas = None
+        try:
+            self.canvas = GrxCanvas(self.black)
+        except Exception as e:
+            log.error('Unable to create back buffer, drawing directly to the screen: %s' % e)
+        #changes are drawn once per frame
+        self.scheduler = FrameScheduler(self.arg.max_fps)
+        self.frame_timer = None
+        #render latency and frames per second in simulate mode
+        self.render_stats = None
+        if self.arg.simulate:
+            self.render_stats = simulation.RenderStats(self.arg.sim_csv)
+        self.unrendered = []    #seconds taken to process each update not drawn yet (simulate mode)
+        self.render_stats_width = 0
+        
         self.x = Grx.get_width()
         self.y = Grx.get_height()
         
@@ -282,6 +388,9 @@ class UnifiApp(Grx.Application):
         self.x_pos = 10
         self.redraw_key = True
         self.zoomed = False
+        self.touch_index = None #layout.GridIndex of the devices on the display, built on the first touch after the layout changes
+        self.normal_devices = {}    #id: (devices, device) of devices replaced by their zoomed device while zoomed in
+        self.zoomed_devices = {}    #id: zoomed device, kept when zoomed out to reuse
         
         self.custom = None
         if self.arg.custom:
@@ -293,22 +402,69 @@ class UnifiApp(Grx.Application):
         self.send_q = Queue()
         self.data_q = Queue()
         self.extra_data = None
+        self.pending = 0            #number of updates notified, but not yet taken from self.q
+        self.store_updated = False  #self.store has been updated, but not read
+        self.store = None
+        self.ports_processed = 0    #number of ports updated/unchanged in the last update
+        self.ports_skipped = 0
+        self.web = None             #web dashboard, if enabled
+        
+    def start(self):
+        '''
+        start the worker process getting data from the controller, and the display updates
+        '''
+        #device updates are passed through shared memory if possible (devices that don't fit go through self.q)
+        if SharedDeviceStore is not None:
+            try:
+                self.store = SharedDeviceStore()
+            except Exception as e:
+                log.error('Unable to create shared device store, using queue: %s' % e)
+        #worker writes a byte to this pipe for every update put in self.q (b'q') or self.store (b's'),
+        #so the main loop wakes up when there is data
+        self.notify_r, self.notify_w = os.pipe()
             
         self.worker = Process(target=self.get_unifi_data)
         self.worker.daemon=True
         self.worker.start()
+        
+        #started after the worker, so the worker is not forked with the server threads
+        if self.arg.web:
+            if WebDashboard is None:
+                log.error('Web dashboard needs python 3.7 or later')
+            else:
+                self.web = WebDashboard(self.arg.web)
+                self.web.start()
 
-        GLib.timeout_add_seconds(1,self.draw_update)
-        GLib.timeout_add_seconds(1,self.draw_all_devices)
+        GLib.timeout_add_seconds(1,self.draw_update)    #update time/activity bar (blinks)
+        GLib.io_add_watch(GLib.IOChannel.unix_new(self.notify_r), GLib.PRIORITY_DEFAULT, GLib.IOCondition.IN, self.data_ready)
         #GLib.idle_add(self.draw_all_devices)
         
+    def run_headless(self):
+        '''
+        no display (eg web dashboard only), update devices whenever the worker notifies new data
+        '''
+        self.setup()
+        self.start()
+        try:
+            while not self.exit.value:
+                self.data_ready(self.notify_r, None)    #blocks until the worker writes to the pipe
+                #no timer without the main loop, summarised after the first update each second instead
+                if self.render_stats is not None and time.monotonic() - self.render_stats.start >= 1:
+                    self.update_render_stats()
+        finally:
+            if self.render_stats is not None:
+                self.render_stats.close()
+        
     def load_config(self, file):
         '''
-        loads custom config file
+        loads custom config file (parsed by layout_config.py, falls back to auto layout if the file can't be read)
         '''
+        try:
+            config = layout_config.load(file)
+        except layout_config.LayoutConfigError as e:
+            log.error('Custom config: %s, using auto layout' % e)
+            return
         self.custom = {}
-        config = configparser.ConfigParser(delimiters=('=', '('), interpolation=configparser.ExtendedInterpolation())
-        config.read(file)
         
         #spacing of AP's (included to disable auto sizing and spacing)
         self.ap_spacing = 0
@@ -316,16 +472,16 @@ class UnifiApp(Grx.Application):
         
         if 'default' in config:
             default = config['default']
-            font_size = default.getint('font_size',self.arg.font_size)
+            font_size = default.get('font_size',self.arg.font_size)
             self.set_default_text_size(font_size)
             self.text_height = text_height
             self.text_width = text_width
             self.default_text_opt = default_text_opt
             #key display default location
-            self.x_update_pos = default.getint('x_update_pos',self.x_update_pos)
-            self.y_update_pos = default.getint('y_update_pos',self.default_update_position)
+            self.x_update_pos = default.get('x_update_pos',self.x_update_pos)
+            self.y_update_pos = default.get('y_update_pos',self.default_update_position)
             self.default_update_position = self.y_update_pos
-            update_text_size = default.getint('update_font_size', None)
+            update_text_size = default.get('update_font_size', None)
             if update_text_size:
                 self.update_text_opt = Grx.TextOptions.new_full(
                         # Don't want to use the dpi-aware font here so we can cram info on to small screens (font size, 8,10,12,14 etc)
@@ -337,43 +493,14 @@ class UnifiApp(Grx.Application):
                 self.update_text_height = self.update_text_opt.get_font().get_text_height('0')
                 self.update_text_width = self.update_text_opt.get_font().get_text_width('0')
 
-        if 'ugw' in config:
-            ugw = config['ugw']
-            self.custom['ugw'] = {}
-            for usg, value in ugw.items():
-                if '=' in value:
-                    value = value.split('=')[1].strip()
-                self.custom['ugw'][usg] = eval(value)
-                self.default_text_lines['ugw'] = int(self.custom['ugw'][usg][-1])
-                log.info('UGW custom: %s=%s' % (usg,value))
-                
-        if 'udm' in config:
-            udm = config['udm']
-            self.custom['udm'] = {}
-            for udm, value in udm.items():
-                if '=' in value:
-                    value = value.split('=')[1].strip()
-                self.custom['udm'][udm] = eval(value)
-                self.default_text_lines['udm'] = int(self.custom['udm'][udm][-1])
-                log.info('UDM custom: %s=%s' % (udm,value))
-                
-        if 'usw' in config:
-            usw = config['usw']
-            self.custom['usw'] = {}
-            for switch, value in usw.items():
-                if '=' in value:
-                    value = value.split('=')[1].strip()
-                self.custom['usw'][switch] = eval(value)
-                log.info('USW custom: %s=%s' % (switch,value))
-                
-        if 'uap' in config:
-            uap = config['uap']
-            self.custom['uap'] = {}
-            for uap, value in uap.items():
-                if '=' in value:
-                    value = value.split('=')[1].strip()
-                self.custom['uap'][uap] = eval(value)
-                log.info('UAP custom: %s=%s' % (uap,value))
+        for type in layout_config.SECTIONS:
+            if type not in config:
+                continue
+            self.custom[type] = OrderedDict(config[type])   #copy, entries are removed as they are assigned to devices
+            for device, value in self.custom[type].items():
+                if type in ['ugw', 'udm']:
+                    self.default_text_lines[type] = value[-1]
+                log.info('%s custom: %s=%s' % (type.upper(), device, value))
                 
         self.text_lines = self.default_text_lines.copy()        
         
@@ -397,6 +524,7 @@ class UnifiApp(Grx.Application):
             if color['shape'] == 'circle':
                 Grx.draw_filled_circle(x+box_size//2, y+box_size//2, box_size//4, self.blue)
             Grx.draw_text(text, x+self.update_text_width*5/2, y, self.update_text_opt)
+            self.damage(x, y, x+self.update_text_width*5//2+self.update_text_opt.get_font().get_text_width(text), y+box_size)
             y+= box_size + spacing
             
         self.redraw_key = False
@@ -406,6 +534,8 @@ class UnifiApp(Grx.Application):
     def draw_update(self):
         if self.exit.value:
             return False
+        if self.render_stats is not None:
+            self.update_render_stats()
 
         if self.y_update_pos is None:
             return GLib.SOURCE_CONTINUE
@@ -418,6 +548,7 @@ class UnifiApp(Grx.Application):
         #draw last update time text
         Grx.draw_filled_box(max(0,x-10), y+update_offset, max(0,x-10)+self.update_text_opt.get_font().get_text_width(self.last_update_text[:19]), y+update_offset+self.update_text_height, self.black)
         Grx.draw_text(self.last_update_text[:19], max(0,x-10), y+update_offset, self.update_text_opt)
+        self.damage(max(0,x-10), y+update_offset, max(0,x-10)+self.update_text_opt.get_font().get_text_width(self.last_update_text[:19]), y+update_offset+self.update_text_height)
         
         if self.redraw_key:
             self.key_height = self.draw_key(x+self.update_text_width, y+key_top_offset+update_offset)
@@ -425,24 +556,22 @@ class UnifiApp(Grx.Application):
         min_pos = y + key_top_offset    #top of bar graph
         y = min_pos + self.key_height+update_offset   #bottom of bar graph
         
-        line_opts = Grx.LineOptions()
-        line_opts.width = self.update_text_width
+        line_width = self.update_text_width
         offset = self.key_spacing   #between bars
         height = self.update_text_height   #of bar
         
         #blank bar if it gets to min_pos
         if y-((offset+height)*self.update.value) < min_pos-update_offset:
-            line_opts.color = self.black
-            Grx.draw_line_with_options(x,y,x,min_pos,line_opts)
+            Grx.draw_line_with_options(x,y,x,min_pos,options.line(self.black, line_width))
             self.update.value = 1
             
         if self.blink:
             if time.time() - self.last_update < 60:
-                line_opts.color = self.green
+                line_opts = options.line(self.green, line_width)
             else:
-                line_opts.color = self.red
+                line_opts = options.line(self.red, line_width)
         else:
-            line_opts.color = self.black
+            line_opts = options.line(self.black, line_width)
         
         start = y
         end = y-height
@@ -455,15 +584,39 @@ class UnifiApp(Grx.Application):
             if end < min_pos:
                 end = min_pos
 
+        self.damage(x-line_width, min_pos-update_offset, x+line_width, y)
+        if self.render_stats is not None:
+            self.draw_render_stats()
         self.blink = not self.blink
         self.update_height = y-self.y_update_pos
+        self.flush()
         
         return GLib.SOURCE_CONTINUE
 
+    def update_render_stats(self):
+        '''
+        simulate mode, summarise render latency and frames per second since the last summary (called every second)
+        '''
+        self.render_stats.summarise(self.scheduler.frames, len(self.devices),
+                                    sum(len(device.ports) for devices in self.all_devices for device in devices.values()))
+        
+    def draw_render_stats(self):
+        '''
+        simulate mode, show render latency and frames per second at the bottom left of the display
+        '''
+        text = self.render_stats.text
+        y = Grx.get_height()-self.update_text_height
+        width = self.update_text_opt.get_font().get_text_width(text)
+        right = max(width, self.render_stats_width)  #clear longer text drawn last time
+        Grx.draw_filled_box(0, y, right, Grx.get_height()-1, self.black)
+        Grx.draw_text(text, 0, y, self.update_text_opt)
+        self.damage(0, y, right, Grx.get_height()-1)
+        self.render_stats_width = width
+        
     def get_unifi_data(self):
-        simulate_update = True
+        simulate_update = 0 #number of simulated updates sent
         if not self.arg.simulate:
-            client = UnifiClient(arg.username, arg.password, arg.IP, arg.port, ssl_verify=arg.ssl_verify)
+            client = UnifiClient(arg.username, arg.password, arg.IP, arg.port, ssl_verify=arg.ssl_verify, fields=DISPLAY_FIELDS, compact_ports=True)
         while not self.exit.value:
             try:
                 with self.update.get_lock():
@@ -473,10 +626,9 @@ class UnifiApp(Grx.Application):
                     while not self.send_q.empty():
                         self.send_q.get()    #empty send queue
                     if simulate_update:
-                        devices = self.arg.simulate
-                        simulate_update = False
-                    else:
-                        time.sleep(5)
+                        time.sleep(1.0/self.arg.sim_rate)
+                    devices = self.arg.simulate[simulate_update % len(self.arg.simulate)]  #simulated devices (and replayed captures)
+                    simulate_update += 1
                 else:
                     devices = client.devices()  #will block here until device update is received
                     if not self.send_q.empty():
@@ -484,7 +636,14 @@ class UnifiApp(Grx.Application):
                         log.info('Sending API command: %s' % command)
                         data = client.api(command)
                         self.data_q.put(data)
-                self.q.put(devices)
+                if self.store is not None:
+                    devices_not_stored = self.store.write(devices)
+                    os.write(self.notify_w, b's')   #wake up main loop
+                else:
+                    devices_not_stored = devices
+                if devices_not_stored:
+                    self.q.put(devices_not_stored)
+                    os.write(self.notify_w, b'q')
                 log.info('Data Updated')
             except Exception as e:
                 log.info('Error getting data: %s' % e)
@@ -493,7 +652,7 @@ class UnifiApp(Grx.Application):
                 
             if log.getEffectiveLevel() == logging.DEBUG:
                 with open('data.json', 'w') as f:
-                    f.write(json.dumps(devices, indent=2))
+                    f.write(json.dumps(devices, indent=2, default=to_json))
         self.q.close()
         self.client = None
         
@@ -565,13 +724,92 @@ class UnifiApp(Grx.Application):
                             self.text_lines[name] = param[3]
                             self.create_devices(param[0], param[1], type, [device], param[2])
         
+    def devices_at(self, x, y):
+        '''
+        list of (devices, id, device) of devices whose outline contains x, y (devices is the dict the device is in)
+        '''
+        if self.touch_index is None:
+            self.touch_index = layout.GridIndex()
+            for devices in self.all_devices:
+                for id, device in devices.items():
+                    self.touch_index.insert(device.x, device.y, device.device_right, device.device_bottom, (devices, id, device))
+            log.info('touch index built: %d devices' % len(self.touch_index))
+        return [(devices, id, device) for devices, id, device in self.touch_index.find(x, y) if devices.get(id) is device]
+        
+    def data_ready(self, source, condition):
+        '''
+        called from the main loop when the worker has notified new data
+        '''
+        if self.exit.value:
+            return False
+        notified = os.read(self.notify_r, 4096)
+        self.pending += notified.count(b'q')
+        self.store_updated |= b's' in notified
+        start = time.perf_counter()
+        self.draw_all_devices()
+        if self.render_stats is not None:
+            self.unrendered.append(time.perf_counter()-start)   #recorded when the frame it's drawn in is on the screen
+        self.render_frame()
+        return GLib.SOURCE_CONTINUE
+        
+    def damage(self, x1, y1, x2, y2, layer='update'):
+        '''
+        mark area as changed, so it's copied to the screen on the next flush
+        '''
+        if self.canvas is not None:
+            self.canvas.damage(layer, x1, y1, x2, y2)
+        
+    def flush(self):
+        '''
+        copy changed areas of the back buffer to the screen
+        '''
+        if self.canvas is not None:
+            self.canvas.flush()
+            
+    def schedule(self, z, draw):
+        '''
+        draw (eg port.draw_port) on the next frame, z is Z_OUTLINE, Z_TEXT or Z_PORT
+        '''
+        self.scheduler.schedule(z, draw)
+        
+    def render_frame(self, force=False):
+        '''
+        draw everything scheduled since the last frame, and copy it to the screen
+        if max_fps is set and the last frame was too recent, the frame is drawn later by a timer (unless force is True)
+        in simulate mode, the render latency of each update drawn is recorded, the time taken to process it plus the
+        time taken to draw and flush the frame (not the wait for the frame)
+        '''
+        if not force:
+            wait = self.scheduler.wait()
+            if wait > 0:
+                if self.frame_timer is None:
+                    self.frame_timer = GLib.timeout_add(int(wait*1000)+1, self.frame_timeout)
+                return
+        start = time.perf_counter()
+        self.scheduler.run()
+        self.flush()
+        if self.unrendered:
+            frame_time = time.perf_counter()-start
+            for update_time in self.unrendered:
+                self.render_stats.record(update_time+frame_time)
+            self.unrendered = []
+        
+    def frame_timeout(self):
+        self.frame_timer = None
+        self.render_frame()
+        return GLib.SOURCE_REMOVE
+        
     def draw_all_devices(self, override=False):
         if not override:
-            if self.q.empty():
+            if self.pending == 0 and not self.store_updated:
                 return GLib.SOURCE_CONTINUE
             devices =[]
-            while not self.q.empty():
-                devices+=self.q.get()
+            if self.store_updated:
+                devices+=self.store.read()  #only devices that have changed since the last read
+                self.store_updated = False
+            while self.pending > 0:
+                devices+=self.q.get()   #data is put in the queue before it's notified, so this only waits for the queue feeder
+                self.pending -= 1
             self.devices = self.update_list(self.devices, devices)
             if not self.data_q.empty():
                 self.extra_data = self.data_q.get()
@@ -619,10 +857,16 @@ class UnifiApp(Grx.Application):
                 x_pos = self.x_pos
             self.create_devices(x_pos, last_switch_pos+5, self.uap, uaps)
         
-        self.update_device(self.network_switches, switches)
-        self.update_device(self.usg, usgs)
-        self.update_device(self.udm, udms)
-        self.update_device(self.uap, uaps)
+        self.ports_processed = self.ports_skipped = 0
+        reprocessed = self.update_device(self.network_switches, switches)
+        reprocessed += self.update_device(self.usg, usgs)
+        reprocessed += self.update_device(self.udm, udms)
+        reprocessed += self.update_device(self.uap, uaps)
+        if self.web is not None:
+            self.web.retain([device for devices in self.all_devices for device in devices.values()])
+        log.info('reprocessed %d of %d devices, ports updated: %d, unchanged: %d' % (reprocessed, len(devices), self.ports_processed, self.ports_skipped))
+        if self.arg.simulate and self.arg.sim_benchmark:
+            self.benchmark_ports()
  
         self.last_update = time.time()
         self.last_update_text = time.ctime()
@@ -631,14 +875,73 @@ class UnifiApp(Grx.Application):
             
         return GLib.SOURCE_CONTINUE
         
+    def benchmark_ports(self, repeat=10):
+        '''
+        simulate mode micro benchmark, draws every port of the displayed devices repeat times to an off screen buffer
+        (the display is not changed) with draw logging off, and logs the time per port draw
+        '''
+        if self.canvas is None:
+            log.warning('port draw benchmark needs the back buffer, not run')
+            return
+        ports = [port for devices in self.all_devices for id, device in devices.items()
+                 if len(self.draw_devices) == 0 or id in self.draw_devices for port in device.ports.values()]
+        if len(ports) == 0:
+            return
+        clean = [port.clean for port in ports]  #ports waiting to be drawn on the display must still be drawn
+        hits, misses = options.hits, options.misses
+        elapsed = []
+
+        def draw():
+            start = time.perf_counter()
+            for i in range(repeat):
+                for port in ports:
+                    port.clean = False
+                    port.draw_port()
+            elapsed.append(time.perf_counter() - start)
+
+        log.disabled = True
+        try:
+            drawn = self.canvas.draw_offscreen(draw)
+        finally:
+            log.disabled = False
+            for port, port_clean in zip(ports, clean):
+                port.clean = port_clean
+        if not drawn:
+            return
+        elapsed = elapsed[0]
+        log.info('port draw benchmark: %.1fus per port (%d ports x %d), options cache hits: %d, misses: %d'
+                 % (elapsed*1e6/(len(ports)*repeat), len(ports), repeat, options.hits-hits, options.misses-misses))
+        
+    def layout_aps(self, x, y, data, port_size):
+        '''
+        auto layout AP's in data across the display, sets port size, spacing and extra text lines of AP's
+        set ap_spacing in custom config to skip this
+        returns x position of first AP
+        '''
+        UAP.load_models()
+        aps = []
+        for device in data:
+            id = device["device_id"]
+            if device["type"] != 'uap' or id in self.uap or (len(self.draw_devices) > 0 and id not in self.draw_devices):
+                continue
+            ports = sum([port.get("num_port",0) for port in device["ethernet_table"]])
+            aps.append((device["model"], ports))
+        if len(aps) == 0:
+            return x
+        ap_layout = layout.ap_layout(UAP.models, aps, x, y, port_size, self.min_port_size, self.text_lines['uap'], self.ap_extra_text,
+                                     self.text_width, self.text_height, Grx.get_width(), Grx.get_height(), self.arg.extra_text)
+        self.min_port_size = ap_layout['min_port_size']
+        self.text_lines['uap'] = ap_layout['text_lines']
+        self.ap_extra_text = ap_layout['extra_text']
+        self.ap_spacing = ap_layout['spacing']
+        return ap_layout['x']
+        
     def create_devices(self, x, y, devices, data, port_size=None):
         last_y_pos = y
-        last_ap_x_pos = None
-        org_x = x
-        org_y = y
-        device_height = ap_ports = ap_single_ports = ap_margin = 0
         if not port_size:
             port_size=self.port_size
+        if self.ap_spacing is None:
+            x = self.layout_aps(x, y, data, port_size)
         max_right = Grx.get_width()
         spacing = self.ap_spacing
         if spacing is None:
@@ -665,6 +968,7 @@ class UnifiApp(Grx.Application):
                 if len(self.draw_devices) > 0 and id not in self.draw_devices:
                     continue
                 if id not in devices:
+                    self.touch_index = None
                     ports = 0
                     for port in device["ethernet_table"]:   #no easy way to figure out the actual number of ports (but not really needed anyway)...
                         ports+=port.get("num_port",0)
@@ -686,101 +990,65 @@ class UnifiApp(Grx.Application):
                         last_y_pos = y = devices[id].device_bottom + self.text_height//2
                         log.info('UDM right: %s' % devices[id].device_right)
                     elif type == 'uap':
-                        #first run is always a dry run
-                        #if self.arg.simulate:
-                        #    self.ap_spacing = 10
                         extra_text = self.ap_extra_text
                         port_size = max(port_size,self.min_port_size)
                         log.info('creating uap: %s at x: %s, spacing: %s port_size: %s, extra_text: %s' % (name, x, spacing, port_size, extra_text))
-                        devices[id]=(UAP(x,y, ports, device, model=model, port_size=port_size, text_lines=self.text_lines[type]+extra_text, dry_run=self.ap_spacing is None, parent=self))
-                        new_port_size=devices[id].port_height
-                        ap_ports+=devices[id].num_ports
-                        device_height=devices[id].device_height
-                        if devices[id].num_ports == 1:
-                            ap_single_ports+=1
-                        device_bottom=devices[id].device_bottom
-                        log.debug('AP info: device_right: %s, x: %s, num_ports: %s, port_width: %s, spacing: %s' % (devices[id].device_right,x,devices[id].num_ports,devices[id].port_width,spacing))
-                        if x is not None:
-                            ap_margin+=(devices[id].device_right-x)-(devices[id].num_ports*devices[id].port_width)+spacing
+                        devices[id]=(UAP(x,y, ports, device, model=model, port_size=port_size, text_lines=self.text_lines[type]+extra_text, parent=self))
                         #horizontal spacing of AP's
-                        last_ap_x_pos = devices[id].device_right
                         x = devices[id].device_right + spacing
-                        #if dry run, don't save device
-                        if self.ap_spacing is None:
-                            devices.pop(id, None)
-                            self.device_locations.pop(id, None)
-                        log.info('AP Drawn at end x: %s, max pos: %s, port-size: %s, device_bottom: %s, max: %s' % (last_ap_x_pos, max_right, new_port_size, device_bottom, Grx.get_height()))
+                        log.info('AP Drawn at end x: %s, max pos: %s, port-size: %s, device_bottom: %s, max: %s' % (devices[id].device_right, max_right, devices[id].port_height, devices[id].device_bottom, Grx.get_height()))
                
-        if self.ap_spacing is None and last_ap_x_pos is not None:
-            #just created Ap's dry run, so calculate spacing evenly across display
-            #fit extra text in if we have space.
-            #set ap_spacing in custom config to skip these sections
-            
-            #find new port size that fits available space
-            if self.min_port_size == 0:
-                ap_margin-=spacing
-                right_target = new_port_size+(max_right-last_ap_x_pos)//ap_ports
-                if right_target > 100 and ap_single_ports > 0:
-                    #if we only have 1 large port overall width is increased by port_width//2 (on either side)
-                    last_ap_x_pos = org_x+ ap_margin + ((right_target)*ap_single_ports + right_target*ap_ports)
-                    while last_ap_x_pos > max_right:
-                        right_target-=1
-                        last_ap_x_pos = org_x+ ap_margin + (right_target*ap_ports)
-                        if right_target > 100:
-                            last_ap_x_pos += right_target*ap_single_ports
-
-                bottom_target = new_port_size+(Grx.get_height()-device_bottom)-self.text_height//2
-                self.min_port_size = min(bottom_target,right_target)
-                
-                self.ap_extra_text = extra_text
-                #if we have room for extra text
-                if bottom_target > right_target and self.arg.extra_text:
-                    self.ap_extra_text = (bottom_target - right_target)//self.text_height
-                    
-                #minimum port size 4 chars!
-                if self.min_port_size < self.text_width*4:
-                    self.text_lines[type] = 1
-                    self.min_port_size = self.text_width*4
-                
-                log.info('Recalculated Port Size: total number of ports: %s, ap_margin: %s, b_target: %s, r_target: %s, new port size: %s' % (ap_ports,ap_margin,bottom_target, right_target,self.min_port_size))
-
-                #second dry run, as now we have to calculate the spacing for the new, resized AP's
-                self.create_devices(org_x, org_y, devices, data, port_size)
-  
-            #calculate spacing of ap's
-            num_aps = len(data)
-            min_spacing = max(0,(last_ap_x_pos - org_x)//(num_aps+1))
-            new_x = max_right//2 - ((last_ap_x_pos - org_x)//2)
-
-            if num_aps < 2:
-                self.ap_spacing = min_spacing
-                org_x=new_x
-            else:
-                self.ap_spacing = min(min_spacing,((max_right - org_x - last_ap_x_pos)//(num_aps-1)) + self.text_width//2)
-                org_x=new_x - ((self.ap_spacing-self.text_width//2)*(num_aps-1)//2)
-            log.info('recalculating spacing - last x pos: %s - recreating APs, new spacing: %s' % (last_ap_x_pos, self.ap_spacing))
-            
-            #actually create devices for real
-            self.create_devices(org_x, org_y, devices, data, port_size)
-            
         return last_y_pos
         
     def update_device(self, devices, data):
+        '''
+        update drawn devices from list of device data, devices whose data has not changed since the last update are skipped
+        devices that were reprocessed, or whose statistics changed, are published to the web dashboard
+        returns number of devices reprocessed
+        '''
+        updates = {device_data["device_id"]: device_data for device_data in data}   #"device_id" is the same as "_id"
+        reprocessed = 0
         for id, device in devices.items():
             if len(self.draw_devices) > 0 and id not in self.draw_devices:
                 continue
             if self.redraw_all:
                 device.commit_changes(forced=True)
-            for device_data in data:
-                type = device_data["type"]
-                if id == device_data["device_id"]:  #"device_id" is the same as "_id"
-                    log.info('updating device: %s' % device.name)
-                    device.store_data(device_data)
+            device_data = updates.get(id)
+            if device_data is None:
+                continue
+            result = device.store_data(device_data)
+            if result == REPROCESSED:
+                log.info('updated device: %s, ports updated: %d, unchanged: %d' % (device.name, device.ports_processed, device.ports_skipped))
+                reprocessed += 1
+                self.ports_processed += device.ports_processed
+                self.ports_skipped += device.ports_skipped
+            if result != SKIPPED and self.web is not None:
+                self.web.publish(device)
+        return reprocessed
         
 class NetworkPort():
     port_mode = {   0:'normal',
                     1:'sfp',
                     2:'sfp+'}
+                    
+    #things which may be updated, and their defaults
+    port_defaults = {   'speed':0,
+                        'secondary_speed':None,
+                        'power':0,
+                        'name':'',
+                        'org_name':'',
+                        'iface_name':'',
+                        'is_downlink':0,
+                        'enabled':False}
+                        
+    speed_colors = None #speed: color, set when the first port is created (colors are defined at run time)
+    
+    #ports are created for every port on every device, so use slots rather than a per port __dict__
+    __slots__ = ('white', 'black', 'green', 'yellow', 'cyan', 'red', 'blue', 'magenta', 'dark_gray',
+                 'parent', 'font', 'text_height', 'text_width', 'x', 'y',
+                 'port_number', 'port_width', 'port_height', 'port_type', 'port_description', 'sfp_offset', 'poe',
+                 'box', 'number_anchor', 'text_anchor', 'downlink_points', 'uplink_points', 'secondary_points',
+                 'clean', 'commit') + tuple(port_defaults.keys())
     
     def __init__(self, x, y, port_number=1, port_type=0, POE=False, port_width=30, port_height=30, initial_data={}, parent=None):
     
@@ -797,9 +1065,7 @@ class NetworkPort():
         
         self.parent = parent
 
-        self.default_text_opt = self.duplicate_text_opts(default_text_opt)
-        self.default_text_opt.set_h_align(Grx.TextHAlign.CENTER)
-        self.default_text_opt.set_v_align(Grx.TextVAlign.MIDDLE)
+        self.font = default_text_opt.get_font()
         
         #text height/width
         self.text_height = text_height
@@ -819,17 +1085,46 @@ class NetworkPort():
             self.sfp_offset = 10
         self.poe = POE
         
-        #things which may be updated (stored in port_params)
-        self.port_params=initial_data
+        if NetworkPort.speed_colors is None:
+            NetworkPort.speed_colors = {0:self.black, 10:self.cyan, 100:self.yellow, 1000:self.green}
+        self.init_geometry()
+        
+        #things which may be updated
+        for item, default in self.port_defaults.items():
+            setattr(self, item, initial_data.get(item, default))
         self.clean = False
         self.commit = {}
 
         self.draw_port()
         
-    def duplicate_text_opts(self, text_object):
-        return Grx.TextOptions.new_full(text_object.get_font(),
-                                        text_object.get_fg_color(), text_object.get_bg_color(),
-                                        text_object.get_h_align(), text_object.get_v_align())
+    def init_geometry(self):
+        '''
+        precalculate port box, text positions and triangles, so they don't have to be worked out on every draw
+        '''
+        w = self.port_width
+        h = self.port_height
+        self.box = (self.x, self.y, self.x+w, self.y+h)
+        self.number_anchor = (self.x+w//2, self.y-self.text_height)
+        self.text_anchor = (self.x+w/2, self.y+h/2)
+        #Downwards triangle
+        self.downlink_points = self.make_points([(w//6, h//6), (5*w//6, h//6), (w//2, 5*h//6)])
+        #Upwards triangle
+        self.uplink_points = self.make_points([(w//2, h//6), (5*w//6, 5*h//6), (w//6, 5*h//6)])
+        #diagonal fill
+        self.secondary_points = self.make_points([(0, 0), (w, 0), (0, h)])
+        
+    def make_points(self, offsets):
+        '''
+        returns closed polygon of Grx.Points from list of x, y offsets from the top left of the port
+        '''
+        points = []
+        for x, y in offsets:
+            pt = Grx.Point()
+            pt.x = self.x+x
+            pt.y = self.y+y
+            points.append(pt)
+        points.append(points[0])
+        return points
         
     def draw_port(self):
         if self.clean:
@@ -837,28 +1132,24 @@ class NetworkPort():
         if not self.parent.enabled:
             self.enabled = False
         secondary_speed_text = '' if self.secondary_speed is None else '(%s)' % self.secondary_speed
-        log.info('Drawing Port : %d, %s, speed:%s%s, power:%s as %s' % (self.port_number, self.name, self.speed, secondary_speed_text, self.power, 'ENABLED' if self.enabled else 'DISABLED'))
-        port_number_text_opts = self.duplicate_text_opts(self.default_text_opt)
-        port_number_text_opts.set_fg_color(self.white)
-        port_number_text_opts.set_bg_color(self.parent.bg_color)
-        port_number_text_opts.set_v_align(Grx.TextVAlign.TOP)
-        port_text_opts = self.duplicate_text_opts(self.default_text_opt)
+        log.info('Drawing Port : %d, %s, speed:%s%s, power:%s as %s', self.port_number, self.name, self.speed, secondary_speed_text, self.power, 'ENABLED' if self.enabled else 'DISABLED')
+        port_number_text_opts = options.text(self.font, self.white, self.parent.bg_color, Grx.TextHAlign.CENTER, Grx.TextVAlign.TOP)
         color = self.get_color()
-        port_text_opts.set_bg_color(color)
-        port_text_opts.set_fg_color(self.white)
-        port_text_opts.set_v_align(Grx.TextVAlign.MIDDLE)
+        port_text_opts = options.text(self.font, self.white, color, Grx.TextHAlign.CENTER, Grx.TextVAlign.MIDDLE)
 
-        Grx.draw_text(str(self.port_number), self.x+self.port_width//2, self.y-self.text_height, port_number_text_opts)
-        Grx.draw_filled_rounded_box(self.x, self.y, self.x+self.port_width, self.y+self.port_height, 3, color)
+        x1, y1, x2, y2 = self.box
+        Grx.draw_text(str(self.port_number), self.number_anchor[0], self.number_anchor[1], port_number_text_opts)
+        Grx.draw_filled_rounded_box(x1, y1, x2, y2, 3, color)
         if color == self.black and float(self.power)==0:
             #log.info("POWER: %s" % self.power)
             port_color = self.white
             if not self.enabled:
                 port_color = self.red
-            Grx.draw_rounded_box(self.x, self.y, self.x+self.port_width, self.y+self.port_height, 3, port_color)
+            Grx.draw_rounded_box(x1, y1, x2, y2, 3, port_color)
         else:
-            if self.get_secondary_color() is not None:
-                self.draw_secondary_color()
+            secondary_color = self.get_secondary_color()
+            if secondary_color is not None:
+                Grx.draw_filled_polygon(self.secondary_points, secondary_color)
 
             if self.is_downlink == -1:
                 self.draw_downlink()
@@ -874,159 +1165,69 @@ class NetworkPort():
                             self.name[:self.port_width//self.text_width]]
                     poe_offset = self.text_height//2
             
-            y_text = self.y+self.port_height/2 - len(text)*self.text_height + poe_offset
+            x_text, y_text = self.text_anchor
+            y_text += poe_offset - len(text)*self.text_height
             for line, txt in enumerate(text,1):
-                Grx.draw_text(txt, self.x+self.port_width/2, y_text+(line*self.text_height), port_text_opts)
+                Grx.draw_text(txt, x_text, y_text+(line*self.text_height), port_text_opts)
                 
+        self.parent.damage(x1, self.number_anchor[1], x2, y2)
         self.clean = True
                 
     def draw_downlink(self):
-        #Downwards triangle
-        pt_1 = Grx.Point()
-        pt_2 = Grx.Point()
-        pt_3 = Grx.Point()
-        pt_1.x = self.x+self.port_width//6
-        pt_1.y = self.y+self.port_height//6
-        pt_2.x = self.x+5*self.port_width//6
-        pt_2.y = self.y+self.port_height//6
-        pt_3.x = self.x+self.port_width//2
-        pt_3.y = self.y+5*self.port_height//6
-        
-        points = [pt_1, pt_2, pt_3, pt_1]
-        Grx.draw_filled_polygon(points, self.blue)
+        Grx.draw_filled_polygon(self.downlink_points, self.blue)
         
     def draw_uplink(self):
-        #Upwards triangle
-        pt_1 = Grx.Point()
-        pt_2 = Grx.Point()
-        pt_3 = Grx.Point()
-        pt_1.x = self.x+self.port_width//2
-        pt_1.y = self.y+self.port_height//6
-        pt_2.x = self.x+5*self.port_width//6
-        pt_2.y = self.y+5*self.port_height//6
-        pt_3.x = self.x+self.port_width//6
-        pt_3.y = self.y+5*self.port_height//6
-
-        points = [pt_1, pt_2, pt_3, pt_1]
-        Grx.draw_filled_polygon(points, self.blue)
+        Grx.draw_filled_polygon(self.uplink_points, self.blue)
         
     def draw_secondary_color(self):
-        #diagonal fill
-        pt_1 = Grx.Point()
-        pt_2 = Grx.Point()
-        pt_3 = Grx.Point()
-        pt_1.x = self.x
-        pt_1.y = self.y
-        pt_2.x = self.x+self.port_width
-        pt_2.y = self.y
-        pt_3.x = self.x
-        pt_3.y = self.y+self.port_height
-        points = [pt_1, pt_2, pt_3, pt_1]
-        Grx.draw_filled_polygon(points, self.get_secondary_color())
+        Grx.draw_filled_polygon(self.secondary_points, self.get_secondary_color())
+        
+    def speed_color(self, speed):
+        color = self.speed_colors.get(speed)
+        if color is None:
+            color = self.magenta if speed >= 2000 else self.red
+        return color
                 
     def get_color(self):
-        if self.speed == 0 or not self.enabled:
+        if not self.enabled:
             return self.black
-        elif self.speed == 10:
-            return self.cyan
-        elif self.speed == 100:
-            return self.yellow
-        elif self.speed == 1000:
-            return self.green
-        elif self.speed >= 2000:
-            return self.magenta
-        else:
-            return self.red
+        return self.speed_color(self.speed)
             
     def get_secondary_color(self):
         if self.secondary_speed is None or not self.speed or self.speed >= self.secondary_speed:
             return None
-        if self.secondary_speed == 0 or not self.enabled:
+        if not self.enabled:
             return self.black
-        elif self.secondary_speed == 10:
-            return self.cyan
-        elif self.secondary_speed == 100:
-            return self.yellow
-        elif self.secondary_speed == 1000:
-            return self.green
-        elif self.secondary_speed >= 2000:
-            return self.magenta
-        else:
-            return self.red
+        return self.speed_color(self.secondary_speed)
             
-    @property      
-    def speed(self):
-        return self.port_params.get('speed', 0)
-        
-    @speed.setter      
-    def speed(self, value):
-        self.port_params['speed'] = value
-        
-    @property      
-    def secondary_speed(self):
-        return self.port_params.get('secondary_speed', None)
-        
-    @secondary_speed.setter      
-    def secondary_speed(self, value):
-        self.port_params['secondary_speed'] = value
-        
-    @property      
-    def power(self):
-        return self.port_params.get('power', 0)
-        
-    @power.setter      
-    def power(self, value):
-        self.port_params['power'] = value
-        
-    @property      
-    def name(self):
-        return self.port_params.get('name', '')
+    def details_source(self):
+        return (self.port_number, self.port_description) + tuple(getattr(self, item) for item in self.port_defaults)
         
-    @name.setter      
-    def name(self, value):
-        self.port_params['name'] = value
-        
-    @property      
-    def org_name(self):
-        return self.port_params.get('org_name', '')
-        
-    @org_name.setter      
-    def org_name(self, value):
-        self.port_params['org_name'] = value
-        
-    @property      
-    def iface_name(self):
-        return self.port_params.get('iface_name', '')
-        
-    @iface_name.setter      
-    def iface_name(self, value):
-        self.port_params['iface_name'] = value
-        
-    @property      
-    def is_downlink(self):
-        return self.port_params.get('is_downlink', 0)
-        
-    @is_downlink.setter      
-    def is_downlink(self, value):
-        self.port_params['is_downlink'] = value
-        
-    @property      
-    def enabled(self):
-        return self.port_params.get('enabled', False)
+    def details_text(self):
+        '''
+        port details shown in the extra data box when the port is tapped
+        '''
+        text = ['--Port %s (%s)' % (self.port_number, self.port_description)]
+        for item in self.port_defaults:
+            value = getattr(self, item)
+            if item == 'is_downlink':
+                value = {1:'uplink', -1:'downlink'}.get(value, 'no')
+            elif item == 'secondary_speed' and value is None:
+                continue
+            elif item == 'power' and not self.poe:
+                continue
+            text.append('%-15s : %s' % (item, value))
+        return text
         
-    @enabled.setter      
-    def enabled(self, value):
-        self.port_params['enabled'] = value
-            
     def commit_changes(self):
         for item, value in self.commit.items():
-            if self.port_params.get(item, None) != value:
+            if getattr(self, item) != value:
                 log.info('%s: Updating Port: %s(%s) %s to %s ' % (self.parent.name, self.port_number, self.name, item, value))
-                self.port_params[item] = value
+                setattr(self, item, value)
                 self.clean = False
-        self.commit = {}
+        self.commit.clear()
         if not self.clean:
-            self.draw_port()
+            self.parent.schedule(Z_PORT, self.draw_port)
       
     def set_port_speed(self, speed=0):
         self.commit['speed'] = speed
@@ -1096,12 +1297,16 @@ class NetworkDevice():
         self.bg_color = self.dark_gray
         self.outline = self.white
 
-        self.default_text_opt = self.duplicate_text_opts(default_text_opt)
-        self.default_text_opt.set_h_align(Grx.TextHAlign.CENTER)
-        self.default_text_opt.set_v_align(Grx.TextVAlign.MIDDLE)
+        self.font = default_text_opt.get_font()
+        self.default_text_opt = options.text(self.font, default_text_opt.get_fg_color(), default_text_opt.get_bg_color(), Grx.TextHAlign.CENTER, Grx.TextVAlign.MIDDLE)
         
         #zoomed or not (if we are zoomed display extra data box)
         self.zoomed = data.get('zoomed', False)
+        self.extra_text_key = None  #hash of the source of the extra text laid out in extra_text_lines
+        self.extra_text_lines = {}  #{(x, y): extra text line}
+        self.extra_lines_drawn = {} #{(x, y): extra text line} on the display
+        self.selected_port = None   #port number tapped when zoomed, it's details are shown instead of the extra text
+        self.port_grid = None       #layout.GridIndex of the ports, built on the first tap
         
         #text height/width
         self.text_height = text_height
@@ -1115,116 +1320,41 @@ class NetworkDevice():
         self.y_lines_text = y_lines_text
         #distance from outline to text
         self.text_offset = 8
-        #distance from outline to ports
-        self.x_offset = x_offset
-        self.y_offset = y_offset + (y_lines_text+1)*self.text_height 
-        #horizontal offset of sfp ports
-        self.sfp_offset = 0
-        #port width
-        if not port_size:
-            port_size = self.text_width*5   #5 characters wide default for ports (will be overridden by auto scaling later, but this is the stating point)
-        self.port_width = port_size
-        self.port_height = port_size
         #port spacing
         self.v_spacing = self.text_height + 2
         self.h_spacing = 3
         
         self.name = ''
         self.data = data
+        self.fingerprint = None #hash of the FINGERPRINT_FIELDS of data last stored
+        self.stats = None       #statistics (STATS_FIELDS) last stored, see get_stats()
         self.model = model
-        self.num_ports = ports
-        if not self.check_model():
-            self.num_ports = ports
-            self.sfp=SFP
-            self.sfp_plus=SFP_PLUS
-            self.poe=POE
-            #of rows of ports
-            self.rows = 1
-            if self.num_ports > 12:
-                self.rows = 2
-            self.sfp_rows = self.rows
-            self.sfp_plus_rows = self.rows
-            self.max_rows = self.rows
-            self.order = [0,2,1]
-            
-        self.org_num_ports = self.num_ports
-        self.total_ports = ports    #reported total number of ports including sfp ports
-        
-        if self.unifi_data and self.unifi_data.get('ports') and self.model != 'UGWXG':    #special handling for UGWXG because it's weird
-            #use unifi port data to draw device if available
-            standard, sfp, sfp_plus = self.extract_ports_list(self.unifi_data['ports'])
-            self.org_num_ports = self.num_ports = len(standard)
-            if self.type == 'uap':
-                #UAP's don't normally have ports data in the database, except In-Wall devices, which miss out the uplink port (so add it back in)
-                self.num_ports += 1
-            self.sfp = len(sfp)
-            self.sfp_plus = len(sfp_plus)
-            self.total_ports = self.num_ports + self.sfp + self.sfp_plus
-            
-            log.info('Updated number of ports from Unifi Data: standard: %s, sfp: %s, sfp+: %s, Total: %s' % (standard, sfp, sfp_plus, self.total_ports))
-            
-        if self.unifi_data and self.unifi_data.get("power"):
-                self.max_power = self.unifi_data["power"].get("capacity",0)
-                log.info('Updated Max POE Power from Unifi Data to: %dW' % self.max_power)
-            
-        if self.unifi_data and self.unifi_data.get('diagram') and self.model != 'UGWXG':    #special handling for UGWXG because it's weird
-            #use the diagram is there is one to figure out overall size
-            diagram = self.unifi_data["diagram"]
-            self.max_rows = self.rows = self.sfp_rows = self.sfp_plus_rows = len(diagram)
-            log.info('Updated number of rows from Unifi Data Diagram, new value: %s rows' % self.rows)
-            #log.info('DEVICE Diagram: %s' % (json.dumps(diagram, indent=2)))
-            layout = self.decode_layout(diagram)
-            max_ports_in_row = 0
-            for row, ports in layout.items():
-                real_ports = [x for x in ports if x != -1]
-                max_ports_in_row = max(max_ports_in_row, len(real_ports))  
-            
-            self.device_ports_width = max_ports_in_row
-            self.sfp_offset = 10
-
-        else:
-            #default symmetrical device
-            self.device_ports_width = 0
-            if self.num_ports > 0:
-                self.device_ports_width += self.num_ports//self.rows
-                
-            if self.sfp > 0:
-                self.device_ports_width += self.sfp//self.sfp_rows
-                self.sfp_offset = 10
-                
-            if self.sfp_plus > 0:
-                self.device_ports_width += self.sfp_plus//self.sfp_plus_rows
-                self.sfp_offset = 10
-           
-        if self.port_width > 100 and self.num_ports == 1:
-            #if we only have 1 large port increase overall width
-            self.x_offset+=self.port_width//2
+        self.check_model(ports, SFP, SFP_PLUS, POE)
+        #port width, distance from outline to ports
+        self.port_width, self.x_offset, self.y_offset = layout.port_offsets(port_size, self.num_ports, self.text_width, self.text_height, x_offset, y_offset, y_lines_text)
+        self.port_height = self.port_width
             
         self.new=False   #indicate this is a newly created device, set to false as we are not created yet, will be set later when we have been created
+        self.created = False    #draws are done immediately until the device has been drawn, then they are scheduled for the next frame
   
     def init_rows(self, rows=1):
         if self.num_ports + self.sfp + self.sfp_plus != self.total_ports:
             log.info('WARNING: number of ports configured: %d, does not match number of ports reported: %d' % (self.num_ports, self.total_ports))
             
         self.rows = rows    
-        if self.x is None:
-            self.x = max(0, Grx.get_width()//2 - (self.device_ports_width * (self.port_width+self.h_spacing) + self.sfp_offset+(2*self.x_offset))//2)
-        if self.x < 0:  #auto position x from right edge
-            self.x_right_margin = -self.x
-            self.x = max(0, Grx.get_width() - (self.device_ports_width * (self.port_width+self.h_spacing) + self.sfp_offset+(2*self.x_offset)+self.x_right_margin))
+        geometry = layout.device_geometry(self.x, self.y, self.device_ports_width, self.max_rows, self.sfp_offset, self.port_width, self.x_offset, self.y_offset,
+                                          self.h_spacing, self.v_spacing, self.text_height, Grx.get_width(), Grx.get_height())
+        self.x_right_margin = geometry.get('x_right_margin', 0)
+        self.x = geometry['x']
+        self.port_width = self.port_height = geometry['port_size']
+        self.device_bottom = geometry['device_bottom']
+        self.device_right = geometry['device_right']
             
         #port position   
         self.port_x = self.x+self.x_offset
         self.port_y = self.y+self.y_offset
         
         #device parameters
-        self.device_bottom = self.y+self.y_offset-self.text_height//2+(self.port_height+self.v_spacing)*self.max_rows
-        self.device_right = self.x+self.sfp_offset+self.x_offset*2+(self.port_width+self.h_spacing)*self.device_ports_width
-        while self.device_right >= Grx.get_width() or self.device_bottom >= Grx.get_height():
-            self.port_width-=1
-            self.port_height-=1
-            self.device_bottom = self.y+self.y_offset-self.text_height//2+(self.port_height+self.v_spacing)*self.max_rows
-            self.device_right = self.x+self.sfp_offset+self.x_offset*2+(self.port_width+self.h_spacing)*self.device_ports_width
         self.device_width = self.device_right - self.x
         self.device_height = self.device_bottom - self.y
         self.box_width = self.device_width//self.text_width
@@ -1244,6 +1374,10 @@ class NetworkDevice():
         self.clean = False
         
         self.initial_port_data = {}
+        self.port_index = {}    #interface name: port number
+        self.port_fingerprints = {} #port number: displayed port_table fields last applied (see apply_port_table())
+        self.ports_processed = 0    #number of ports updated/skipped in the last update
+        self.ports_skipped = 0
      
     def api(self, command):
         '''
@@ -1275,19 +1409,16 @@ class NetworkDevice():
     
     @classmethod
     def load_models(cls):
-        try:
-            if os.path.isfile('models.json') and not cls.updated:
-                with open('models.json', 'r') as f:
-                    data = json.load(f)
-                    
-                models = data.get(cls.type.upper(), None)
-                if models:
-                    cls.models.update(models)
-                    log.info('Loaded %s device models from file models.json' % len(models))
-                    cls.updated=True
-                    
-        except Exception as e:
-            log.exception('Error loading models file: %s' % e)
+        '''
+        add models from models.json (read once for all device classes by model_registry.py) to the class models
+        '''
+        if cls.__dict__.get('updated'):    #not inherited, each class has it's own models
+            return
+        models = registry.models(cls.type)
+        if models:
+            cls.models.update(models)
+            log.info('Loaded %s device models from file models.json' % len(models))
+        cls.updated=True
         
     def human_size(self,size_bytes):
         """
@@ -1326,93 +1457,65 @@ class NetworkDevice():
                                         text_object.get_fg_color(), text_object.get_bg_color(),
                                         text_object.get_h_align(), text_object.get_v_align())
                                         
-    def check_model(self):
+    def check_model(self, ports=0, SFP=0, SFP_PLUS=0, POE=False):
+        '''
+        sets number of ports, rows etc from models database (or guesses them from ports etc if model is not found)
+        returns True if model was found
+        '''
         log.info('LOOKING UP model: %s in database' % (self.model))
-        self.unifi_data = None
-        self.max_power = 0
-        if self.model in self.models.keys():
-            model = self.models[self.model]
-            self.description =  model['name']
-            self.unifi_data = model.get('unifi', None)  #get unifi data (extracted from controller) if it exists in database
-            if isinstance(model.get('ports'), dict):
-                self.num_ports = model['ports'].get('number',0)
-                self.rows = model['ports'].get('rows',1)
-            else:
-                #self.num_ports = model['ports']    #don't really need this for AP's as we can figure it out
-                self.rows = 1
-            self.poe =  model.get('poe', False)
-            if isinstance(model.get('sfp'), dict):
-                self.sfp =  model['sfp'].get('number', 0)
-                self.sfp_rows =  model['sfp'].get('rows', 0)
-            else:
-                self.sfp = 0
-                self.sfp_rows = 0
-            if isinstance(model.get('sfp+'), dict):
-                self.sfp_plus =  model['sfp+'].get('number', 0)
-                self.sfp_plus_rows =  model['sfp+'].get('rows', 0)
-            else:
-                self.sfp_plus = 0
-                self.sfp_plus_rows = 0
-            self.order = model.get('order', [0,2,1])    #order is 0=standard, 2=sfp+, 1=sfp
-            self.max_rows = max(self.rows,self.sfp_rows,self.sfp_plus_rows)
-            log.info('FOUND model: %s in database as %s' % (self.model, self.description))
-            return True
-        else:
+        #shared by all devices of the same model
+        self.descriptor = registry.descriptor(self.models, self.model, ports, SFP, SFP_PLUS, POE, self.type)
+        for key, value in self.descriptor._asdict().items():
+            setattr(self, key, value)
+        if self.description is None:
             self.description = self.name
             log.info('model: %s NOT FOUND in database, guessing parameters' % self.model)
             return False
+        log.info('FOUND model: %s in database as %s' % (self.model, self.description))
+        if self.unifi_data and self.unifi_data.get('ports') and self.model != 'UGWXG':
+            log.info('Updated number of ports from Unifi Data: standard: %s, sfp: %s, sfp+: %s, Total: %s' % (self.org_num_ports, self.sfp, self.sfp_plus, self.total_ports))
+        if self.max_power:
+            log.info('Updated Max POE Power from Unifi Data to: %dW' % self.max_power)
+        if self.unifi_data and self.unifi_data.get('diagram') and self.model != 'UGWXG':
+            log.info('Updated number of rows from Unifi Data Diagram, new value: %s rows' % self.rows)
+        return True
             
-    def extract_ports_list(self,ports): #get_models.py has updated version
-        '''
-        returns ports list from unifi data as tuple of lists of port number ints
-        eg ([0,1,2,3], [4,5],[])
-        (standard []. sfp[], sfp_plus[])
-        NOTE, USG's start at port 0, but switches start at port 1.
-        '''
-        standard = []
-        sfp = []
-        sfp_plus = []
-        if isinstance(ports, (list, dict)):
-            standard = [x for x in range(len(ports))]
-        if ports.get('standard'):
-            standard = self.ports_list_decode(ports['standard'])
-        if ports.get('sfp'):
-            sfp = self.ports_list_decode(ports['sfp'])
-        if ports.get('plus'):
-            sfp_plus = self.ports_list_decode(ports['plus'])
-
-        return standard, sfp, sfp_plus
+    def extract_ports_list(self,ports):
+        return layout.extract_ports_list(ports)
         
     def ports_list_decode(self,ports):
-        ports_list = []
-        if isinstance(ports, int):
-            ports_list = [x for x in range(1,ports+1,1)]
-        if isinstance(ports, list):
-            ports_list = ports
-        if isinstance(ports, str):
-            #log.info('Ports is a string: %s' % ports)
-            ports_string_list = ports.split('-')
-            ports_list = [x for x in range(int(ports_string_list[0]),int(ports_string_list[-1])+1,1)] 
+        return layout.ports_list_decode(ports)
+        
+    def decode_layout(self,layout_data):
+        return layout.decode_layout(layout_data)
+        
+    def damage(self, x1, y1, x2, y2):
+        '''
+        mark area of the device as changed, so it's copied to the screen on the next flush
+        '''
+        if self.parent is not None:
+            self.parent.damage(x1, y1, x2, y2, self.data.get("_id", self.name))
             
-        return ports_list
-        
-    def decode_layout(self,layout):
-        diagram = OrderedDict()
-        for row, port in enumerate(layout):
-            ports = port.split(' ')
-            diagram[row] = []
-            for index, p in enumerate(ports):
-                if row > 0:
-                    if diagram[row-1][index] == -1 and p.isdigit():
-                        diagram[row-1][index] = -2  #set port as empty port space, not separator
-                diagram[row].append(int(p) if p.isdigit() else -1)
-                                
-        return diagram
+    def schedule(self, z, draw):
+        '''
+        draw on the next frame (drawn now if the device is being created, or there is no UnifiApp)
+        '''
+        if self.created and self.parent is not None:
+            self.parent.schedule(z, draw)
+        else:
+            draw()
+        
+    def redraw(self):
+        '''
+        draw everything again on the next frame (eg after the display has been cleared)
+        '''
+        self.new = False
+        self.commit_changes(forced=True)
         
     def draw_device(self):
-        if self.draw_outline(): #if true, ports already exist, so just draw outline
-            return
-        self.draw_ports()    
+        if not self.draw_outline(): #if true, ports already exist, so just draw outline
+            self.draw_ports()
+        self.created = True
             
     def draw_ports(self):
         #draw ports
@@ -1421,46 +1524,11 @@ class NetworkDevice():
         num_ports = 0 #port numbering starts at (plus 1)
         spacing = 0
         
-        if self.unifi_data and self.unifi_data.get("diagram") and self.model != 'UGWXG':    #special handling for UGWXG because it's weird
-            #use unifi data to draw device if available
-            standard, sfp, sfp_plus = self.extract_ports_list(self.unifi_data['ports'])
-            log.info('UNIFI PORTS: standard: %s, sfp: %s, sfp+: %s' % (standard, sfp, sfp_plus))
-            diagram = self.unifi_data["diagram"]
-            log.info('DEVICE Diagram: %s' % (json.dumps(diagram, indent=2)))
-            layout = self.decode_layout(diagram)
-            log.info('DIAGRAM port layout is %s' % layout)
-            #figure out min port number, because they don't match up in the Unifi scheme
-            #max_port = max([max(x) for x in layout.values()])
-            self.min_port = min([min(filter(lambda a: a >= 0, x)) for x in layout.values()])
-            min_in_ports = min(standard+sfp+sfp_plus) # UGW start at port 0, Switches etc start at 1, AP's don't have port lists..
-            port_offset =  self.min_port - min_in_ports #always start ports at 1 (avoid 0/1 confusion)
-            log.info('self.min_port: %s, min_in_ports: %s, port offset: %s, sfp_offset: %s' % (self.min_port, min_in_ports, port_offset, self.sfp_offset))
-            
-            for row, ports in layout.items():
-                column = 0
-                sfp_offset_enable = False
-                prev_port_type = None
-                for port in ports:
-                    if port == -2:  #spacer port, add column, but don't draw port
-                        column+=1
-                        continue
-                    elif port-port_offset in standard:
-                        port_type = 0
-                    elif port-port_offset in sfp:
-                        port_type = 1
-                    elif port-port_offset in sfp_plus:
-                        port_type = 2
-                    else:
-                        port_type = -1  #probably -1, ie delimiter between different port types, so don't increment column if port type changes (port types less than 0 are not drawn)
-                        
-                    log.info('PORT values from DIAGRAM: row: %s, column: %s, port: %s, port-type: %s' % (row, column, port, port_type))    
-                    if prev_port_type is not None and prev_port_type != port_type:
-                        sfp_offset_enable = True
-                        if prev_port_type == -1:
-                            column -=1
-                    prev_port_type = port_type
-                    self.draw_port_from_diagram(row, column, port, sfp_offset_enable, port_type)
-                    column+=1
+        if self.port_map is not None:
+            #use unifi diagram to draw device if available (decoded once per model by model_registry.py)
+            log.info('DEVICE Diagram: %s, min port: %s, sfp_offset: %s' % (self.diagram, self.min_port, self.sfp_offset))
+            for port, (row, column, port_type, sfp_offset_enable) in self.port_map.items():
+                self.draw_port_from_diagram(row, column, port, sfp_offset_enable, port_type)
             
         else:
             #use standard layout
@@ -1494,8 +1562,6 @@ class NetworkDevice():
         sfp_offset = self.sfp_offset if sfp_offset_enable else 0
         x = self.port_x + sfp_offset + (self.port_width+self.h_spacing) * column
         y = self.port_y + (self.v_spacing + self.port_height) * row
-        if self.min_port == 0:  #UGW's start port numbering at 0, but we number from 1
-            port +=1
         log.info('DRAWING port from DIAGRAM: row: %s, column: %s, x: %s, y %s, port: %s, type: %s, sfp_offset_enable: %s' % (row, column,x,y,port,port_type, sfp_offset_enable))
         self.ports[port] = NetworkPort(x, y, port, port_type=port_type, POE=self.poe if port_type==0 else False, port_width=self.port_width, port_height=self.port_height, initial_data=self.initial_port_data.get(port, {}), parent=self)
         
@@ -1522,7 +1588,6 @@ class NetworkDevice():
         if self.clean:
             return
         log.info('%s: Drawing outline' % self.name)
-        device_text_opts = self.duplicate_text_opts(self.default_text_opt)
         name = self.name
         long_name = '%s (%s)'%(self.name, self.description)
         if self.box_width > len(long_name): #use long description if we can 
@@ -1542,49 +1607,110 @@ class NetworkDevice():
         #title
         if self.device_params.get('upgrade', False):
             self.outline = self.yellow
-        device_text_opts.set_fg_color(self.outline)
-        device_text_opts.set_bg_color(self.black)
+        device_text_opts = options.text(self.font, self.outline, self.black, Grx.TextHAlign.CENTER, Grx.TextVAlign.MIDDLE)
         name = name[:self.box_width]
-        text_width = device_text_opts.get_font().get_text_width(name)
+        text_width = self.font.get_text_width(name)
         self.device_center = self.x+(self.device_right-self.x)//2
         Grx.draw_filled_box(self.device_center-text_width//2, self.y-self.text_height//2, self.device_center+text_width//2, self.y+self.text_height//2, self.black)
         Grx.draw_text(name, self.x//2+self.device_right//2, self.y, device_text_opts)
+        self.damage(min(self.x, self.device_center-text_width//2), self.y-self.text_height//2, max(self.device_right, self.device_center+text_width//2), self.device_bottom)
         
         port_exists = False
         for port in self.ports.values():
             port.clean = False  #force redraw of port
+            self.schedule(Z_PORT, port.draw_port)
             port_exists = True
             
         return port_exists
         
     def draw_extra_data(self):
         '''
-        can override this for devices that aren't switches if you like
+        draws the extra data box (when zoomed), and the extra text in it
         '''
         log.info('%s: Drawing Extra data outline' % self.name)
-        device_text_opts = self.duplicate_text_opts(self.default_text_opt)
-        name = 'Extra data'
         offset = 10
         left = 220
-        #height = Grx.get_height()-self.device_bottom
         #draw bounding box
         Grx.draw_filled_box(left, self.device_bottom+offset, Grx.get_width()-offset, Grx.get_height()-offset, self.bg_color)
         Grx.draw_box(left, self.device_bottom+offset, Grx.get_width()-offset, Grx.get_height()-offset, self.outline)
-        #data
-        device_text_opts.set_fg_color(self.outline)
-        device_text_opts.set_bg_color(self.bg_color)
-        device_text_opts.set_h_align(Grx.TextHAlign.LEFT)
-        device_text_opts.set_v_align(Grx.TextVAlign.TOP)
-        text_top = self.device_bottom+offset
+        self.damage(left, self.device_bottom+offset, Grx.get_width()-offset, Grx.get_height()-offset)
+        self.extra_lines_drawn = {}
+        self.update_extra_data()
         
-        #text
-        columns = 1
+    def update_extra_data(self):
+        '''
+        draws the lines of extra text that have changed since they were last drawn (like update_metrics)
+        '''
+        if not self.zoomed:
+            return
+        lines = self.get_extra_text_lines()
+        if lines == self.extra_lines_drawn:
+            return
+        offset = 10
+        right = Grx.get_width()-offset-2 #2 is the border line width
+        device_text_opts = options.text(self.font, self.outline, self.bg_color)
+        for (x, y) in self.extra_lines_drawn.keys() - lines.keys():
+            Grx.draw_filled_box(x, y, right, y+self.text_height, self.bg_color)
+            self.damage(x, y, right, y+self.text_height)
+        for (x, y), txt in lines.items():
+            if txt != self.extra_lines_drawn.get((x, y)):
+                #log.info('%s: drawing line: %d, %s' % (self.name, y, txt))
+                Grx.draw_filled_box(x, y, right, y+self.text_height, self.bg_color)
+                Grx.draw_text(txt, x, y, device_text_opts)
+                self.damage(x, y, right, y+self.text_height)
+        self.extra_lines_drawn = lines
+        
+    def get_extra_text_lines(self):
+        '''
+        extra text laid out in the extra data box, {(x, y): line}
+        only formatted and laid out again when the source data of the extra text changes
+        '''
+        port = self.ports.get(self.selected_port)
+        key = hash(self.extra_text_source() if port is None else port.details_source())
+        if key != self.extra_text_key:
+            log.info('%s: formatting extra text' % self.name)
+            self.extra_text_key = key
+            self.extra_text_lines = self.layout_extra_text(self.extra_text() if port is None else port.details_text())
+        return self.extra_text_lines
+        
+    def port_at(self, x, y):
+        '''
+        port at x, y or None
+        '''
+        if self.port_grid is None:
+            self.port_grid = layout.GridIndex(self.port_width+self.h_spacing)
+            for port in self.ports.values():
+                self.port_grid.insert(*port.box, item=port)
+        ports = self.port_grid.find(x, y)
+        return ports[0] if ports else None
+        
+    def select_port_at(self, x, y):
+        '''
+        show the details of the port at x, y in the extra data box (or the extra text again if it's already selected)
+        returns False if there is no port at x, y
+        '''
+        port = self.port_at(x, y)
+        if port is None:
+            return False
+        self.selected_port = None if port.port_number == self.selected_port else port.port_number
+        log.info('%s: port %s tapped, showing %s' % (self.name, port.port_number, 'port details' if self.selected_port is not None else 'extra text'))
+        self.schedule(Z_TEXT, self.update_extra_data)
+        return True
+        
+    def layout_extra_text(self, text):
+        '''
+        position of each line of text in the extra data box (max 2 columns), returns {(x, y): line}
+        start or end a line of text with '\n' to start a new column
+        '''
+        offset = 10
+        left = 220
+        text_top = self.device_bottom+offset
         text_lines = (Grx.get_height()-offset-self.device_bottom-offset)//self.text_height
         log.info('lines of text that fit in windows: %s' % text_lines)
-        text = self.extra_text()
-        
-        next_column = False #start or end line of text in '\n' to trigger new column manually
         
+        lines = {}
+        columns = 1
+        next_column = False
         line = 0
         for txt in text:
             line +=1
@@ -1609,14 +1735,24 @@ class NetworkDevice():
                     next_column = True
        
             next_line = text_top+self.text_height*(line%text_lines)
-            #log.info('%s: drawing line: %d, %s' % (self.name, line, txt))
-            Grx.draw_filled_box(left+self.text_offset, next_line, Grx.get_width()-offset-2, next_line+self.text_height, self.bg_color) #2 is the border line width
-            Grx.draw_text(txt[:Grx.get_width()-offset-2-left-2*self.text_offset], left+self.text_offset, next_line, device_text_opts)
-            
-    def extra_text(self):
+            lines[(left+self.text_offset, next_line)] = txt[:Grx.get_width()-offset-2-left-2*self.text_offset]
+        return lines
+        
+    def extra_text_source(self):
         '''
-        can override this for devices that aren't switches if you like
+        the data extra_text() is formatted from (hashable), override with extra_text()
         '''
+        return self.ports_source()
+        
+    def ports_source(self):
+        return tuple((port.port_number, port.org_name, port.is_downlink) for port in self.ports.values())
+        
+    def uplink_source(self):
+        uplink = self.data.get("uplink") or {}
+        return tuple((key, tuple(value) if isinstance(value, list) else value) for key, value in sorted(uplink.items())
+                     if key in UPLINK_FIELDS or key in UPLINK_BYTES)
+        
+    def ports_text(self):
         text = []
         for port in self.ports.values():
             name = port.org_name
@@ -1625,8 +1761,25 @@ class NetworkDevice():
             elif port.is_downlink==-1:
                 name+=(' (downlink)')
             text.append('%-2s: %s' % (port.port_number, name))
-            
         return text
+        
+    def uplink_text(self):
+        text = []
+        for key, value in self.uplink_source():
+            if isinstance(value, tuple):
+                for item in value:
+                    text.append('%-12s : %s' % (key, item))
+            else:
+                if key in UPLINK_BYTES:
+                    value = self.human_size(value)
+                text.append('%-12s : %s' % (key, value))
+        return text
+        
+    def extra_text(self):
+        '''
+        can override this for devices that aren't switches if you like (and extra_text_source())
+        '''
+        return self.ports_text()
             
     def update_data(self, **kwargs):
         if self.text_override:
@@ -1640,7 +1793,7 @@ class NetworkDevice():
                 if key=='uptime':
                     self.device_params['uptime_text'] = self.secondsToText(value)
                 if key=='upgrade':
-                    self.draw_outline()
+                    self.schedule(Z_OUTLINE, self.draw_outline)
                 self.device_params[key] = value
             
         if not self.clean:
@@ -1702,11 +1855,8 @@ class NetworkDevice():
         if self.clean:
             return
         log.info('%s: updating metrics' % self.name)
-        device_text_opts = self.duplicate_text_opts(self.default_text_opt)
-        device_text_opts.set_fg_color(self.white)
-        device_text_opts.set_bg_color(self.bg_color)
-        device_text_opts.set_h_align(Grx.TextHAlign.LEFT)
-        device_text_opts.set_v_align(Grx.TextVAlign.TOP)
+        device_text_opts = options.text(self.font, self.white, self.bg_color)
+        warning_text_opts = options.text(self.font, self.yellow, self.red)
         
         for line, txt in enumerate(self.text, 1):
             if line > self.y_lines_text:
@@ -1723,21 +1873,18 @@ class NetworkDevice():
                     for wrn_txt in split_txt:
                         if alternate:
                             colour = self.bg_color
-                            device_text_opts.set_fg_color(self.white)
-                            device_text_opts.set_bg_color(self.bg_color)
+                            text_opts = device_text_opts
                         else:
                             colour = self.red
-                            device_text_opts.set_fg_color(self.yellow)
-                            device_text_opts.set_bg_color(colour)
+                            text_opts = warning_text_opts
                         x_right = min(x_offset + len(wrn_txt)*self.text_width, self.x+self.device_width-2)
                         Grx.draw_filled_box(x_offset, text_top, x_right, text_top+self.text_height, colour) #2 is the border line width
-                        Grx.draw_text(wrn_txt, x_offset, text_top, device_text_opts)
+                        Grx.draw_text(wrn_txt, x_offset, text_top, text_opts)
                         x_offset+= len(wrn_txt)*self.text_width
                         alternate = not alternate
-                    device_text_opts.set_fg_color(self.white)
-                    device_text_opts.set_bg_color(self.bg_color)
                 else:
                     Grx.draw_text(txt[:self.box_width-1], self.x+self.text_offset, text_top, device_text_opts)
+                self.damage(self.x+self.text_offset, text_top, self.x+self.device_width-2, text_top+self.text_height)
                 self.previous_settings[line] = txt
             
         self.clean = True
@@ -1748,7 +1895,6 @@ class NetworkDevice():
         total_power = 0.0
         downlinks_list = []
         self.radio_info = ''
-        port_number = None
         try:
             self.set_device_name(self.data.get("name", ''))
             self.set_device_enabled(self.data["state"])
@@ -1759,52 +1905,16 @@ class NetworkDevice():
             for downlink in downlinks:
                 downlinks_list.append(downlink["port_idx"])
                     
-            for port in self.data["port_table"]:
-                total_power+= float(port.get('poe_power', 0))
-                port_number = self.get_port_number(port)
-                
-                if port_number in downlinks_list:
-                    self.set_downlink(port_number, -1)
-                else:
-                    self.set_downlink(port_number, 0)
-                    
-                #log.info('updating port: %s, name: %s ' % (port_number,port["name"]))
-                self.set_port_name(port_number, port["name"])
-                self.set_port_org_name(port_number, port["name"])   #save original port name
-                #log.info('updating port: %s, speed: %s ' % (port_number,port.get("speed",0)))
-                self.set_port_speed(port_number, port.get("speed",0))
-                self.set_port_power(port_number, port.get('poe_power', '0'))
-                #self.set_port_enabled(port_number, port.get("enable", port.get("up",False)))   #can be enabled, but not up...
-                self.set_port_enabled(port_number, port.get("up", port.get("enable",False)))
-         
-                if port.get("is_uplink",False):
-                    #log.info('updating port as uplink : %s, name: %s ' % (port_number,'UP'))
-                    self.set_port_name(port_number, 'UP')
-                    self.set_downlink(port_number, 1)
-                    
-                if port.get("lag_member", False):   #aggregated port
-                    #port is aggregated
-                    if port.get("aggregated_by", False):
-                        #port is secondary port
-                        self.set_port_name(port_number, 'AG %d' % port["aggregated_by"])
-                        ag_speed = self.get_port_speed(port["aggregated_by"])
-                        if ag_speed is not None:
-                            self.set_port_speed_secondary(port_number, ag_speed)
-                    else:
-                        #port is primary port   
-                        if port.get("lacp_state", False):
-                            speed = 0
-                            for agg_port in port["lacp_state"]:
-                                if agg_port["active"]:
-                                    #mem_port = agg_port["member_port"]
-                                    speed+=agg_port["speed"]
-                            self.set_port_speed(port_number, speed)
+            total_power = self.apply_port_table(self.data["port_table"], downlinks_list)
                     
             port = self.data["uplink"]   #uplink is not there if not online
             uplink_port = self.get_port_number(port)
+            #uplink ports are changed from their port_table values below, so always update them from port_table next time
+            self.port_fingerprints.pop(uplink_port, None)
 
             if port.get("lag_member", False):
                 for lag_port in port["lacp_state"]:
+                    self.port_fingerprints.pop(lag_port["member_port"], None)
                     #log.info('updating lag port: %s, speed: %s ' % (lag_port["member_port"],lag_port["speed"]))
                     self.set_port_speed(lag_port["member_port"], lag_port["speed"])
                     self.set_port_enabled(lag_port["member_port"], lag_port["active"])
@@ -1829,15 +1939,7 @@ class NetworkDevice():
  
             self.update_from_data_device_specific()
             
-            #log.info('mem: %s, total mem: %s' % (self.data['sys_stats'].get("mem_used", 0),self.data['sys_stats'].get("mem_total", 1)))
-            if self.data.get("system-stats"):
-                mem_percent = int(float(self.data["system-stats"].get("mem", 0)))
-                cpu_percent = int(float(self.data["system-stats"].get("cpu", 0)))
-                uptime = int(self.data["system-stats"].get("uptime", 0))
-            else:
-                mem_percent = self.data['sys_stats'].get("mem_used", 0)*100//max(1,self.data['sys_stats'].get("mem_total", 0))
-                cpu_percent = None
-                uptime = self.data.get("uptime", None)
+            self.stats = self.get_stats()
             max_power = self.data.get("total_max_power", 0)
             if max_power > 0 and max_power != self.max_power:
                 self.max_power = max_power
@@ -1852,18 +1954,15 @@ class NetworkDevice():
                                  power_voltage=self.data.get("power_source_voltage", None),
                                  fan=self.data.get("fan_level", 0),
                                  power=total_power*100//max(1,self.max_power),
-                                 load=self.data['sys_stats'].get("loadavg_1", '-') + ','+self.data['sys_stats'].get("loadavg_5", '-')+ ','+self.data['sys_stats'].get("loadavg_15", '-'),
-                                 mem=mem_percent,
-                                 cpu=cpu_percent,
-                                 uptime=uptime,
                                  mac=self.data["mac"].upper(),
                                  fw_ver=self.data.get("version", None),
                                  upgrade=self.data.get("upgrade_to_firmware", None),
-                                 radio_info=self.radio_info if self.radio_info != '' else None)
+                                 radio_info=self.radio_info if self.radio_info != '' else None,
+                                 **self.stats)
 
         except KeyError as e:
             log.info('Update data: Key error: %s' % e)
-            log.info('Error in device %s, port: %s' % (self.data.get("name", 'Unknown'), port_number))
+            log.info('Error in device %s' % self.data.get("name", 'Unknown'))
             self.set_device_enabled(self.data["state"])
             
         if self.data.get('simulated_device'):
@@ -1871,6 +1970,101 @@ class NetworkDevice():
             
         self.commit_changes()
         
+    def get_stats(self):
+        '''
+        returns dict of the statistics shown (mem, cpu, uptime, load) from data
+        '''
+        #log.info('mem: %s, total mem: %s' % (self.data['sys_stats'].get("mem_used", 0),self.data['sys_stats'].get("mem_total", 1)))
+        if self.data.get("system-stats"):
+            mem_percent = int(float(self.data["system-stats"].get("mem", 0)))
+            cpu_percent = int(float(self.data["system-stats"].get("cpu", 0)))
+            uptime = int(self.data["system-stats"].get("uptime", 0))
+        else:
+            mem_percent = self.data['sys_stats'].get("mem_used", 0)*100//max(1,self.data['sys_stats'].get("mem_total", 0))
+            cpu_percent = None
+            uptime = self.data.get("uptime", None)
+        return {'load'  : self.data['sys_stats'].get("loadavg_1", '-') + ','+self.data['sys_stats'].get("loadavg_5", '-')+ ','+self.data['sys_stats'].get("loadavg_15", '-'),
+                'mem'   : mem_percent,
+                'cpu'   : cpu_percent,
+                'uptime': uptime}
+        
+    def apply_port_table(self, port_table, downlinks=()):
+        '''
+        update all ports from unifi port_table in one pass, ports in downlinks (list of port numbers) are marked as downlinks
+        ports whose displayed fields have not changed since the last update are skipped (not for simulated or replayed
+        devices, or aggregated ports, which take the speed of another port)
+        sets ports_processed and ports_skipped, returns total POE power of all ports
+        '''
+        total_power = 0.0
+        downlinks = set(downlinks)
+        check = not (self.data.get('simulated_device') or self.data.get('replayed_device'))
+        self.ports_processed = self.ports_skipped = 0
+        port_number = None
+        try:
+            for port in port_table:
+                #each field is only read once, port_table entries may be PortRecords, where get() is relatively slow
+                power = port.get('poe_power', '0')
+                total_power+= float(power)
+                port_id = port.get("port_idx")
+                if port_id is None:
+                    port_id = port.get("ifname")
+                port_number = self.get_port_number(port) if port_id is None else self.get_port_from_string(port_id)
+                name = port["name"]
+                speed = port.get("speed",0)
+                enabled = port.get("up", port.get("enable",False))  #can be enabled, but not up...
+                is_uplink = port.get("is_uplink",False)
+                aggregated_by = lacp_state = False
+                if port.get("lag_member", False):   #aggregated port
+                    aggregated_by = port.get("aggregated_by", False)
+                    if not aggregated_by:
+                        lacp_state = port.get("lacp_state", False)
+                        
+                fingerprint = None
+                if check and not aggregated_by:
+                    fingerprint = ( speed, enabled, power, name, is_uplink, port_number in downlinks,
+                                    tuple([(agg_port["active"], agg_port["speed"]) for agg_port in lacp_state]) if lacp_state else None)
+                    if fingerprint == self.port_fingerprints.get(port_number):
+                        self.ports_skipped += 1
+                        continue
+                self.ports_processed += 1
+                
+                values = {  'is_downlink': -1 if port_number in downlinks else 0,
+                            'name'       : name,
+                            'org_name'   : name,   #save original port name
+                            'speed'      : speed,
+                            'power'      : power,
+                            'enabled'    : enabled,
+                         }
+                if is_uplink:
+                    values['name'] = 'UP'
+                    values['is_downlink'] = 1
+                if aggregated_by:
+                    #port is secondary port
+                    values['name'] = 'AG %d' % aggregated_by
+                elif lacp_state:
+                    #port is primary port
+                    values['speed'] = sum([agg_port["speed"] for agg_port in lacp_state if agg_port["active"]])
+                        
+                self.set_port_values(port_number, values)
+                if aggregated_by:
+                    ag_speed = self.get_port_speed(aggregated_by)
+                    if ag_speed is not None:
+                        self.set_port_values(port_number, {'secondary_speed': ag_speed})
+                self.port_fingerprints[port_number] = fingerprint
+        except KeyError:
+            log.info('%s: Error in port_table, port: %s' % (self.name, port_number))
+            raise
+        return total_power
+        
+    def set_port_values(self, port, values):
+        '''
+        update port number (int) with dict of values (see NetworkPort.port_defaults)
+        '''
+        if port in self.ports:
+            self.ports[port].commit.update(values)
+        else:
+            self.update_port_initial_data(port, values)
+        
     def update_from_data_device_specific(self):
         '''
         Override this with specific data for devices other than switches
@@ -1891,6 +2085,7 @@ class NetworkDevice():
                              upgrade=None,
                              radio_info=None)
                              
+        change = self.data.get('simulated_change', 1)   #probability of each port changing
         for port in self.ports:
             #log.info('SIMULATED set port: %d' % port)
             if self.ports[port].port_type == 0:
@@ -1898,6 +2093,8 @@ class NetworkDevice():
             else:
                 name = self.ports[port].port_description.upper()
             self.set_port_name(port, '%s' % (name))
+            if random.random() >= change:
+                continue
             if random.choice([1,0,0,0]):
                 self.set_port_speed(port, random.choice([10,100,100,100,1000,1000,1000,1000,2000]))
             if random.choice([1,0,0,]):
@@ -1916,11 +2113,15 @@ class NetworkDevice():
         if self.enabled != self.previous_settings.get('enabled', None):
             log.info('redrawing device: %s' % self.name)
             self.clean = False
-            self.draw_outline()
+            self.schedule(Z_OUTLINE, self.draw_outline)
             self.set_text()
             self.previous_settings = {}   #force redraw of all parameters
             self.previous_settings['enabled'] = self.enabled
-        self.update_metrics()
+            if self.zoomed and self.created:    #drawn by draw_ports() when the device is created
+                self.schedule(Z_OUTLINE, self.draw_extra_data)
+        self.schedule(Z_TEXT, self.update_metrics)
+        if self.zoomed and self.created:
+            self.schedule(Z_TEXT, self.update_extra_data)
         for port in self.ports.values():
             port.commit_changes()
         
@@ -1942,14 +2143,21 @@ class NetworkDevice():
         return self.get_port_from_string(port_number)
             
     def get_port_from_string(self, port):
-        if isinstance(port, str):
+        '''
+        port number from interface name (eg 'eth0' is port 1), or port number
+        interface names are only converted (and the port's iface_name set) the first time they are seen
+        '''
+        if not isinstance(port, str):
+            return port
+        port_number = self.port_index.get(port)
+        if port_number is None:
             iface_name = port
-            port = int(port[-1:])+1
-            if port in self.ports:
-                self.ports[port].set_iface(iface_name)
+            port_number = self.port_index[iface_name] = int(port[-1:])+1
+            if port_number in self.ports:
+                self.ports[port_number].set_iface(iface_name)
             else:
-                self.update_port_initial_data(port, {'iface_name':iface_name})
-        return port
+                self.update_port_initial_data(port_number, {'iface_name':iface_name})
+        return port_number
         
     def set_device_name(self, name=''):
         if name != self.name:
@@ -2022,12 +2230,12 @@ class NetworkDevice():
                 if self.ip.get(port, '') != ip:
                     log.info('%s: setting port: %s, IP: %s' % (self.name, port, ip))
                     self.ip[port] = ip
-                    self.update_metrics()
+                    self.schedule(Z_TEXT, self.update_metrics)
         elif self.ip != ip:
             log.info('%s: setting IP: %s' % (self.name, ip))
             self.ip = ip
             self.short_ip = ip.split('.')[-1]
-            self.update_metrics()
+            self.schedule(Z_TEXT, self.update_metrics)
             
     def get_port(self, port):
         port = self.get_port_from_string(port)
@@ -2042,9 +2250,30 @@ class NetworkDevice():
         return None
         
     def store_data(self, data):
+        '''
+        store new data and update the device, unless the displayed fields (FINGERPRINT_FIELDS) are the same as last time,
+        then only the statistics text is updated (simulated, replayed and zoomed devices are always updated)
+        returns REPROCESSED, STATS_UPDATED if only the statistics changed, or SKIPPED if nothing changed
+        '''
+        fingerprint = hash(unifi_json.dumps(project(data, FINGERPRINT_FIELDS), default=to_json))
+        if fingerprint == self.fingerprint and not (data.get('simulated_device') or data.get('replayed_device')) and not self.zoomed:
+            self.data = data
+            try:
+                stats = self.get_stats()
+            except KeyError as e:
+                log.info('Update stats: Key error: %s' % e)
+                return SKIPPED
+            if stats == self.stats:
+                return SKIPPED
+            self.stats = stats
+            self.update_data(**stats)
+            self.commit_changes()
+            return STATS_UPDATED
+        self.fingerprint = fingerprint
         self.data = data
         self.update_from_data()
         #self.new = False
+        return REPROCESSED
         
     def set_device_enabled(self, state):
         '''
@@ -2146,38 +2375,14 @@ class USG(NetworkDevice):
             if 'lan' in port["name"] or port_number > 1:
                 self.set_downlink(port_number, -1)    #set as downlink
                 
+    def extra_text_source(self):
+        return self.uplink_source()
+        
     def extra_text(self):
         '''
         can override this for devices that aren't switches if you like
         '''
-        text = []
-        data_table=[    "full_duplex",
-                        "gateways",
-                        "latency",
-                        "nameservers",
-                        "netmask",  
-                    ]
-        bytes_table = [ "rx_bytes",
-                        "rx_dropped",
-                        "rx_errors",
-                        "rx_multicast",
-                        "tx_bytes",
-                        "tx_dropped",
-                        "tx_errors",
-                      ]
-                    
-        text.append('--WAN')
-        if self.data.get("uplink"):
-            for key, value in sorted(self.data["uplink"].items()):
-                if key in data_table+bytes_table:
-                    if isinstance(value, list):
-                        for item in value:
-                            text.append('%-12s : %s' % (key, item))
-                    else:
-                        if key in bytes_table: 
-                            value = self.human_size(value)
-                        text.append('%-12s : %s' % (key, value))
-        return text
+        return ['--WAN'] + self.uplink_text()
         
 class UDM(NetworkDevice):
 
@@ -2287,46 +2492,14 @@ class UDM(NetworkDevice):
             if port.get("is_uplink",False):                     #set uplink port name as network_name, eg WAN
                 self.set_port_name(port_number, network_name)
 
+    def extra_text_source(self):
+        return (self.ports_source(), self.uplink_source())
+        
     def extra_text(self):
         '''
         can override this for devices that aren't switches if you like
         '''
-        text = []
-        data_table=[    "full_duplex",
-                        "gateways",
-                        "latency",
-                        "nameservers",
-                        "netmask",  
-                    ]
-        bytes_table = [ "rx_bytes",
-                        "rx_dropped",
-                        "rx_errors",
-                        "rx_multicast",
-                        "tx_bytes",
-                        "tx_dropped",
-                        "tx_errors",
-                      ]
-                      
-        for port in self.ports.values():
-            name = port.org_name
-            if port.is_downlink==1:
-                name+=(' (uplink)')
-            elif port.is_downlink==-1:
-                name+=(' (downlink)')
-            text.append('%-2s: %s' % (port.port_number, name))
-                   
-        text.append('\n--WAN')    #new column
-        if self.data.get("uplink"):
-            for key, value in sorted(self.data["uplink"].items()):
-                if key in data_table+bytes_table:
-                    if isinstance(value, list):
-                        for item in value:
-                            text.append('%-12s : %s' % (key, item))
-                    else:
-                        if key in bytes_table: 
-                            value = self.human_size(value)
-                        text.append('%-12s : %s' % (key, value))
-        return text
+        return self.ports_text() + ['\n--WAN'] + self.uplink_text()   #new column
         
 class UAP(NetworkDevice):
     '''
@@ -2396,7 +2569,7 @@ class UAP(NetworkDevice):
              
     type='uap'  #AP type
 
-    def __init__(self, x, y, ports=2, data=None, model=None, port_size=0, text_lines=3, dry_run=False, parent=None):  
+    def __init__(self, x, y, ports=2, data=None, model=None, port_size=0, text_lines=3, parent=None):  
         log.info('AP: %s, ports = %d' % (model,ports))
         self.load_models()
         self.parent = parent
@@ -2410,9 +2583,8 @@ class UAP(NetworkDevice):
         self.text_offset = 5
         #of rows of ports
         self.init_rows(self.rows)
-        if not dry_run:
-            self.update_from_data()
-            self.draw_device()
+        self.update_from_data()
+        self.draw_device()
         
     def set_text(self, text=None): 
         #override this with each devices metrics text
@@ -2456,27 +2628,19 @@ class UAP(NetworkDevice):
         for radio in radio_table:
             self.radio_info+= '%s: CH:%s, Tx:%s ' % ('2G' if int(radio["channel"]) < 13 else '5G', radio["channel"], radio["tx_power_mode"][:3].upper())
 
+    def extra_text_source(self):
+        return tuple((radio.get("name"), tuple((key, radio[key]) for key in RADIO_FIELDS if key in radio)) for radio in self.data.get("radio_table") or [])
+        
     def extra_text(self):
         '''
         can override this for devices that aren't switches if you like
         '''
         text = []
-        radio_data=[    "channel",
-                        "radio",
-                        "tx_power",
-                        "min_rssi",
-                        "tx_power_mode",
-                        "ht",
-                        "min_rssi_enabled",
-                    ]
-        
-        if self.data.get("radio_table"):
-            for data in self.data["radio_table"]:
-                text.append('--%s' % data["name"])
-                for key, value in sorted(data.items()):
-                    if key in radio_data:
-                        text.append('%-21s : %s' % (key, value))
-                text[-1]=text[-1]+'\n'  #start new column
+        for name, radio in self.extra_text_source():
+            text.append('--%s' % name)
+            for key, value in sorted(radio):
+                text.append('%-21s : %s' % (key, value))
+            text[-1]=text[-1]+'\n'  #start new column
         return text
 
             
@@ -2503,9 +2667,10 @@ def setup_logger(logger_name, log_file, level=logging.DEBUG, console=False, no_r
         print("Error in Logging setup: %s - do you have permission to write the log file??" % e)
         sys.exit(1)
         
-def simulate_device(device, num=None):
+def simulate_device(device, num=None, change=1):
     data = {"model": device}
     data['simulated_device']=True
+    data['simulated_change']=change
     data['simulated_uptime']=time.time()
     data["device_id"]='999999999' if num is None else str(num)
     data["_id"]=data["device_id"]
@@ -2535,11 +2700,8 @@ def list_devices():
     for device in UAP.models.keys():
         log.info('UAP: %s (%s)' % (device, UAP.models[device]['name']))
         
-def main():
-    global log
-    global log_nr
+def get_parser():
     import argparse
-    global arg
     parser = argparse.ArgumentParser(description='Unifi Status Screen')
     parser.add_argument('IP', action="store", default=None, help="IP Address of Unifi Controller. (default: None)")
     parser.add_argument('-p','--port', action="store", type=int, default=8443, help='unifi port (default=8443)')
@@ -2552,10 +2714,22 @@ def main():
     parser.add_argument('-l','--log', action="store",default="None", help='log file. (default=None)')
     parser.add_argument('-D','--debug', action='store_true', help='debug mode', default = False)
     parser.add_argument('-li','--list', action='store_true', help='list built in devices (for use in simulation)', default = False)
-    parser.add_argument('-S','--simulate', action="store", default=None, help='simulate device - pass device type as argument, eg US48P750 (default=None)')
+    parser.add_argument('-m','--max_fps', action="store", type=float, default=0, help='maximum display frames per second, 0 = no limit (default=0)')
+    parser.add_argument('-w','--web', action="store", type=int, default=None, help='serve web dashboard on this port (default=None)')
+    parser.add_argument('-S','--simulate', action="append", default=None, help='simulate device - pass device type as argument, with optional count, eg US48P750 or U7PG2:10, can be repeated (default=None)')
+    parser.add_argument('-sr','--sim_rate', action="store", type=float, default=0.2, help='simulated updates per second (default=0.2)')
+    parser.add_argument('-sc','--sim_change', action="store", type=float, default=1.0, help='probability of each simulated port changing per update (default=1.0)')
+    parser.add_argument('-sp','--sim_replay', action="append", default=None, help='replay recorded device data file eg data.json, in simulate mode, can be repeated, replayed devices are reprocessed every update, but only changes are drawn, so an unchanged (single update) file adds no drawing (default=None)')
+    parser.add_argument('-sv','--sim_csv', action="store", default=None, help='write simulate mode render latency and fps to csv file (default=None)')
+    parser.add_argument('-sb','--sim_benchmark', action='store_true', help='log time to draw a port after each simulated update (Default: False)', default = False)
     parser.add_argument('-V','--version', action='version',version='%(prog)s {version}'.format(version=__VERSION__))
-    
-    arg = parser.parse_args()
+    return parser
+        
+def main():
+    global log
+    global log_nr
+    global arg
+    arg = get_parser().parse_args()
     
     if arg.debug:
       log_level = logging.DEBUG
@@ -2589,19 +2763,39 @@ def main():
                       'UDM': {}}
             f.write(json.dumps(models, indent=2))
     
-    #simulate a device for testing
-    if arg.simulate:
+    #simulate devices for testing, arg.simulate becomes a list of updates (lists of devices) sent in turn
+    if arg.simulate or arg.sim_replay:
         arg.custom = None
-        device = arg.simulate
-        arg.simulate = []
         NetworkSwitch.load_models()
         USG.load_models()
         UAP.load_models()
-        if device in UAP.models.keys():
-            for i in range(5):
-                arg.simulate.append(simulate_device(device, i))
-        else:
-            arg.simulate.append(simulate_device(device))
+        simulated = []
+        for spec in arg.simulate or []:
+            try:
+                device, count = simulation.parse_spec(spec, None)
+            except ValueError as e:
+                log.error('simulate: %s' % e)
+                sys.exit(1)
+            if count is None:
+                count = 5 if device in UAP.models.keys() else 1
+            for i in range(count):
+                num = None if len(arg.simulate) == 1 and count == 1 else len(simulated)
+                simulated.append(simulate_device(device, num, arg.sim_change))
+        arg.simulate = [simulated]
+        if arg.sim_replay:
+            arg.simulate = [update + simulated for file in arg.sim_replay for update in simulation.load_capture(file)]
+        if arg.sim_rate <= 0:
+            log.error('simulate: --sim_rate must be more than 0')
+            sys.exit(1)
+        log.info('simulating %d devices, %s updates per second, %d recorded updates' % (len(arg.simulate[0]), arg.sim_rate, len(arg.simulate) if arg.sim_replay else 0))
+
+    if HEADLESS:
+        if not arg.web:
+            log.error('Grx is not available (or UNIFI_HEADLESS is set), nothing can be displayed (use -w for the web dashboard)')
+            sys.exit(1)
+        log.info('No display, web dashboard only')
+        UnifiApp(arg).run_headless()
+        return
 
     GLib.set_prgname('unifi.py')
     GLib.set_application_name('Unifi Status Screen')
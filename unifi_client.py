@@ -25,6 +25,9 @@
 # N Waterton 15th February  2020 V 1.1.4: added enhanced support for UDM Pro
 # N Waterton 21st February  2020 V 1.1.5: added api call feature
 # N Waterton 4th  June      2020 V 1.1.6: reduced logging from device:update and sta:sync messages (now debug only)     
+#                                V 1.1.7: added optional field projection of device data (fields)
+#                                V 1.1.8: added optional compact port records (compact_ports)
+#                                V 1.1.9: added optional per port rate statistics (port_stats)
 
 '''
 Not all of these work, but good starting point...
@@ -64,16 +67,121 @@ except ImportError:
     from Queue import Queue
 from collections import OrderedDict
 
+import unifi_json
+
 import logging
 from logging.handlers import RotatingFileHandler
 
-__VERSION__ = '1.1.6'
+__VERSION__ = '1.1.9'
 
 log = logging.getLogger('Main')
 
+def compile_fields(fields):
+    '''
+    compiles a list of field paths into a projection tree for project()
+    nested fields are separated by '.', lists of dicts (eg port_table) are projected item by item
+    eg ['name', 'sys_stats', 'port_table.speed', 'port_table.lacp_state.speed'] gives
+    {'_id':None, 'name':None, 'sys_stats':None, 'port_table':{'speed':None, 'lacp_state':{'speed':None}}}
+    None means keep the whole value. '_id' is always kept, as it's needed to track devices.
+    '''
+    if fields is None:
+        return None
+    tree = {'_id':None}
+    for field in fields:
+        node = tree
+        keys = field.split('.')
+        for key in keys[:-1]:
+            if key in node and node[key] is None:   #already keeping whole value
+                break
+            node = node.setdefault(key, {})
+        else:
+            node[keys[-1]] = None
+    return tree
+
+def project(data, tree):
+    '''
+    returns copy of data containing only the fields in tree (from compile_fields()), PortRecords are projected to dicts
+    '''
+    if tree is None:
+        return data
+    if isinstance(data, list):
+        return [project(item, tree) for item in data]
+    if isinstance(data, (dict, PortRecord)):
+        return {key: project(data[key], sub_tree) for key, sub_tree in tree.items() if key in data}
+    return data
+
+class PortRecord(object):
+    '''
+    Compact record of a port_table entry, used instead of a dict when compact_ports is set.
+    Only the fields in __slots__ are kept. Supports dict style access (get(), [], in) so it
+    can be used anywhere a port_table dict is used.
+    '''
+    __slots__ = ('port_idx', 'ifname', 'name', 'ip', 'network_name', 'speed', 'up', 'enable', 'poe_power',
+                 'is_uplink', 'lag_member', 'aggregated_by', 'lacp_state',
+                 'rx_bytes', 'tx_bytes', 'rx_errors', 'tx_errors', 'rx_dropped', 'tx_dropped')
+
+    def __init__(self, port=None):
+        if port is not None:
+            for key in self.__slots__:
+                if key in port:
+                    setattr(self, key, port[key])
+
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except (AttributeError, TypeError):
+            raise KeyError(key)
+
+    def __contains__(self, key):
+        return hasattr(self, key)
+
+    def keys(self):
+        return [key for key in self.__slots__ if hasattr(self, key)]
+
+    def to_dict(self):
+        return dict((key, getattr(self, key)) for key in self.keys())
+
+    def __getstate__(self):
+        #pickle as a bitmask of the fields that are set, and a tuple of their values, much smaller than a dict
+        mask = 0
+        values = []
+        for bit, key in enumerate(self.__slots__):
+            if hasattr(self, key):
+                mask |= 1 << bit
+                values.append(getattr(self, key))
+        return mask, tuple(values)
+
+    def __setstate__(self, state):
+        mask, values = state
+        values = iter(values)
+        for bit, key in enumerate(self.__slots__):
+            if mask & (1 << bit):
+                setattr(self, key, next(values))
+
+    def __repr__(self):
+        return 'PortRecord(%s)' % self.to_dict()
+
+def to_json(obj):
+    '''
+    default for json.dumps() so that PortRecords can be serialized
+    '''
+    if isinstance(obj, PortRecord):
+        return obj.to_dict()
+    raise TypeError('%s is not JSON serializable' % type(obj).__name__)
+
 class UnifiClient(object):
 
-    def __init__(self, username, password, host='localhost', port=8443, ssl_verify=False, q=None, timeout=10.0, unifi_os=None):
+    def __init__(self, username, password, host='localhost', port=8443, ssl_verify=False, q=None, timeout=10.0, unifi_os=None, fields=None, compact_ports=False, port_stats=None):
+        '''
+        fields is an optional list of device fields to keep (see compile_fields()), the rest of
+        the device data is discarded as it's received, default is to keep everything.
+        if compact_ports is True, port_table entries are stored as PortRecords instead of dicts.
+        port_stats is the number of samples of port counters to keep for calculating port rates
+        (see port_rates(), busiest_ports()), needs numpy. Default is None (disabled).
+        '''
         self.username = username
         self.password = password
         self.host = host
@@ -83,6 +191,17 @@ class UnifiClient(object):
         self.unifi_os = unifi_os
         self.client = None
         self.session = None
+        self.fields = fields
+        self.projection = compile_fields(fields)
+        self.compact_ports = compact_ports
+        self.port_stats = port_stats
+        if isinstance(port_stats, int):
+            try:
+                from port_stats import PortStats
+                self.port_stats = PortStats(port_stats)
+            except ImportError as e:
+                log.error('port statistics disabled, numpy is required: %s' % e)
+                self.port_stats = None
         
         if self.unifi_os is None:
             self.unifi_os = self.is_unifi_os()
@@ -160,9 +279,9 @@ class UnifiClient(object):
         '''
         if sys.version_info[0] == 3 and sys.version_info[1] > 3:
             from unifi_client_3 import UnifiClient3 #has to be in separate module to prevent python2 syntax errors
-            self.client = UnifiClient3(self.username,self.password,self.host,self.port,self.ssl_verify,self.queues,self.timeout,self.unifi_os)
+            self.client = UnifiClient3(self.username,self.password,self.host,self.port,self.ssl_verify,self.queues,self.timeout,self.unifi_os,self.fields,self.compact_ports,self.port_stats)
         else:
-            self.client = UnifiClient2(self.username,self.password,self.host,self.port,self.ssl_verify,self.queues,self.timeout,self.unifi_os)
+            self.client = UnifiClient2(self.username,self.password,self.host,self.port,self.ssl_verify,self.queues,self.timeout,self.unifi_os,self.fields,self.compact_ports,self.port_stats)
         
     def update_unifi_data(self, data):
         '''
@@ -178,6 +297,12 @@ class UnifiClient(object):
         
         if update_type == "device:sync":
             for update in data_list:
+                if self.port_stats is not None:
+                    self.port_stats.update(update)  #before projection, as the counters may not be kept
+                if self.projection is not None:
+                    update = project(update, self.projection)
+                if self.compact_ports and "port_table" in update:
+                    update["port_table"] = [PortRecord(port) for port in update["port_table"]]
                 new_data={update["_id"]:update}
                 unifi_data.update(new_data)
                 log.info('Updating: %s (%s)' % (update["_id"], unifi_data[update["_id"]].get("name",'Unknown')))
@@ -193,19 +318,23 @@ class UnifiClient(object):
             
         elif update_type == "device:update":
             log.debug('received device:update: message')
-            log.debug('received update: %s' % json.dumps(data, indent=2))
+            if log.isEnabledFor(logging.DEBUG):
+                log.debug('received update: %s' % json.dumps(data, indent=2))
             #do something with updates here
             #note now receive temperature readings from udmp here (but also in device:sync, so ignore here).
         elif update_type == "user:sync":
             log.info('received user:sync: message')
-            log.debug('received sync: %s' % json.dumps(data, indent=2))
+            if log.isEnabledFor(logging.DEBUG):
+                log.debug('received sync: %s' % json.dumps(data, indent=2))
             #do something with user syncs here
         elif update_type == "speed-test:update":
-            log.debug('received speedtest: %s' % json.dumps(data, indent=2))
+            if log.isEnabledFor(logging.DEBUG):
+                log.debug('received speedtest: %s' % json.dumps(data, indent=2))
             #do something with speed tests here
         elif update_type == "sta:sync":
             log.debug('received sta:sync: message')
-            log.debug('\n: %s' % json.dumps(data, indent=2))
+            if log.isEnabledFor(logging.DEBUG):
+                log.debug('\n: %s' % json.dumps(data, indent=2))
             #do something with station sync here
             
         else:
@@ -220,7 +349,7 @@ class UnifiClient(object):
             
         if log.getEffectiveLevel() == logging.DEBUG:    
             with open('raw_data.json', 'w') as f:
-                f.write(json.dumps(unifi_data, indent=2))
+                f.write(json.dumps(unifi_data, indent=2, default=to_json))
             
     def deduplicate_list(self, base_list):
         '''
@@ -289,6 +418,27 @@ class UnifiClient(object):
         self.update_list(self.unifi_data, devices_list)
         return devices_list
         
+    def port_rates(self, device_id, average=False):
+        '''
+        returns {port: {field: rate per second}} for device_id, eg {1: {'rx_bytes': 1024.0, 'tx_bytes':...}}
+        if average is True, the rate is averaged over all samples kept, otherwise it's the latest rate
+        ports are port_idx numbers, or ifname for USG/UDM. Returns None if port_stats is not enabled.
+        '''
+        if self.port_stats is None:
+            return None
+        if average:
+            return self.port_stats.port_averages(device_id)
+        return self.port_stats.port_rates(device_id)
+
+    def busiest_ports(self, n=10, fields=('rx_bytes', 'tx_bytes'), average=False):
+        '''
+        returns list of the n busiest ports across all devices, as [(device_id, device name, port, rate)]
+        rate is the sum of the fields rates per second. Returns None if port_stats is not enabled.
+        '''
+        if self.port_stats is None:
+            return None
+        return self.port_stats.busiest(n, fields, average)
+        
     def get_devices(self, type, blocking=True):
         '''
         updates master list from any data waiting in the queue, and returns any matching 'type'
@@ -321,8 +471,8 @@ class UnifiClient2(UnifiClient):
     '''
     Python 2 websocket class
     '''
-    def __init__(self, username, password, host='localhost', port=8443, ssl_verify=False, q=None, timeout=10.0, unifi_os=None):
-        super(UnifiClient2, self).__init__(username, password, host, port, ssl_verify, q, timeout, unifi_os)
+    def __init__(self, username, password, host='localhost', port=8443, ssl_verify=False, q=None, timeout=10.0, unifi_os=None, fields=None, compact_ports=False, port_stats=None):
+        super(UnifiClient2, self).__init__(username, password, host, port, ssl_verify, q, timeout, unifi_os, fields, compact_ports, port_stats)
    
     def connect_websocket(self):
         t=threading.Thread(target=self.start_websocket)
@@ -342,9 +492,10 @@ class UnifiClient2(UnifiClient):
                 r = self.session.get(self.base_url+command, verify=self.ssl_verify, timeout=self.timeout)
                 assert r.status_code == 200
 
-                data = r.json()
+                data = unifi_json.loads(r.content)
                 
-                log.debug('received API response: %s' % json.dumps(data, indent=2))
+                if log.isEnabledFor(logging.DEBUG):
+                    log.debug('received API response: %s' % json.dumps(data, indent=2))
                 return data
             except (AssertionError, requests.ConnectionError, requests.Timeout) as e:
                 log.error('API call %s failed: %s' % (command,e))
@@ -381,9 +532,10 @@ class UnifiClient2(UnifiClient):
             r = session.get(self.initial_info_url, json=self.params, verify=self.ssl_verify, timeout=self.timeout)
             assert r.status_code == 200
 
-            data = r.json()
+            data = unifi_json.loads(r.content)
             
-            log.debug('received initial data: %s' % json.dumps(data, indent=2))
+            if log.isEnabledFor(logging.DEBUG):
+                log.debug('received initial data: %s' % json.dumps(data, indent=2))
             self.update_unifi_data(data)
             
             #login successful, get cookies
@@ -416,8 +568,10 @@ class UnifiClient2(UnifiClient):
                 if len(msg) == 0:
                     log.info('WS closed')
                     break
-                log.debug('received: %s' % json.dumps(json.loads(msg), indent=2))
-                self.update_unifi_data(json.loads(msg))
+                data = unifi_json.loads(msg)
+                if log.isEnabledFor(logging.DEBUG):
+                    log.debug('received: %s' % json.dumps(data, indent=2))
+                self.update_unifi_data(data)
             log.info('WS disconnected')
 
         except (AssertionError, requests.ConnectionError, requests.Timeout) as e:
@@ -463,6 +617,8 @@ def main():
     parser.add_argument('-u','--user', action="store", default=None, help='mqtt broker username. (default=None)')
     parser.add_argument('-pw','--passwd', action="store", default=None, help='mqtt broker password. (default=None)')
     parser.add_argument('-pt','--pub_topic', action="store",default='/unifi_data/', help='topic to publish unifi data to. (default=/unifi_data/)')
+    parser.add_argument('-f','--fields', action="store", nargs='+', default=None, help='only keep these device fields, nested fields separated by "." eg name port_table.speed (default=all)')
+    parser.add_argument('-ps','--port_stats', action="store", type=int, default=None, help='keep this many samples of port counters, and log the busiest ports (needs numpy) (default=None)')
     parser.add_argument('-l','--log', action="store",default="None", help='log file. (default=None)')
     parser.add_argument('-D','--debug', action='store_true', help='debug mode', default = False)
     parser.add_argument('-V','--version', action='version',version='%(prog)s {version}'.format(version=__VERSION__))
@@ -507,14 +663,18 @@ def main():
             mqttc.loop_start()
    
     
-        client = UnifiClient(arg.username, arg.password, arg.IP, arg.unifi_port, arg.ssl_verify)
+        client = UnifiClient(arg.username, arg.password, arg.IP, arg.unifi_port, arg.ssl_verify, fields=arg.fields, port_stats=arg.port_stats)
 
         while True:
             data = client.devices()
             log.info('got new data')
+            if arg.port_stats:
+                for device_id, name, port, rate in client.busiest_ports(5) or []:
+                    log.info('busy port: %s port %s: %.1f bytes/s' % (name, port, rate))
             if broker:
-                mqttc.publish(arg.pub_topic, json.dumps(data))
-            log.debug(json.dumps(data, indent=2))
+                mqttc.publish(arg.pub_topic, unifi_json.dumps(data))
+            if log.isEnabledFor(logging.DEBUG):
+                log.debug(json.dumps(data, indent=2))
     except KeyboardInterrupt:
         if broker:
             mqttc.loop_stop()
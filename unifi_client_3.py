@@ -30,6 +30,8 @@ from collections import OrderedDict
 import asyncio
 import aiohttp
 
+import unifi_json
+
 import logging
 from logging.handlers import RotatingFileHandler
 
@@ -44,8 +46,8 @@ class UnifiClient3(UnifiClient):
     '''
     Python 3 websocket class
     '''
-    def __init__(self, username, password, host='localhost', port=8443, ssl_verify=False, q=None, timeout=10.0, unifi_os=None):
-        super().__init__(username, password, host, port, ssl_verify, q, timeout, unifi_os)
+    def __init__(self, username, password, host='localhost', port=8443, ssl_verify=False, q=None, timeout=10.0, unifi_os=None, fields=None, compact_ports=False, port_stats=None):
+        super().__init__(username, password, host, port, ssl_verify, q, timeout, unifi_os, fields, compact_ports, port_stats)
         
     def connect_websocket(self):
         t=threading.Thread(target=self.start_websocket)
@@ -83,9 +85,10 @@ class UnifiClient3(UnifiClient):
             try:
                 async with self.session.get(self.base_url+command, ssl=self.ssl_verify, timeout=self.timeout) as response:
                     assert response.status == 200
-                    json_response = await response.json()
-                    log.debug('Received json response to command:')
-                    log.debug(json.dumps(json_response, indent=2))
+                    json_response = unifi_json.loads(await response.read())
+                    if log.isEnabledFor(logging.DEBUG):
+                        log.debug('Received json response to command:')
+                        log.debug(json.dumps(json_response, indent=2))
                     return json_response
             except (AssertionError, aiohttp.client_exceptions.ClientConnectorError) as e:
                 log.error('API call %s failed: %s' % (command,e))
@@ -118,24 +121,28 @@ class UnifiClient3(UnifiClient):
                 async with session.post(
                         self.login_url,json=json_request, ssl=self.ssl_verify, timeout=self.timeout) as response:
                         assert response.status == 200
-                        json_response = await response.json()
-                        log.debug('Received json response to login:')
-                        log.debug(json.dumps(json_response, indent=2))
+                        json_response = unifi_json.loads(await response.read())
+                        if log.isEnabledFor(logging.DEBUG):
+                            log.debug('Received json response to login:')
+                            log.debug(json.dumps(json_response, indent=2))
 
                 async with session.get(
                         #json=self.params does not work with latest controller version (6.5.x)
                         self.initial_info_url, ssl=self.ssl_verify, timeout=self.timeout) as response:
                         assert response.status == 200
-                        json_response = await response.json()
-                        log.debug('Received json response to initial data:')
-                        log.debug(json.dumps(json_response, indent=2))
+                        json_response = unifi_json.loads(await response.read())
+                        if log.isEnabledFor(logging.DEBUG):
+                            log.debug('Received json response to initial data:')
+                            log.debug(json.dumps(json_response, indent=2))
                         self.update_unifi_data(json_response)
        
                 async with session.ws_connect(self.ws_url, ssl=self.ssl_verify, timeout=self.timeout) as ws:
                     async for msg in ws:
-                        if msg.type == aiohttp.WSMsgType.TEXT:
-                            log.debug('received: %s' % json.dumps(json.loads(msg.data),indent=2))
-                            self.update_unifi_data(msg.json(loads=json.loads))
+                        if msg.type in (aiohttp.WSMsgType.TEXT, aiohttp.WSMsgType.BINARY):
+                            data = unifi_json.loads(msg.data)
+                            if log.isEnabledFor(logging.DEBUG):
+                                log.debug('received: %s' % json.dumps(data,indent=2))
+                            self.update_unifi_data(data)
                         elif msg.type == aiohttp.WSMsgType.CLOSE:
                             log.info('WS closed: %s' % msg.extra)
                             break
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+#
+# unifi_json.py
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+
+'''
+JSON decoding backend shared by unifi_client.py, unifi_client_3.py and controller.py
+
+Uses orjson (pip install orjson) or ujson (pip install ujson) if installed, falling back to
+the standard library json module. Data can be passed as bytes (preferred, avoids decoding
+to str first) or str.
+
+The backend can be selected explicitly with use_backend('json'), use_backend('ujson') etc.
+'''
+
+from __future__ import print_function
+
+import json
+import sys
+
+import logging
+
+log = logging.getLogger('Main')
+
+BACKENDS = ['orjson', 'ujson', 'json']
+
+backend = None      #name of the backend in use
+_loads = None
+_dumps = None
+
+def _bytes_loads(loads):
+    '''
+    stdlib json only accepts bytes from python 3.6
+    '''
+    if sys.version_info >= (3, 6) or sys.version_info[0] == 2:
+        return loads
+    def wrapper(data):
+        if isinstance(data, (bytes, bytearray)):
+            data = data.decode('utf-8')
+        return loads(data)
+    return wrapper
+
+def use_backend(name=None):
+    '''
+    select json backend by name, or the fastest available if name is None
+    returns the name of the backend selected
+    '''
+    global backend, _loads, _dumps
+    for candidate in BACKENDS if name is None else [name]:
+        try:
+            if candidate == 'orjson':
+                import orjson
+                _loads = orjson.loads
+                _dumps = lambda obj, default=None: orjson.dumps(obj, default=default).decode('utf-8')
+            elif candidate == 'ujson':
+                import ujson
+                _loads = _bytes_loads(ujson.loads)
+                try:
+                    ujson.dumps({}, default=None)   #default was added in ujson 5.2
+                    _dumps = lambda obj, default=None: ujson.dumps(obj, default=default)
+                except TypeError:
+                    #older ujson, objects that need default (eg PortRecords) are encoded with json
+                    _dumps = lambda obj, default=None: ujson.dumps(obj) if default is None else json.dumps(obj, separators=(',', ':'), default=default)
+            elif candidate == 'json':
+                _loads = _bytes_loads(json.loads)
+                _dumps = lambda obj, default=None: json.dumps(obj, separators=(',', ':'), default=default)
+            else:
+                raise ValueError('Unknown json backend: %s' % candidate)
+            backend = candidate
+            log.debug('Using json backend: %s' % backend)
+            return backend
+        except ImportError:
+            continue
+    raise ImportError('json backend %s not available' % name)
+
+def loads(data):
+    '''
+    decode json from bytes or str
+    '''
+    return _loads(data)
+
+def dumps(obj, default=None):
+    '''
+    encode obj as compact json str
+    default is called for objects that can't otherwise be serialized (as for json.dumps)
+    '''
+    return _dumps(obj, default=default)
+
+use_backend()
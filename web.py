@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+#
+# web.py
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, version.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+#
+
+'''
+Web dashboard for unifi.py
+
+Serves the device/port status of the display to browsers, using the state of the NetworkDevices
+unifi.py has already updated (update_from_data), so any number of viewers share the one controller
+session and ingest pipeline.
+
+    /           status page
+    /state      json list of all devices
+    /events     server-sent events, a 'snapshot' of all devices on connect (replacing any devices
+                the browser already has), then an 'update' containing only the changed fields and
+                ports of a device each time it changes, and a 'remove' listing the ids of devices
+                that are no longer displayed
+
+Each event is encoded once and queued to every viewer, viewers that fall too far behind are
+disconnected (the browser reconnects, and gets a new snapshot).
+Uses only the standard library (python 3.7+).
+'''
+
+from __future__ import print_function
+
+import threading
+import queue
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import unifi_json
+
+import logging
+
+log = logging.getLogger('Main')
+
+#port fields sent to viewers (same as NetworkPort.port_defaults)
+PORT_FIELDS = ('speed', 'secondary_speed', 'power', 'name', 'org_name', 'iface_name', 'is_downlink', 'enabled')
+
+def port_state(port):
+    '''
+    current state of a NetworkPort, including changes not yet committed (drawn)
+    '''
+    return {item: port.commit.get(item, getattr(port, item)) for item in PORT_FIELDS}
+
+def device_id(device):
+    return device.data.get("_id", device.name)
+
+def device_state(device):
+    '''
+    current state of a NetworkDevice as a json serializable dict
+    '''
+    return {'id'         : device_id(device),
+            'name'       : device.name,
+            'description': device.description,
+            'model'      : device.model,
+            'type'       : device.type,
+            'enabled'    : device.enabled,
+            'text'       : list(device.text) if device.text else [],
+            'ports'      : {str(number): port_state(port) for number, port in device.ports.items()}
+           }
+
+def device_changes(old, new):
+    '''
+    fields and ports of new that are different from old, None if nothing has changed
+    '''
+    if old is None:
+        return new
+    changes = {item: value for item, value in new.items() if item != 'ports' and value != old.get(item)}
+    ports = {number: port for number, port in new['ports'].items() if port != old['ports'].get(number)}
+    if not changes and not ports:
+        return None
+    changes['id'] = new['id']
+    if ports:
+        changes['ports'] = ports
+    return changes
+
+class Viewer(object):
+    '''
+    one connected browser
+    '''
+
+    def __init__(self, max_queue=100):
+        self.q = queue.Queue(max_queue)
+        self.dropped = False
+
+    def send(self, event):
+        try:
+            self.q.put_nowait(event)
+        except queue.Full:
+            self.dropped = True
+
+class WebDashboard(object):
+    '''
+    publish() devices after they are updated, changes are streamed to all viewers
+    '''
+
+    def __init__(self, port=8080, host='', keepalive=15):
+        self.port = port
+        self.host = host
+        self.keepalive = keepalive  #seconds between keepalive comments on idle event streams
+        self.devices = {}           #device id: device state last published
+        self.viewers = set()
+        self.lock = threading.Lock()
+        self.events = 0             #number of update events published
+        self.server = None
+
+    def start(self):
+        handler = type('DashboardHandler', (DashboardHandler,), {'dashboard': self})
+        self.server = ThreadingHTTPServer((self.host, self.port), handler)
+        self.server.daemon_threads = True
+        thread = threading.Thread(target=self.server.serve_forever, name='web_dashboard')
+        thread.daemon = True
+        thread.start()
+        log.info('Web dashboard on http://%s:%d/' % (self.host or '0.0.0.0', self.server.server_address[1]))
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    def encode(self, name, data):
+        return ('event: %s\ndata: %s\n\n' % (name, unifi_json.dumps(data))).encode('utf-8')
+
+    def publish(self, device):
+        '''
+        send the changes to device since it was last published to all viewers
+        returns True if anything had changed
+        '''
+        state = device_state(device)
+        with self.lock:
+            changes = device_changes(self.devices.get(state['id']), state)
+            if changes is None:
+                return False
+            self.devices[state['id']] = state
+            self.events += 1
+            if self.viewers:
+                event = self.encode('update', changes)
+                for viewer in self.viewers:
+                    viewer.send(event)
+        return True
+
+    def retain(self, devices):
+        '''
+        unpublish all devices that are not in devices (the NetworkDevices displayed), and send their ids to all viewers
+        returns the list of ids removed
+        '''
+        ids = {device_id(device) for device in devices}
+        with self.lock:
+            removed = [id for id in self.devices if id not in ids]
+            if not removed:
+                return removed
+            for id in removed:
+                del self.devices[id]
+            self.events += 1
+            if self.viewers:
+                event = self.encode('remove', removed)
+                for viewer in self.viewers:
+                    viewer.send(event)
+        return removed
+
+    def snapshot(self):
+        with self.lock:
+            return list(self.devices.values())
+
+    def subscribe(self):
+        '''
+        new viewer, the snapshot is queued first so no update is missed
+        '''
+        viewer = Viewer()
+        with self.lock:
+            viewer.send(self.encode('snapshot', list(self.devices.values())))
+            self.viewers.add(viewer)
+        log.info('web viewer connected (%d viewers)' % len(self.viewers))
+        return viewer
+
+    def unsubscribe(self, viewer):
+        with self.lock:
+            self.viewers.discard(viewer)
+        log.info('web viewer disconnected (%d viewers)%s' % (len(self.viewers), ', too slow' if viewer.dropped else ''))
+
+class DashboardHandler(BaseHTTPRequestHandler):
+    dashboard = None    #set by WebDashboard.start()
+
+    def log_message(self, format, *args):
+        log.debug('web: %s %s' % (self.address_string(), format % args))
+
+    def send_body(self, body, content_type):
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        path = self.path.split('?')[0]
+        if path == '/':
+            self.send_body(PAGE.encode('utf-8'), 'text/html; charset=utf-8')
+        elif path == '/state':
+            self.send_body(unifi_json.dumps(self.dashboard.snapshot()).encode('utf-8'), 'application/json')
+        elif path == '/events':
+            self.stream_events()
+        else:
+            self.send_error(404)
+
+    def stream_events(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        viewer = self.dashboard.subscribe()
+        try:
+            while not viewer.dropped:
+                try:
+                    event = viewer.q.get(timeout=self.dashboard.keepalive)
+                except queue.Empty:
+                    event = b':\n\n'
+                self.wfile.write(event)
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            self.dashboard.unsubscribe(viewer)
+
+PAGE = '''<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>Unifi Status</title>
+<style>
+body {background: #000; color: #fff; font-family: monospace; margin: 10px}
+.device {display: inline-block; vertical-align: top; background: #2f4f4f; border: 2px solid #fff; border-radius: 6px; margin: 4px; padding: 6px}
+.device.disabled {border-color: #a00}
+.name {font-weight: bold; text-align: center}
+.text {color: #ccc; text-align: center; white-space: pre}
+.port {display: inline-block; width: 34px; height: 34px; margin: 2px; border: 1px solid #fff; text-align: center; font-size: 10px; overflow: hidden; vertical-align: top}
+.port.disabled {border-color: #a00}
+.port.uplink {border-width: 3px}
+#status {color: #888}
+</style>
+</head>
+<body>
+<div id="status">connecting...</div>
+<div id="devices"></div>
+<script>
+var devices = {};
+function color(speed) {
+    var colors = {0: '#000', 10: '#00aaaa', 100: '#cccc00', 1000: '#00aa00'};
+    if (speed in colors) return colors[speed];
+    return speed >= 2000 ? '#aa00aa' : '#aa0000';
+}
+function child(parent, className, text) {
+    var el = document.createElement('div');
+    el.className = className;
+    el.textContent = text;
+    parent.appendChild(el);
+    return el;
+}
+function render(d) {
+    //names etc. come from the controller, so are only ever set as text, never as html
+    var el = document.getElementById('dev-' + d.id);
+    if (!el) {
+        el = document.createElement('div');
+        el.id = 'dev-' + d.id;
+        document.getElementById('devices').appendChild(el);
+    }
+    el.className = 'device' + (d.enabled ? '' : ' disabled');
+    el.textContent = '';
+    child(el, 'name', d.name + ' (' + d.description + ')');
+    child(el, 'text', d.text.join('\\n'));
+    Object.keys(d.ports).sort(function(a, b) {return a - b}).forEach(function(n) {
+        var p = d.ports[n];
+        var port = child(el, 'port' + (p.enabled ? '' : ' disabled') + (p.is_downlink ? ' uplink' : ''), n);
+        port.style.background = p.enabled ? color(p.speed) : '#000';
+        port.setAttribute('title', (p.name || '') + ' ' + p.speed + 'Mb ' + p.power + 'W');
+    });
+}
+function update(changes) {
+    var d = devices[changes.id] || (devices[changes.id] = {ports: {}});
+    Object.keys(changes).forEach(function(k) {
+        if (k == 'ports') Object.assign(d.ports, changes.ports); else d[k] = changes[k];
+    });
+    render(d);
+}
+function remove(id) {
+    var el = document.getElementById('dev-' + id);
+    if (el) el.parentNode.removeChild(el);
+    delete devices[id];
+}
+var events = new EventSource('events');
+events.addEventListener('snapshot', function(e) {
+    document.getElementById('status').textContent = 'updated ' + new Date().toLocaleTimeString();
+    Object.keys(devices).forEach(remove);
+    JSON.parse(e.data).forEach(update);
+});
+events.addEventListener('update', function(e) {
+    document.getElementById('status').textContent = 'updated ' + new Date().toLocaleTimeString();
+    update(JSON.parse(e.data));
+});
+events.addEventListener('remove', function(e) {
+    JSON.parse(e.data).forEach(remove);
+});
+events.onerror = function() {document.getElementById('status').textContent = 'disconnected, retrying...'};
+</script>
+</body>
+</html>
+'''